@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -35,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
+    'django.contrib.postgres',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
@@ -94,7 +96,112 @@ DATABASES = {
     }
 }
 
+# Number of concurrent workers the rewrite commands (and web workers) use;
+# the connection pools below are sized from it.
+REWRITE_WORKERS = int(os.environ.get('REWRITE_WORKERS', 4))
+
+# Persistent connections / pooling for both aliases.
+# DB_POOL=1 uses psycopg's connection pool (Django 5.1+, psycopg 3). Otherwise each
+# thread keeps its connection open for DB_CONN_MAX_AGE seconds (0 closes it after
+# every request, None keeps it forever). Health checks (also applied to pooled
+# connections) make sure a reused connection is still alive instead of failing
+# the first query after a DB restart.
+DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE', '60')
+DB_CONN_MAX_AGE = None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE)
+
+for _database in DATABASES.values():
+    _database['CONN_HEALTH_CHECKS'] = True
+    if DB_POOL:
+        _database['CONN_MAX_AGE'] = 0  # Django rejects persistent connections with a pool
+        _database['OPTIONS'] = {
+            'pool': {
+                'min_size': 1,
+                'max_size': REWRITE_WORKERS + 2,  # Workers plus the main thread and admin
+                'timeout': 10,  # Seconds to wait for a free connection
+                'max_idle': 300,
+            },
+        }
+    else:
+        _database['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+
+
+# Ollama
+# Models are routed per task. A list is a cascade: the first (fastest) model is
+# tried first and the next one is only used when the output fails validation.
+
+OLLAMA_URL = 'http://ollama:11434'
+
+OLLAMA_MODELS = {
+    'title': ['tinyllama', 'phi'],
+    'description': ['tinyllama', 'phi'],
+    'summary': 'phi',
+    'rating_review': 'phi',
+    'neighbourhood': 'phi',
+}
 
+# Time budgets of the rewrite commands (seconds; None disables a limit).
+# A request is also cut short by the hotel budget, and both by --max-runtime.
+OLLAMA_REQUEST_TIMEOUT = 300  # One model call
+REWRITE_HOTEL_BUDGET = 900    # All the model calls for one hotel
+CHECKPOINT_DIR = BASE_DIR / 'checkpoints'  # Hotels left over when --max-runtime stops a run
+
+# Quality gate applied before any output is written (property_info/validation.py).
+# Outputs failing a validator are regenerated after the rest of the run, up to
+# OUTPUT_MAX_ATTEMPTS generations per hotel; then the stored content is kept.
+# OUTPUT_VALIDATORS adds validators per artifact, as dotted paths to callables
+# taking (text, context) and returning a rejection reason or None.
+OUTPUT_MAX_ATTEMPTS = 3
+OUTPUT_VALIDATORS = {}
+
+# Rewrite pipeline (property_info/pipeline.py). Hotels stream from `travel`
+# through prompt, generate, validate and write stages connected by bounded
+# queues, so a fast stage waits for a slow one instead of buffering and memory
+# stays flat whatever the size of the run. --workers and --queue-depth override
+# the threads per stage and the capacity of the queue in front of each.
+REWRITE_STAGE_WORKERS = {'prompt': 1, 'generate': REWRITE_WORKERS, 'validate': 1, 'write': 1}
+REWRITE_QUEUE_DEPTH = 16
+REWRITE_FETCH_SIZE = 200   # Rows per round trip of the server-side cursor
+REWRITE_WRITE_BATCH = 50   # Hotels written per transaction
+
+# watch_hotel_changes: a trigger on `hotels` NOTIFYs the changed hotel_id and the
+# watcher regenerates summaries and reviews in micro-batches. A batch goes once
+# no change has arrived for WATCH_DEBOUNCE seconds, its oldest change has waited
+# WATCH_MAX_WAIT seconds, or WATCH_BATCH_SIZE hotels are pending.
+WATCH_DEBOUNCE = 30
+WATCH_MAX_WAIT = 300
+WATCH_BATCH_SIZE = 100
+
+# Generation history storage. 'inline' keeps each version's text in its
+# generation_history row. 'blob' stores it once per distinct text in text_blob,
+# addressed by its SHA-256, so repeated outputs such as fallbacks take one row.
+# HISTORY_COMPRESSION = 'zstd' (needs zstandard) compresses blobs of at least
+# HISTORY_COMPRESSION_MIN_SIZE bytes. compact_history moves existing rows over.
+HISTORY_STORAGE = 'inline'
+HISTORY_COMPRESSION = None
+HISTORY_COMPRESSION_LEVEL = 9
+HISTORY_COMPRESSION_MIN_SIZE = 256
+
+# Seconds between progress lines of the rewrite commands; per-hotel output
+# only appears with --verbosity 2.
+PROGRESS_INTERVAL = 10
+
+# Semantic near-duplicate cache (--semantic-cache on the summary and review commands).
+# Normalized hotel inputs are embedded; an output whose inputs are at least
+# REUSE_THRESHOLD similar is reused as a template, one above SEED_THRESHOLD is
+# passed to the model as a reference example.
+SEMANTIC_CACHE_MODEL = 'nomic-embed-text'
+SEMANTIC_CACHE_REUSE_THRESHOLD = 0.97
+SEMANTIC_CACHE_SEED_THRESHOLD = 0.90
+SEMANTIC_CACHE_PATH = BASE_DIR / 'semantic_cache'  # Index files, kept between runs
+
+# Geohash length of the cells sharing one neighbourhood context
+# (--neighbourhood-context); 6 characters is about 1.2km x 0.6km.
+NEIGHBOURHOOD_PRECISION = 6
+
+# In-process LRU used by Hotel.objects.in_bulk_cached()
+HOTEL_CACHE_SIZE = 10000  # Maximum number of hotels kept per process
+HOTEL_CACHE_TTL = 300     # Seconds before a cached hotel is reloaded
 
 
 # Password validation
@@ -1,12 +1,21 @@
 from django.contrib import admin
-from .models import Hotel, PropertySummary, PropertyRatingReview
+from .search import content_query
+from .models import (
+    Hotel, PropertySummary, PropertyRatingReview, GenerationHistory, ActiveGeneration, NeighbourhoodContext, TextBlob,
+)
 
 @admin.register(Hotel)
 class HotelAdmin(admin.ModelAdmin):
     list_display = ('hotel_id', 'hotel_name', 'price', 'rating', 'room_type', 'location', 'description')
-    #search_fields = ('hotel_name', 'location', 'room_type')
+    search_fields = ('hotel_name',)
     #list_filter = ('rating', 'price')
     
+    def get_search_results(self, request, queryset, search_term):
+        # Similar names through the trigram index (index_hotel_names) instead of a LIKE scan
+        if not search_term:
+            return queryset, False
+        return queryset.filter(hotel_name__trigram_word_similar=search_term), False
+
     def get_queryset(self, request):
         # Override queryset to fetch data from the 'travel' database
         return super().get_queryset(request).using('travel')
@@ -15,12 +24,46 @@ class HotelAdmin(admin.ModelAdmin):
         # Ensure saving to the 'travel' database
         obj.save(using='travel')
 
+class ContentSearchMixin:
+    # A number looks up a property; anything else is a full-text search of the generated text
+    search_fields = ('property_id',)
+    search_help_text = "A property ID, or words from the generated text (\"quoted phrases\", or, -word)"
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term or search_term.isdigit():
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(search=content_query(search_term)), False
+
 @admin.register(PropertySummary)
-class PropertySummaryAdmin(admin.ModelAdmin):
+class PropertySummaryAdmin(ContentSearchMixin, admin.ModelAdmin):
     list_display = ('property_id', 'summary')
-    search_fields = ('property_id',)
 
 @admin.register(PropertyRatingReview)
-class PropertyRatingReviewAdmin(admin.ModelAdmin):
+class PropertyRatingReviewAdmin(ContentSearchMixin, admin.ModelAdmin):
     list_display = ('property_id', 'rating', 'review')
-    search_fields = ('property_id',)
\ No newline at end of file
+
+@admin.register(GenerationHistory)
+class GenerationHistoryAdmin(admin.ModelAdmin):
+    list_display = ('property_id', 'artifact', 'model', 'run_id', 'latency', 'prompt_tokens', 'completion_tokens', 'created_at')
+    list_filter = ('artifact', 'model')
+    search_fields = ('property_id', 'run_id')
+    raw_id_fields = ('blob',)
+
+@admin.register(ActiveGeneration)
+class ActiveGenerationAdmin(admin.ModelAdmin):
+    list_display = ('property_id', 'artifact', 'generation')
+    list_filter = ('artifact',)
+    search_fields = ('property_id',)
+    raw_id_fields = ('generation',)
+
+@admin.register(NeighbourhoodContext)
+class NeighbourhoodContextAdmin(admin.ModelAdmin):
+    list_display = ('cell', 'model', 'created_at')
+    search_fields = ('cell',)
+
+@admin.register(TextBlob)
+class TextBlobAdmin(admin.ModelAdmin):
+    list_display = ('hash', 'size', 'compression', 'created_at')
+    list_filter = ('compression',)
+    search_fields = ('=hash',)
@@ -0,0 +1,43 @@
+# property_info/blobs.py
+
+import hashlib
+
+from django.conf import settings
+
+ZSTD = 'zstd'
+
+
+def digest(text):
+    """Content address of ``text``: identical texts share one blob whatever their encoding."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstandard is required for HISTORY_COMPRESSION = 'zstd' (pip install zstandard)")
+    return zstandard
+
+
+def encode(text, compression=None):
+    """Return ``(data, compression)`` to store ``text`` as.
+
+    Texts shorter than ``HISTORY_COMPRESSION_MIN_SIZE`` bytes, or that zstd
+    doesn't make smaller, are stored as plain UTF-8 with an empty compression.
+    """
+    data = text.encode('utf-8')
+    if compression == ZSTD and len(data) >= settings.HISTORY_COMPRESSION_MIN_SIZE:
+        packed = _zstandard().ZstdCompressor(level=settings.HISTORY_COMPRESSION_LEVEL).compress(data)
+        if len(packed) < len(data):
+            return packed, ZSTD
+    elif compression not in (None, '', ZSTD):
+        raise ValueError(f"Unknown compression {compression!r}; expected {ZSTD!r} or None")
+    return data, ''
+
+
+def decode(data, compression):
+    data = bytes(data)  # psycopg returns bytea as memoryview
+    if compression == ZSTD:
+        data = _zstandard().ZstdDecompressor().decompress(data)
+    return data.decode('utf-8')
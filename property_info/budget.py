@@ -0,0 +1,97 @@
+# property_info/budget.py
+
+import argparse
+import json
+import os
+import re
+import time
+
+from django.conf import settings
+
+
+class BudgetExceeded(Exception):
+    """Raised when a wall-clock budget runs out before or during a model call."""
+
+
+def parse_duration(value):
+    """Parse seconds (``90``) or a duration with a unit (``30s``, ``45m``, ``2h``)."""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smh]?)', value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected a duration like 90, 30m or 2h, got {value!r}")
+    number, unit = match.groups()
+    return float(number) * {'': 1, 's': 1, 'm': 60, 'h': 3600}[unit]
+
+
+class Budget:
+    """A wall-clock deadline for a run, a hotel or a request.
+
+    A child budget never outlives its parent, so a per-hotel budget is cut
+    short by the run's ``--max-runtime``. ``request_timeout`` caps a single
+    model call and is inherited by children.
+    """
+
+    def __init__(self, seconds=None, parent=None, request_timeout=None):
+        deadline = time.monotonic() + seconds if seconds else None
+        if parent is not None and parent.deadline is not None:
+            deadline = parent.deadline if deadline is None else min(deadline, parent.deadline)
+        self.deadline = deadline
+
+        if request_timeout is None:
+            request_timeout = parent.request_timeout if parent is not None else settings.OLLAMA_REQUEST_TIMEOUT
+        self.request_timeout = request_timeout
+
+    def child(self, seconds):
+        return Budget(seconds, parent=self)
+
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def timeout(self):
+        """Seconds the next request may take; raises BudgetExceeded if nothing is left."""
+        remaining = self.remaining()
+        if remaining is None:
+            return self.request_timeout
+        if remaining <= 0:
+            raise BudgetExceeded("time budget exhausted")
+        return remaining if self.request_timeout is None else min(self.request_timeout, remaining)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--request-timeout', type=parse_duration, default=settings.OLLAMA_REQUEST_TIMEOUT,
+        help="Maximum time for a single model request (default: OLLAMA_REQUEST_TIMEOUT)"
+    )
+    parser.add_argument(
+        '--hotel-budget', type=parse_duration, default=settings.REWRITE_HOTEL_BUDGET,
+        help="Maximum time spent generating for one hotel before it is skipped (default: REWRITE_HOTEL_BUDGET)"
+    )
+    parser.add_argument(
+        '--max-runtime', type=parse_duration,
+        help="Stop the run after this long (e.g. 6h) and checkpoint the hotels left to do"
+    )
+
+
+def run_budget(options):
+    return Budget(options.get('max_runtime'), request_timeout=options.get('request_timeout'))
+
+
+def write_checkpoint(command, run_id, hotel_ids):
+    """Save the hotels a run did not get to; ``--resume <path>`` processes exactly those."""
+    os.makedirs(settings.CHECKPOINT_DIR, exist_ok=True)
+    path = os.path.join(settings.CHECKPOINT_DIR, f"{command}-{run_id}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'command': command, 'run_id': run_id, 'hotel_ids': list(hotel_ids)}, f)
+    return path
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)['hotel_ids']
+    except (OSError, ValueError, KeyError) as e:
+        raise argparse.ArgumentTypeError(f"cannot read checkpoint {path}: {e}")
@@ -0,0 +1,62 @@
+# property_info/estimate.py
+
+import math
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, math.ceil(q * len(values)) - 1)]
+
+
+class RunEstimate:
+    """Collects per-stage timings and token counts of a sampled dry run."""
+
+    def __init__(self):
+        self.stages = {}  # stage -> list of (seconds, prompt_tokens, completion_tokens)
+        self.hotels = 0
+
+    def add(self, stage, seconds, trace):
+        self.stages.setdefault(stage, []).append((
+            seconds,
+            sum(attempt.prompt_tokens for attempt in trace),
+            sum(attempt.completion_tokens for attempt in trace),
+        ))
+
+    def report(self, total, workers):
+        """Return report lines projecting ``total`` hotels processed by ``workers`` in parallel."""
+        if not self.hotels:
+            return ["Estimate: no hotels were sampled"]
+
+        lines = [f"Estimate from {self.hotels} sampled hotels:"]
+        seconds_per_hotel = tokens_per_hotel = 0.0
+        for stage, samples in self.stages.items():
+            seconds = [sample[0] for sample in samples]
+            prompt_tokens = sum(sample[1] for sample in samples)
+            completion_tokens = sum(sample[2] for sample in samples)
+            stage_seconds = sum(seconds)
+            lines.append(
+                f"  {stage:<14} mean {stage_seconds / len(samples):6.2f}s  p95 {percentile(seconds, 0.95):6.2f}s  "
+                f"tokens in/out {prompt_tokens / len(samples):6.0f}/{completion_tokens / len(samples):<6.0f} "
+                f"{completion_tokens / stage_seconds if stage_seconds else 0:6.1f} tok/s"
+            )
+            seconds_per_hotel += stage_seconds / self.hotels
+            tokens_per_hotel += (prompt_tokens + completion_tokens) / self.hotels
+
+        # Assumes the backends keep up with the configured concurrency
+        runtime = seconds_per_hotel * total / max(workers, 1)
+        lines.append(
+            f"Projected for {total} hotels at {workers} worker(s): {format_duration(runtime)}, "
+            f"{tokens_per_hotel * total:,.0f} tokens"
+        )
+        return lines
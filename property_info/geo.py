@@ -0,0 +1,188 @@
+# property_info/geo.py
+
+import argparse
+import math
+
+from django.conf import settings
+from django.db import connections
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+COLUMN_PRECISION = 8  # Characters stored in hotels.geohash (~20m cells)
+EARTH_RADIUS_KM = 6371.0
+
+# Same algorithm as encode(), so the database can maintain hotels.geohash itself.
+# PRECISION is a keyword in Postgres, hence ``prec``
+GEOHASH_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION geohash_encode(lat double precision, lon double precision, prec integer)
+    RETURNS text AS $$
+    DECLARE
+        base32 constant text := '0123456789bcdefghjkmnpqrstuvwxyz';
+        lat_lo double precision := -90;
+        lat_hi double precision := 90;
+        lon_lo double precision := -180;
+        lon_hi double precision := 180;
+        mid double precision;
+        hash text := '';
+        bits integer := 0;
+        ch integer := 0;
+        even boolean := true;
+    BEGIN
+        IF lat IS NULL OR lon IS NULL THEN
+            RETURN NULL;
+        END IF;
+        WHILE length(hash) < prec LOOP
+            IF even THEN
+                mid := (lon_lo + lon_hi) / 2;
+                IF lon >= mid THEN ch := ch * 2 + 1; lon_lo := mid; ELSE ch := ch * 2; lon_hi := mid; END IF;
+            ELSE
+                mid := (lat_lo + lat_hi) / 2;
+                IF lat >= mid THEN ch := ch * 2 + 1; lat_lo := mid; ELSE ch := ch * 2; lat_hi := mid; END IF;
+            END IF;
+            even := NOT even;
+            bits := bits + 1;
+            IF bits = 5 THEN
+                hash := hash || substr(base32, ch + 1, 1);
+                bits := 0;
+                ch := 0;
+            END IF;
+        END LOOP;
+        RETURN hash;
+    END
+    $$ LANGUAGE plpgsql IMMUTABLE STRICT PARALLEL SAFE;
+"""
+
+
+def encode(latitude, longitude, precision=COLUMN_PRECISION):
+    """Return the geohash of a point; nearby points share long prefixes."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars, ch, bits, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            ch, bounds[0] = ch * 2 + 1, mid
+        else:
+            ch, bounds[1] = ch * 2, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[ch])
+            ch, bits = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return ``(lat_degrees, lon_degrees)`` covered by a geohash cell of ``precision`` characters."""
+    lon_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision - lon_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def covering_cells(bbox, max_cells=32):
+    """Return geohash prefixes whose cells cover ``bbox``, as fine as ``max_cells`` allows."""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    cells = set()
+    for precision in range(COLUMN_PRECISION, 0, -1):
+        lat_step, lon_step = cell_size(precision)
+        rows = math.floor(max_lat / lat_step) - math.floor(min_lat / lat_step) + 1
+        columns = math.floor(max_lon / lon_step) - math.floor(min_lon / lon_step) + 1
+        if rows * columns > max_cells:
+            continue
+        for row in range(rows):
+            for column in range(columns):
+                lat = min(min_lat + row * lat_step, max_lat)
+                lon = min(min_lon + column * lon_step, max_lon)
+                cells.add(encode(lat, lon, precision))
+        return sorted(cells)
+    return []  # The box is larger than the coarsest grid allows; don't narrow by prefix
+
+
+def parse_bbox(value):
+    """Parse ``MIN_LAT,MIN_LON,MAX_LAT,MAX_LON``."""
+    try:
+        min_lat, min_lon, max_lat, max_lon = (float(part) for part in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected MIN_LAT,MIN_LON,MAX_LAT,MAX_LON, got {value!r}")
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+        raise argparse.ArgumentTypeError(f"not a valid bounding box: {value!r}")
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def parse_near(value):
+    """Parse ``LAT,LON,KM``."""
+    try:
+        lat, lon, km = (float(part) for part in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected LAT,LON,KM, got {value!r}")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180 and km > 0):
+        raise argparse.ArgumentTypeError(f"not a valid point and radius: {value!r}")
+    return lat, lon, km
+
+
+def bbox_around(lat, lon, km):
+    lat_delta = math.degrees(km / EARTH_RADIUS_KM)
+    lon_delta = math.degrees(km / (EARTH_RADIUS_KM * max(math.cos(math.radians(lat)), 1e-6)))
+    return max(lat - lat_delta, -90), max(lon - lon_delta, -180), min(lat + lat_delta, 90), min(lon + lon_delta, 180)
+
+
+def region_conditions(bbox=None, near=None):
+    """Return ``(conditions, params)`` restricting ``hotels`` to a box and/or a radius.
+
+    The geohash prefixes let Postgres answer from the ``hotels_geohash_idx``
+    index; the exact coordinate checks then trim the cells' edges.
+    """
+    conditions, params = [], []
+    boxes = [bbox] if bbox else []
+    if near:
+        boxes.append(bbox_around(*near))
+
+    for box in boxes:
+        cells = covering_cells(box)
+        if cells:
+            conditions.append("(" + " OR ".join(["geohash LIKE %s"] * len(cells)) + ")")
+            params += [f"{cell}%" for cell in cells]
+        conditions.append("latitude BETWEEN %s AND %s AND longitude BETWEEN %s AND %s")
+        params += [box[0], box[2], box[1], box[3]]
+
+    if near:
+        lat, lon, km = near
+        conditions.append(
+            "2 * %s * asin(sqrt(power(sin(radians(latitude - %s) / 2), 2) + "
+            "cos(radians(%s)) * cos(radians(latitude)) * power(sin(radians(longitude - %s) / 2), 2))) <= %s"
+        )
+        params += [EARTH_RADIUS_KM, lat, lat, lon, km]
+
+    return conditions, params
+
+
+def ensure_geohash_column():
+    """Add ``hotels.geohash`` (kept up to date by Postgres) and its index if they don't exist."""
+    with connections['travel'].cursor() as cursor:
+        cursor.execute(GEOHASH_FUNCTION_SQL)
+        cursor.execute(f"""
+            ALTER TABLE hotels ADD COLUMN IF NOT EXISTS geohash varchar({COLUMN_PRECISION})
+            GENERATED ALWAYS AS (
+                geohash_encode(latitude::double precision, longitude::double precision, {COLUMN_PRECISION})
+            ) STORED
+        """)
+        # text_pattern_ops so prefix LIKE queries can use the index whatever the collation
+        cursor.execute("CREATE INDEX IF NOT EXISTS hotels_geohash_idx ON hotels (geohash text_pattern_ops)")
+
+
+def neighbourhood_cell(latitude, longitude):
+    return encode(latitude, longitude, settings.NEIGHBOURHOOD_PRECISION)
+
+
+def cell_bounds(latitude, longitude, precision):
+    """Return the ``(min_lat, min_lon, max_lat, max_lon)`` of the geohash cell containing a point."""
+    lat_step, lon_step = cell_size(precision)
+    min_lat = math.floor((float(latitude) + 90) / lat_step) * lat_step - 90
+    min_lon = math.floor((float(longitude) + 180) / lon_step) * lon_step - 180
+    return min_lat, min_lon, min_lat + lat_step, min_lon + lon_step
+
+
+def cell_order(precision):
+    """Return an ORDER BY ``(sql, params)`` listing the hotels of each geohash cell together."""
+    lat_step, lon_step = cell_size(precision)
+    return "floor((latitude + 90) / %s), floor((longitude + 180) / %s), hotel_id", [lat_step, lon_step]
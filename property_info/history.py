@@ -0,0 +1,140 @@
+# property_info/history.py
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from property_info.models import (
+    ActiveGeneration, GenerationHistory, Hotel, PropertyRatingReview, PropertySummary, TextBlob,
+)
+
+FALLBACK_MODEL = 'fallback'  # Content stored without any model output
+
+
+def new_run_id():
+    return uuid.uuid4().hex
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest() if prompt else ''
+
+
+def text_fields(*texts):
+    """Return the ``content``/``blob`` field values storing each of ``texts``, per ``HISTORY_STORAGE``."""
+    if settings.HISTORY_STORAGE != 'blob':
+        return [{'content': text} for text in texts]
+    hashes = TextBlob.objects.store(texts, settings.HISTORY_COMPRESSION)
+    return [{'content': '', 'blob_id': hashes[text]} for text in texts]
+
+
+def record(artifact, property_id, content, run_id, trace=(), rating=None, original=None, original_rating=None):
+    """Append a version of ``artifact`` to the history and make it the active one.
+
+    ``trace`` is the list of ``llm.Generation`` attempts that produced
+    ``content``; tokens and latency are summed over all of them. ``original``
+    is the content being replaced: the first time an artifact is generated for
+    a property it is kept as a 'source' version so a rollback can restore it.
+    """
+    last = trace[-1] if trace else None
+
+    with transaction.atomic():
+        pointer = ActiveGeneration.objects.filter(artifact=artifact, property_id=property_id).first()
+        keep_original = pointer is None and original is not None
+        texts = text_fields(content, original) if keep_original else text_fields(content)
+        replaces = pointer.generation_id if pointer is not None else None
+        if keep_original:
+            replaces = GenerationHistory.objects.create(
+                artifact=artifact,
+                property_id=property_id,
+                run_id=GenerationHistory.SOURCE_MODEL,
+                model=GenerationHistory.SOURCE_MODEL,
+                rating=original_rating,
+                **texts[1],
+            ).pk
+
+        generation = GenerationHistory.objects.create(
+            artifact=artifact,
+            property_id=property_id,
+            run_id=run_id,
+            model=last.model if last else FALLBACK_MODEL,
+            prompt_hash=prompt_hash(last.prompt) if last else '',
+            rating=rating,
+            latency=sum(attempt.latency for attempt in trace),
+            prompt_tokens=sum(attempt.prompt_tokens for attempt in trace),
+            completion_tokens=sum(attempt.completion_tokens for attempt in trace),
+            replaces_id=replaces,
+            **texts[0],
+        )
+
+        if pointer is None:
+            ActiveGeneration.objects.create(artifact=artifact, property_id=property_id, generation=generation)
+        else:
+            pointer.generation = generation
+            pointer.save(update_fields=['generation'])
+
+    return generation
+
+
+def previous_version(generation):
+    """Return the version ``generation`` displaced when its run recorded it, skipping versions of the same run."""
+    previous = generation.replaces
+    while previous is not None and previous.run_id == generation.run_id:
+        previous = previous.replaces
+    return previous
+
+
+def apply(generation):
+    """Write ``generation``'s content to the table the artifact is served from."""
+    property_id = generation.property_id
+    text = generation.text
+
+    if generation.artifact == 'summary':
+        if not PropertySummary.objects.filter(property_id=property_id).update(summary=text):
+            PropertySummary.objects.create(property_id=property_id, summary=text)
+    elif generation.artifact == 'rating_review':
+        values = {'rating': generation.rating or 0.0, 'review': text}
+        if not PropertyRatingReview.objects.filter(property_id=property_id).update(**values):
+            PropertyRatingReview.objects.create(property_id=property_id, **values)
+    else:
+        column = 'hotel_name' if generation.artifact == 'title' else 'description'
+        with connections['travel'].cursor() as cursor:
+            cursor.execute(f"UPDATE hotels SET {column} = %s WHERE hotel_id = %s", [text, property_id])
+        Hotel.objects.invalidate_cached([property_id])
+
+
+def activate(generation):
+    """Point the artifact at ``generation`` and serve its content."""
+    with transaction.atomic():
+        ActiveGeneration.objects.update_or_create(
+            artifact=generation.artifact,
+            property_id=generation.property_id,
+            defaults={'generation': generation},
+        )
+        apply(generation)
+
+
+def rollback_run(run_id):
+    """Re-activate, for everything ``run_id`` generated, the version that was active before it.
+
+    Returns ``(restored, removed)``. Summaries and reviews the run created for
+    properties that had none before are removed; titles and descriptions
+    without an earlier version are left as they are.
+    """
+    restored = removed = 0
+    pointers = ActiveGeneration.objects.filter(generation__run_id=run_id).select_related('generation__replaces__blob')
+
+    for pointer in list(pointers):
+        previous = previous_version(pointer.generation)
+        if previous is not None:
+            activate(previous)
+            restored += 1
+        elif pointer.artifact in ('summary', 'rating_review'):
+            with transaction.atomic():
+                model = PropertySummary if pointer.artifact == 'summary' else PropertyRatingReview
+                model.objects.filter(property_id=pointer.property_id).delete()
+                pointer.delete()
+            removed += 1
+
+    return restored, removed
@@ -0,0 +1,122 @@
+# property_info/llm.py
+
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from property_info.budget import BudgetExceeded
+
+DEFAULT_MODEL = 'phi'
+
+
+class OllamaAPIError(Exception):
+    """Raised when the Ollama API answers with a non-200 status code."""
+
+
+class OllamaRequestError(Exception):
+    """Raised when the Ollama API cannot be reached (wraps ``requests`` exceptions)."""
+
+
+@dataclass
+class Generation:
+    text: str
+    model: str
+    prompt: str = ''
+    latency: float = 0.0  # Seconds spent waiting for the model
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+def models_for(task):
+    """Return the models configured for ``task``, fastest first."""
+    models = getattr(settings, 'OLLAMA_MODELS', {}).get(task, DEFAULT_MODEL)
+    if isinstance(models, str):
+        return [models]
+    return list(models) or [DEFAULT_MODEL]
+
+
+def post(path, payload, budget=None):
+    """POST ``payload`` to the Ollama API and return the decoded JSON response.
+
+    The request is bounded by ``OLLAMA_REQUEST_TIMEOUT`` or, when a
+    ``budget`` is given, by whatever is left of it; a request cut short by an
+    exhausted budget raises ``BudgetExceeded`` instead of a request error.
+
+    ``requests`` is only imported on the first call, so commands that never
+    reach the model (``--help``, exports, targeted runs that find nothing to
+    do) don't pay for it at startup.
+    """
+    timeout = budget.timeout() if budget is not None else settings.OLLAMA_REQUEST_TIMEOUT
+
+    import requests
+
+    try:
+        response = requests.post(f"{settings.OLLAMA_URL}{path}", json=payload, timeout=timeout)
+    except requests.exceptions.Timeout as e:
+        if budget is not None and budget.expired():
+            raise BudgetExceeded("time budget exhausted during request") from e
+        raise OllamaRequestError(str(e)) from e
+    except requests.exceptions.RequestException as e:
+        raise OllamaRequestError(str(e)) from e
+
+    if response.status_code != 200:
+        raise OllamaAPIError(response.text)
+
+    return response.json()
+
+
+def call_model(model, prompt, system, budget=None):
+    started = time.monotonic()
+    response_data = post('/api/generate', {
+        "model": model,
+        "prompt": prompt,
+        "system": system,
+        "stream": False
+    }, budget=budget)
+    return Generation(
+        text=response_data.get('response') or None,
+        model=model,
+        prompt=prompt,
+        latency=time.monotonic() - started,
+        prompt_tokens=response_data.get('prompt_eval_count', 0),
+        completion_tokens=response_data.get('eval_count', 0),
+    )
+
+
+def generate(task, prompt, system, validate=None, trace=None, budget=None):
+    """Generate text for ``task`` using its model cascade.
+
+    Models are tried in the configured order and the first output accepted by
+    ``validate`` is returned. If no model produces a valid output, the result
+    of the last (largest) model is returned so the caller can apply its own
+    fallback. Every attempt is appended to ``trace`` when a list is given.
+
+    If ``budget`` runs out before any model answered, ``BudgetExceeded`` is
+    raised; if it runs out while escalating, the last answer is returned.
+    A model failing with an Ollama error (not pulled, unreachable) is skipped;
+    the error is raised only when no model of the cascade answered.
+    """
+    result = error = None
+    for model in models_for(task):
+        try:
+            result = call_model(model, prompt, system, budget=budget)
+        except BudgetExceeded:
+            if result is None:
+                raise
+            break
+        except (OllamaAPIError, OllamaRequestError) as e:
+            error = e
+            continue
+        if trace is not None:
+            trace.append(result)
+        if result.text and (validate is None or validate(result.text)):
+            break
+    if result is None and error is not None:
+        raise error
+    return result
+
+
+def embed(text, model, budget=None):
+    """Return the embedding vector of ``text`` from Ollama's embeddings endpoint."""
+    return post('/api/embeddings', {"model": model, "prompt": text}, budget=budget)['embedding']
@@ -0,0 +1,211 @@
+# property_info/loadtest.py
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+from property_info.estimate import percentile
+
+KINDS = ('hot', 'cold', 'miss')
+
+
+class FakeOllama:
+    """Local stand-in for the Ollama API answering canned responses after ``latency`` seconds.
+
+    Used as a context manager, it serves on a free localhost port (``url``)
+    from a background thread and counts the calls it receives.
+    """
+
+    def __init__(self, latency=0.0, dimensions=8):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                body = json.dumps(fake.respond(self.path, payload)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path, payload):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+
+        prompt = payload.get('prompt', '')
+        if path == '/api/embeddings':
+            # Deterministic, so identical inputs embed identically
+            digest = hashlib.sha256(prompt.encode()).digest()
+            return {'embedding': [byte / 255 for byte in digest[:self.dimensions]]}
+        if prompt.startswith("Generate a summary"):
+            response = (
+                "A comfortable, well-run hotel in a lively district, with spacious rooms, friendly staff "
+                "and easy access to public transport."
+            )
+        else:
+            response = "Rating: 4\nReview: A comfortable hotel in a convenient location with friendly staff."
+        return {
+            'response': response,
+            'prompt_eval_count': len(prompt.split()),
+            'eval_count': 16,
+        }
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class QueryCountMiddleware:
+    """Reports the number of queries a request ran, on every database, in ``X-DB-Queries``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        count = 0
+
+        def counter(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            response = self.get_response(request)
+
+        response['X-DB-Queries'] = str(count)
+        return response
+
+
+@dataclass
+class Result:
+    kind: str
+    status: int
+    seconds: float
+    queries: int
+
+
+def request_mix(count, hot_ids, cold_ids, missing_ids, hot_ratio, miss_ratio, rng):
+    """Return ``count`` ``(kind, hotel_id)`` requests.
+
+    ``miss_ratio`` of them ask for properties without generated content; of
+    the rest, ``hot_ratio`` go to the small hot set (served from the hotel
+    cache once warm) and the others to random cold properties.
+    """
+    mix = []
+    for _ in range(count):
+        draw = rng.random()
+        if draw < miss_ratio and missing_ids:
+            mix.append(('miss', rng.choice(missing_ids)))
+        elif rng.random() < hot_ratio:
+            mix.append(('hot', rng.choice(hot_ids)))
+        else:
+            mix.append(('cold', rng.choice(cold_ids)))
+    return mix
+
+
+async def get(application, path, query=''):
+    """Send a GET to an ASGI ``application`` in-process; return ``(status, headers)``."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    body_sent = False
+    response = {}
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client never disconnects; Django cancels this wait once it has responded
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = {name.decode().lower(): value.decode() for name, value in message['headers']}
+
+    await application(scope, receive, send)
+    return response['status'], response['headers']
+
+
+async def run(application, mix, concurrency, path='/api/properties/{}/'):
+    """Replay ``mix`` with ``concurrency`` clients in flight; return one ``Result`` per request.
+
+    Requests for properties without content ask for it to be generated
+    (``generate=1``), so the first one for each goes through to the model.
+    """
+    pending = iter(mix)
+    results = []
+
+    async def client():
+        for kind, hotel_id in pending:
+            started = time.perf_counter()
+            status, headers = await get(application, path.format(hotel_id), 'generate=1' if kind == 'miss' else '')
+            results.append(Result(kind, status, time.perf_counter() - started, int(headers.get('x-db-queries', 0))))
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    # Sync views ran in a worker thread; release its connections so the test databases can be dropped
+    await sync_to_async(connections.close_all)()
+    return results
+
+
+def report(results, elapsed, concurrency):
+    """Return report lines: throughput, then latency percentiles and queries per request kind."""
+    lines = [
+        f"Requests: {len(results)} in {elapsed:.1f}s, {len(results) / elapsed:.1f} req/s "
+        f"at concurrency {concurrency}"
+    ]
+    for kind in KINDS:
+        selected = [result for result in results if result.kind == kind]
+        if not selected:
+            continue
+        seconds = [result.seconds for result in selected]
+        queries = [result.queries for result in selected]
+        errors = sum(not 200 <= result.status < 300 for result in selected)
+        lines.append(
+            f"  {kind:<4} n={len(selected):<6} "
+            f"p50 {1000 * percentile(seconds, 0.5):.1f}ms  p90 {1000 * percentile(seconds, 0.9):.1f}ms  "
+            f"p99 {1000 * percentile(seconds, 0.99):.1f}ms  "
+            f"queries/request {sum(queries) / len(queries):.2f} (max {max(queries)})  errors {errors}"
+        )
+    return lines
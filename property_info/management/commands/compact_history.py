@@ -0,0 +1,85 @@
+# property_info/management/commands/compact_history.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from property_info.models import GenerationHistory, TextBlob
+
+TABLES = (GenerationHistory._meta.db_table, TextBlob._meta.db_table)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the text of generation history rows stored inline into deduplicated, "
+        "optionally zstd-compressed blobs (HISTORY_STORAGE = 'blob')"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="History rows moved per transaction")
+        parser.add_argument(
+            '--compression', choices=['zstd', 'none'],
+            help="Compression of the new blobs (default: HISTORY_COMPRESSION)"
+        )
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help="VACUUM FULL the history afterwards so the space freed goes back to the filesystem"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size', 1000)
+        compression = options.get('compression') or settings.HISTORY_COMPRESSION
+        if compression == 'none':
+            compression = None
+
+        before = self.table_sizes()
+        moved = 0
+        last_id = 0
+        while True:
+            rows = list(
+                GenerationHistory.objects.filter(blob__isnull=True, id__gt=last_id)
+                .order_by('id').values_list('id', 'content')[:batch_size]
+            )
+            if not rows:
+                break
+
+            with transaction.atomic():
+                hashes = TextBlob.objects.store({content for _, content in rows}, compression)
+                GenerationHistory.objects.bulk_update(
+                    [GenerationHistory(id=pk, content='', blob_id=hashes[content]) for pk, content in rows],
+                    ['content', 'blob'],
+                )
+            moved += len(rows)
+            last_id = rows[-1][0]
+            if options.get('verbosity', 1) >= 2:
+                self.stdout.write(f"Moved {moved} history rows")
+
+        if options.get('vacuum'):
+            with connection.cursor() as cursor:
+                for table in TABLES:
+                    cursor.execute(f"VACUUM (FULL, ANALYZE) {table}")
+
+        after = self.table_sizes()
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} history rows into {TextBlob.objects.count()} distinct blobs"
+        ))
+        for table in TABLES:
+            self.stdout.write(f"  {table:<20} {self.megabytes(before[table]):>10}  ->  {self.megabytes(after[table])}")
+        if moved and not options.get('vacuum'):
+            self.stdout.write("The space freed is reused by new rows; run with --vacuum to give it back to the filesystem")
+
+    def table_sizes(self):
+        # Table, TOAST and indexes
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname, pg_total_relation_size(oid) FROM pg_class WHERE relname = ANY(%s)", [list(TABLES)]
+            )
+            sizes = dict(cursor.fetchall())
+        return {table: sizes.get(table, 0) for table in TABLES}
+
+    def megabytes(self, size):
+        return f"{size / 1024 / 1024:.1f} MB"
+
+
+##########################################
+# Run with:
+# docker-compose exec django-new python manage.py compact_history --compression zstd --vacuum
@@ -0,0 +1,188 @@
+# property_info/management/commands/export_property_content.py
+
+import gzip
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from property_info.models import PropertySummary, PropertyRatingReview
+
+# Output columns, in order, with their Arrow types
+COLUMNS = [
+    ('hotel_id', 'int64'),
+    ('city_id', 'int64'),
+    ('hotel_name', 'string'),
+    ('price', 'float64'),
+    ('rating', 'float64'),
+    ('room_type', 'string'),
+    ('location', 'string'),
+    ('latitude', 'float64'),
+    ('longitude', 'float64'),
+    ('description', 'string'),
+    ('summary', 'string'),
+    ('review_rating', 'float64'),
+    ('review', 'string'),
+]
+
+EXTENSIONS = {
+    'ndjson': 'ndjson.gz',
+    'parquet': 'parquet',
+    'arrow': 'arrow',
+}
+
+
+class NDJSONWriter:
+    def __init__(self, path):
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row, ensure_ascii=False))
+            self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowWriter:
+    """Writes Parquet or Arrow IPC files, one record batch per chunk."""
+
+    def __init__(self, path, fmt):
+        try:
+            import pyarrow as pa
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            raise CommandError(f"pyarrow is required for --format {fmt} (pip install pyarrow)")
+
+        self.pa = pa
+        self.schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in COLUMNS])
+        if fmt == 'parquet':
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            self.writer = pyarrow.ipc.new_file(
+                path, self.schema, options=pyarrow.ipc.IpcWriteOptions(compression='zstd')
+            )
+
+    def write_rows(self, rows):
+        batch = self.pa.RecordBatch.from_pylist(rows, schema=self.schema)
+        if hasattr(self.writer, 'write_batch'):
+            self.writer.write_batch(batch)
+        else:
+            self.writer.write_table(self.pa.Table.from_batches([batch]))
+
+    def close(self):
+        self.writer.close()
+
+
+class Command(BaseCommand):
+    help = "Export hotels joined with their generated summaries and reviews to NDJSON, Parquet or Arrow files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='export', help="Output directory")
+        parser.add_argument('--format', choices=sorted(EXTENSIONS), default='ndjson', help="Output file format")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows fetched and written per chunk")
+        parser.add_argument('--partition-by-city', action='store_true', help="Write one file per city_id")
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format']
+        chunk_size = options['chunk_size']
+        partition = options['partition_by_city']
+        os.makedirs(output, exist_ok=True)
+
+        writer = None
+        current_city = None
+        total = files = 0
+
+        # A server-side cursor keeps memory bounded to one chunk on both ends
+        with connections['travel'].chunked_cursor() as cursor:
+            cursor.execute("""
+                SELECT hotel_id, city_id, hotel_name, price, rating, room_type, location,
+                       latitude, longitude, description
+                FROM hotels
+                WHERE hotel_id IS NOT NULL
+                ORDER BY city_id, hotel_id
+            """)
+
+            try:
+                while True:
+                    hotels = cursor.fetchmany(chunk_size)
+                    if not hotels:
+                        break
+
+                    for city_id, rows in self.join_chunk(hotels, partition):
+                        if writer is None or city_id != current_city:
+                            if writer is not None:
+                                writer.close()
+                            writer = self.open_writer(output, fmt, city_id)
+                            current_city = city_id
+                            files += 1
+                        writer.write_rows(rows)
+                        total += len(rows)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Exported {total} hotels to {files} file(s) in {output}"))
+
+    def join_chunk(self, hotels, partition):
+        """Attach summaries and reviews to a chunk of hotels.
+
+        Yields ``(city_id, rows)`` groups; without partitioning the whole chunk is
+        one group. Rows arrive ordered by city, so each city is one contiguous run.
+        """
+        hotel_ids = [hotel[0] for hotel in hotels]
+
+        # Later rows win if a property has more than one generated record
+        summaries = dict(
+            PropertySummary.objects.filter(property_id__in=hotel_ids)
+            .order_by('id').values_list('property_id', 'summary')
+        )
+        reviews = {
+            property_id: (rating, review)
+            for property_id, rating, review in PropertyRatingReview.objects.filter(property_id__in=hotel_ids)
+            .order_by('id').values_list('property_id', 'rating', 'review')
+        }
+
+        groups = []
+        for hotel_id, city_id, hotel_name, price, rating, room_type, location, latitude, longitude, description in hotels:
+            review_rating, review = reviews.get(hotel_id, (None, None))
+            row = {
+                'hotel_id': hotel_id,
+                'city_id': city_id,
+                'hotel_name': hotel_name,
+                'price': float(price) if price is not None else None,
+                'rating': rating,
+                'room_type': room_type,
+                'location': location,
+                'latitude': float(latitude) if latitude is not None else None,
+                'longitude': float(longitude) if longitude is not None else None,
+                'description': description,
+                'summary': summaries.get(hotel_id),
+                'review_rating': review_rating,
+                'review': review,
+            }
+            key = city_id if partition else None
+            if not groups or groups[-1][0] != key:
+                groups.append((key, []))
+            groups[-1][1].append(row)
+        return groups
+
+    def open_writer(self, output, fmt, city_id):
+        if city_id is None:
+            directory = output
+        else:
+            # Hive-style partition directories are understood by Arrow, Spark and DuckDB
+            directory = os.path.join(output, f"city_id={city_id}")
+            os.makedirs(directory, exist_ok=True)
+
+        path = os.path.join(directory, f"property_content.{EXTENSIONS[fmt]}")
+        if fmt == 'ndjson':
+            return NDJSONWriter(path)
+        return ArrowWriter(path, fmt)
+
+
+##########################################
+# Run with:
+# docker-compose exec django-new python manage.py export_property_content --format parquet --partition-by-city
@@ -0,0 +1,192 @@
+# property_info/management/commands/import_property_content.py
+
+import csv
+import gzip
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+# Each merge keeps only the last line per property, then updates existing rows
+# and inserts the rest in one statement each (no per-row round trips).
+SUMMARY_MERGE = """
+    WITH latest AS (
+        SELECT DISTINCT ON (property_id) property_id, summary
+        FROM import_property_content
+        WHERE summary IS NOT NULL
+        ORDER BY property_id, line DESC
+    )
+    {}
+"""
+
+SUMMARY_UPDATE = SUMMARY_MERGE.format("""
+    UPDATE property_summary ps
+    SET summary = latest.summary
+    FROM latest
+    WHERE ps.property_id = latest.property_id
+""")
+
+SUMMARY_INSERT = SUMMARY_MERGE.format("""
+    INSERT INTO property_summary (property_id, summary)
+    SELECT property_id, summary
+    FROM latest
+    WHERE NOT EXISTS (SELECT 1 FROM property_summary ps WHERE ps.property_id = latest.property_id)
+""")
+
+REVIEW_MERGE = """
+    WITH latest AS (
+        SELECT DISTINCT ON (property_id) property_id, rating, review
+        FROM import_property_content
+        WHERE review IS NOT NULL
+        ORDER BY property_id, line DESC
+    )
+    {}
+"""
+
+REVIEW_UPDATE = REVIEW_MERGE.format("""
+    UPDATE property_rating_review prr
+    SET rating = latest.rating, review = latest.review
+    FROM latest
+    WHERE prr.property_id = latest.property_id
+""")
+
+REVIEW_INSERT = REVIEW_MERGE.format("""
+    INSERT INTO property_rating_review (property_id, rating, review)
+    SELECT property_id, rating, review
+    FROM latest
+    WHERE NOT EXISTS (SELECT 1 FROM property_rating_review prr WHERE prr.property_id = latest.property_id)
+""")
+
+DESCRIPTION_UPDATE = """
+    WITH latest AS (
+        SELECT DISTINCT ON (hotel_id) hotel_id, description
+        FROM import_hotel_description
+        ORDER BY hotel_id, line DESC
+    )
+    UPDATE hotels h
+    SET description = latest.description
+    FROM latest
+    WHERE h.hotel_id = latest.hotel_id
+"""
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def iter_records(path, fmt):
+    """Yield one dict per input line from an NDJSON or CSV file (optionally gzipped)."""
+    with open_text(path) as f:
+        if fmt == 'csv':
+            for record in csv.DictReader(f):
+                # CSV has no null, an empty cell means "no value"
+                yield {key: (value if value != '' else None) for key, value in record.items()}
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def parse_record(record):
+    """Normalize an input record to ``(property_id, summary, rating, review, description)``.
+
+    Accepts the columns written by ``export_property_content`` (``hotel_id``,
+    ``review_rating``) as well as the model field names (``property_id``, ``rating``).
+    Returns None when the record has no id.
+    """
+    property_id = record.get('hotel_id', record.get('property_id'))
+    if property_id is None:
+        return None
+
+    rating = record.get('review_rating', record.get('rating'))
+    review = record.get('review')
+    if review is not None and rating is None:
+        rating = 0.0  # Same unrated value older rewrite runs stored
+
+    return (
+        int(property_id),
+        record.get('summary'),
+        float(rating) if rating is not None else None,
+        review,
+        record.get('description'),
+    )
+
+
+class Command(BaseCommand):
+    help = "Bulk import pre-generated summaries, ratings/reviews and descriptions from NDJSON or CSV using COPY"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON or CSV file, optionally gzipped")
+        parser.add_argument('--format', choices=['ndjson', 'csv'], help="Input format (default: from the file extension)")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if '.csv' in path else 'ndjson')
+
+        try:
+            with transaction.atomic(using='default'), transaction.atomic(using='travel'):
+                counts = self.import_file(path, fmt)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not import {path}: {str(e)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {counts['lines']} lines ({counts['skipped']} skipped): "
+            f"{counts['summaries_updated']} summaries updated, {counts['summaries_created']} created; "
+            f"{counts['reviews_updated']} reviews updated, {counts['reviews_created']} created; "
+            f"{counts['descriptions_updated']} descriptions updated"
+        ))
+
+    def import_file(self, path, fmt):
+        counts = {'lines': 0, 'skipped': 0}
+
+        with connections['default'].cursor() as content_cursor, connections['travel'].cursor() as hotel_cursor:
+            content_cursor.execute("""
+                CREATE TEMP TABLE import_property_content (
+                    line bigint, property_id integer, summary text, rating double precision, review text
+                ) ON COMMIT DROP
+            """)
+            hotel_cursor.execute("""
+                CREATE TEMP TABLE import_hotel_description (
+                    line bigint, hotel_id bigint, description text
+                ) ON COMMIT DROP
+            """)
+
+            # Stream the file once into both staging tables
+            with content_cursor.copy(
+                "COPY import_property_content (line, property_id, summary, rating, review) FROM STDIN"
+            ) as content_copy, hotel_cursor.copy(
+                "COPY import_hotel_description (line, hotel_id, description) FROM STDIN"
+            ) as hotel_copy:
+                for line, record in enumerate(iter_records(path, fmt), start=1):
+                    counts['lines'] += 1
+                    parsed = parse_record(record)
+                    if parsed is None:
+                        counts['skipped'] += 1
+                        continue
+
+                    property_id, summary, rating, review, description = parsed
+                    if summary is not None or review is not None:
+                        content_copy.write_row((line, property_id, summary, rating, review))
+                    if description is not None:
+                        hotel_copy.write_row((line, property_id, description))
+
+            content_cursor.execute("ANALYZE import_property_content")
+            hotel_cursor.execute("ANALYZE import_hotel_description")
+
+            for key, cursor, sql in [
+                ('summaries_updated', content_cursor, SUMMARY_UPDATE),
+                ('summaries_created', content_cursor, SUMMARY_INSERT),
+                ('reviews_updated', content_cursor, REVIEW_UPDATE),
+                ('reviews_created', content_cursor, REVIEW_INSERT),
+                ('descriptions_updated', hotel_cursor, DESCRIPTION_UPDATE),
+            ]:
+                cursor.execute(sql)
+                counts[key] = cursor.rowcount
+
+        return counts
+
+
+##########################################
+# Run with:
+# docker-compose exec django-new python manage.py import_property_content export/property_content.ndjson.gz
@@ -0,0 +1,31 @@
+# property_info/management/commands/index_hotel_geohash.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from property_info import geo
+
+class Command(BaseCommand):
+    help = (
+        "Add a generated geohash column and a prefix index to the hotels table, "
+        "used by --bbox and --near to select hotels by region"
+    )
+
+    def handle(self, *args, **options):
+        geo.ensure_geohash_column()
+
+        with connections['travel'].cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*), count(geohash), count(DISTINCT left(geohash, %s)) FROM hotels",
+                [settings.NEIGHBOURHOOD_PRECISION]
+            )
+            hotels, indexed, cells = cursor.fetchone()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"hotels.geohash is ready: {indexed} of {hotels} hotels have coordinates, in {cells} neighbourhood cells"
+        ))
+
+
+##########################################
+# Run with:
+# docker-compose exec django-new python manage.py index_hotel_geohash
@@ -0,0 +1,19 @@
+# property_info/management/commands/index_hotel_names.py
+
+from django.core.management.base import BaseCommand
+from property_info import search
+
+class Command(BaseCommand):
+    help = (
+        "Enable pg_trgm and add a trigram index on hotels.hotel_name, used by the name search "
+        "of the search API and the admin"
+    )
+
+    def handle(self, *args, **options):
+        search.ensure_name_index()
+        self.stdout.write(self.style.SUCCESS("hotels.hotel_name is indexed for trigram search"))
+
+
+##########################################
+# Run with:
+# docker-compose exec django-new python manage.py index_hotel_names
@@ -0,0 +1,132 @@
+# property_info/management/commands/loadtest_web.py
+
+import asyncio
+import random
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from property_info.loadtest import FakeOllama, report, request_mix, run
+from property_info.models import Hotel, PropertyRatingReview, PropertySummary
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the property API: seed test databases, serve the ASGI app in-process against a fake "
+        "Ollama server and replay a concurrent mix of hot, cold and missing properties, generating the missing ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hotels', type=int, default=5000, help="Hotels to seed (default: 5000)")
+        parser.add_argument('--requests', type=int, default=2000, help="Requests to send (default: 2000)")
+        parser.add_argument('--concurrency', type=int, default=20, help="Requests in flight (default: 20)")
+        parser.add_argument('--hot-set', type=int, default=100, help="Number of hot properties (default: 100)")
+        parser.add_argument(
+            '--hot-ratio', type=float, default=0.8,
+            help="Share of requests with content that go to the hot set (default: 0.8)"
+        )
+        parser.add_argument(
+            '--miss-ratio', type=float, default=0.1,
+            help="Share of requests for properties with no generated content, which generate it (default: 0.1)"
+        )
+        parser.add_argument(
+            '--llm-latency', type=float, default=0.0,
+            help="Seconds the fake Ollama server waits before answering (default: 0)"
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Random seed of the data and request mix")
+        parser.add_argument('--keepdb', action='store_true', help="Keep the test databases between runs")
+
+    def handle(self, *args, **options):
+        if options['hot_set'] >= options['hotels']:
+            raise CommandError("--hot-set must be smaller than --hotels")
+
+        rng = random.Random(options['seed'])
+        verbosity = options['verbosity']
+
+        with FakeOllama(options['llm_latency']) as ollama, override_settings(
+            OLLAMA_URL=ollama.url,
+            MIDDLEWARE=['property_info.loadtest.QueryCountMiddleware', *settings.MIDDLEWARE],
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'localhost'],
+        ):
+            old_config = setup_databases(verbosity, interactive=False, keepdb=options['keepdb'])
+            try:
+                with_content, missing = self.seed(options['hotels'], options['miss_ratio'], rng)
+                Hotel.objects.invalidate_cached()
+
+                hot, cold = with_content[:options['hot_set']], with_content[options['hot_set']:]
+                mix = request_mix(
+                    options['requests'], hot, cold, missing, options['hot_ratio'], options['miss_ratio'], rng
+                )
+                self.stdout.write(
+                    f"Seeded {options['hotels']} hotels ({len(missing)} without content); "
+                    f"sending {len(mix)} requests"
+                )
+
+                started = time.perf_counter()
+                results = asyncio.run(run(get_asgi_application(), mix, options['concurrency']))
+                elapsed = time.perf_counter() - started
+
+                for line in report(results, elapsed, options['concurrency']):
+                    self.stdout.write(line)
+                self.stdout.write(f"LLM calls: {ollama.calls}")
+            finally:
+                teardown_databases(old_config, verbosity, keepdb=options['keepdb'])
+
+    def seed(self, count, miss_ratio, rng):
+        """Create ``count`` hotels, with content for all but ``miss_ratio`` of them; return both id lists."""
+        travel = connections['travel']
+        if Hotel._meta.db_table not in travel.introspection.table_names():
+            # `hotels` belongs to the scraper and is unmanaged, so the test database lacks it
+            with travel.schema_editor() as editor:
+                editor.create_model(Hotel)
+
+        Hotel.objects.all().delete()
+        PropertySummary.objects.all().delete()
+        PropertyRatingReview.objects.all().delete()
+
+        hotel_ids = list(range(1, count + 1))
+        Hotel.objects.bulk_create([
+            Hotel(
+                hotel_id=hotel_id,
+                city_id=hotel_id % 50,
+                hotel_name=f"Load Test Hotel {hotel_id}",
+                price=Decimal(rng.randint(40, 400)),
+                hotel_img='',
+                rating=round(rng.uniform(2.5, 5.0), 1),
+                room_type=rng.choice(['Standard', 'Deluxe', 'Suite']),
+                location=f"District {hotel_id % 50}",
+                latitude=Decimal('48.856600'),
+                longitude=Decimal('2.352200'),
+                description="A comfortable hotel with friendly staff, close to shops and public transport.",
+            )
+            for hotel_id in hotel_ids
+        ], batch_size=1000)
+
+        rng.shuffle(hotel_ids)
+        missing_count = int(count * miss_ratio)
+        missing, with_content = hotel_ids[:missing_count], hotel_ids[missing_count:]
+
+        PropertySummary.objects.bulk_create([
+            PropertySummary(
+                property_id=hotel_id,
+                summary="A well-located hotel offering comfortable rooms, a generous breakfast and easy access "
+                        "to the main sights.",
+            )
+            for hotel_id in with_content
+        ], batch_size=1000)
+        PropertyRatingReview.objects.bulk_create([
+            PropertyRatingReview(
+                property_id=hotel_id, rating=4.0, review="Friendly staff and clean rooms. Would stay again."
+            )
+            for hotel_id in with_content
+        ], batch_size=1000)
+
+        return with_content, missing
+
+
+##########################################
+# Run with:
+# docker-compose exec django-new python manage.py loadtest_web --requests 5000 --concurrency 50 --miss-ratio 0.2
@@ -1,64 +1,52 @@
 # property_info/management/commands/rewrite_property_rating_review.py
 
-import requests
 import json
 import re
-from django.core.management.base import BaseCommand
-from django.db import connections
+from property_info import llm
+from property_info.budget import BudgetExceeded
 from property_info.models import PropertyRatingReview
+from property_info.neighbourhood import prompt_line
+from property_info.rewrite import PipelineCommand
 
-class Command(BaseCommand):
+class Command(PipelineCommand):
     help = "Generate property ratings and reviews, and save them to the database"
 
-    def handle(self, *args, **options):
-        with connections['travel'].cursor() as cursor:
-            cursor.execute("""
-                SELECT hotel_id, hotel_name, price, room_type, location, latitude, longitude 
-                FROM hotels 
-                WHERE hotel_id IS NOT NULL
-                LIMIT 10
-            """)
-            hotels = cursor.fetchall()
-
-        for hotel_id, hotel_name, price, room_type, location, latitude, longitude in hotels:
-            try:
-                rating, review = self.generate_rating_and_review(hotel_name, price, room_type, location, latitude, longitude)
-
-                if rating is None or review is None:
-                    self.stdout.write(self.style.WARNING(f"Could not generate rating and review for hotel {hotel_name}. Saving fallback data."))
-                    rating = 0.0  # Fallback rating
-                    review = "Review not available"
-
-                # Save the generated rating and review to the database
-                existing_rating_review = PropertyRatingReview.objects.filter(property_id=hotel_id).first()
-
-                if existing_rating_review:
-                    # Update existing record
-                    existing_rating_review.rating = rating
-                    existing_rating_review.review = review
-                    existing_rating_review.save()
-                    self.stdout.write(self.style.SUCCESS(f"Updated rating and review for {hotel_name}"))
-                else:
-                    # Create new record
-                    PropertyRatingReview.objects.create(
-                        property_id=hotel_id,
-                        rating=rating,
-                        review=review
-                    )
-                    self.stdout.write(self.style.SUCCESS(f"Created new rating and review for {hotel_name}"))
-
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error processing hotel {hotel_name}: {str(e)}"))
-
-    def generate_rating_and_review(self, hotel_name, price, room_type, location, latitude, longitude):
-        prompt = f"""Generate a rating (out of 5) and a review on the basis of what you are giving the rating for the following hotel:
+    artifact = 'rating_review'
+    label = 'rating and review'
+    plural = 'reviews'
+    columns = ('hotel_id', 'hotel_name', 'price', 'room_type', 'location', 'latitude', 'longitude')
+    model = PropertyRatingReview
+    system_prompt = "You are a professional hotel reviewer. Provide concise, high-quality reviews in exactly 3 lines and no more than 100 words. Maintain a professional tone."
+
+    def prompt(self, hotel, neighbourhood=None):
+        return self.rating_and_review_prompt(*hotel[1:], neighbourhood)
+
+    def produce(self, hotel, trace=None, budget=None, neighbourhood=None):
+        return self.generate_rating_and_review(*hotel[1:], trace=trace, budget=budget, neighbourhood=neighbourhood)
+
+    def errors(self, output, prompt):
+        rating, review = output
+        return self.quality.errors(review, rating=rating, prompt=prompt, system=self.system_prompt)
+
+    def values(self, output):
+        rating, review = output
+        return {'rating': rating, 'review': review}
+
+    def versions(self, output=None, row=None):
+        if row is not None:
+            return row.review, row.rating
+        rating, review = output
+        return review, rating
+
+    def rating_and_review_prompt(self, hotel_name, price, room_type, location, latitude, longitude, neighbourhood=None):
+        return f"""Generate a rating (out of 5) and a review on the basis of what you are giving the rating for the following hotel:
 
         Hotel Name: {hotel_name}
         Price: {price}
         Room Type: {room_type}
         Location: {location}
         Latitude: {latitude}
-        Longitude: {longitude}
+        Longitude: {longitude}{prompt_line(neighbourhood)}
 
         - If the rating is 1 or 2, the review should be negative, highlighting poor aspects such as bad service, poor amenities, or dissatisfaction with the experience.
         - If the rating is 3, the review should be neutral, pointing out both positive and negative aspects, indicating an average experience.
@@ -71,54 +59,80 @@ class Command(BaseCommand):
         Review: <exactly 3 lines, no more than 100 words>
         """
 
-        try:
-            response = requests.post(
-                "http://ollama:11434/api/generate",
-                json={
-                    "model": "phi",  # or `phi` if you have installed `phi`
-                    "prompt": prompt,
-                    "system": "You are a professional hotel reviewer. Provide concise, high-quality reviews in exactly 3 lines and no more than 100 words. Maintain a professional tone.",
-                    "stream": False
-                },
-                timeout=None
+    def generate_rating_and_review(self, hotel_name, price, room_type, location, latitude, longitude, trace=None, budget=None, neighbourhood=None):
+        base_prompt = self.rating_and_review_prompt(hotel_name, price, room_type, location, latitude, longitude)
+        prompt = self.rating_and_review_prompt(hotel_name, price, room_type, location, latitude, longitude, neighbourhood)
+
+        # A cascade escalates to the next model when the output fails the quality gate.
+        # Outputs are checked against the base prompt: echoing the shared neighbourhood is not a leak
+        def validate(text):
+            rating, review = self.parse_rating_and_review(text)
+            return self.quality.is_valid(review, rating=rating, prompt=base_prompt, system=self.system_prompt)
+
+        if self.semantic_cache is not None:
+            fields = {'price': price, 'room_type': room_type, 'location': location}
+            text = self.semantic_cache.generate(
+                fields, hotel_name, prompt, lambda prompt: self.request_rating_and_review(prompt, trace, budget, validate),
+                trace=trace, budget=budget, validate=validate, exact=('price', 'room_type')
             )
+        else:
+            text = self.request_rating_and_review(prompt, trace, budget, validate)
 
-            if response.status_code != 200:
-                self.stdout.write(self.style.ERROR(f"Ollama API error: {response.text}"))
-                return 0.0, "Review not available"
-
-            response_data = response.json()
-            if 'response' not in response_data:
-                return 0.0, "Review not available"
+        if not text:
+            return 0.0, "Review not available"
 
-            text = response_data['response']
-            
-            # Match variations like [RATING]: or Rating:
-            rating_match = re.search(r'(?:\[RATING\]|Rating):\s*(\d+(\.\d+)?)', text, re.IGNORECASE)
-            review_match = re.search(r'(?:[Review]|.*?):\s*(.+)', text, re.IGNORECASE)
+        return self.parse_rating_and_review(text)
 
-            # Extract rating
-            rating = float(rating_match.group(1)) if rating_match else 0.0
+    def request_rating_and_review(self, prompt, trace=None, budget=None, validate=None):
+        try:
+            result = llm.generate(
+                'rating_review',
+                prompt,
+                self.system_prompt,
+                validate=validate,
+                trace=trace,
+                budget=budget
+            )
 
-            # Extract review or fallback to remaining text
-            review = text.split("\n", 1)[-1].strip() if not review_match else review_match.group(1).strip()
-            review = review[:500]  # Truncate review if it's too long
+            if result is None or not result.text:
+                return None
 
-            return rating, review
+            return result.text
 
-        except requests.exceptions.RequestException as e:
+        except BudgetExceeded:
+            raise
+        except llm.OllamaAPIError as e:
+            self.stdout.write(self.style.ERROR(f"Ollama API error: {str(e)}"))
+            return None
+        except llm.OllamaRequestError as e:
             self.stdout.write(self.style.ERROR(f"Request error: {str(e)}"))
-            return 0.0, "Review not available"
+            return None
         except json.JSONDecodeError as e:
             self.stdout.write(self.style.ERROR(f"JSON decode error: {str(e)}"))
-            return 0.0, "Review not available"
+            return None
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Unexpected error: {str(e)}"))
-            return 0.0, "Review not available"
-
-
-
-
+            return None
+
+    def parse_rating_and_review(self, text):
+        # The prompt asks for "Rating: <n>" and "Review: <text>" lines; [RATING]: and [REVIEW]: are accepted too
+        rating_match = re.search(r'(?:\[RATING\]|Rating):\s*(\d+(\.\d+)?)', text, re.IGNORECASE)
+        review_match = re.search(r'^\s*(?:\[REVIEW\]|Review):\s*(.+)', text, re.IGNORECASE | re.MULTILINE | re.DOTALL)
+
+        # Extract rating
+        rating = float(rating_match.group(1)) if rating_match else 0.0
+
+        # Extract review, or fall back to the text after the rating line
+        if review_match:
+            review = review_match.group(1)
+        elif rating_match:
+            line_end = text.find("\n", rating_match.end())
+            review = text[line_end:] if line_end != -1 else ""
+        else:
+            review = text
+        review = review.strip()[:500]  # Truncate review if it's too long
+
+        return rating, review
 
 
 ##########################################
@@ -2,57 +2,40 @@
 ########################################
 
 
-import requests
 import json
-from django.core.management.base import BaseCommand
-from django.db import connections
+from property_info import llm
+from property_info.budget import BudgetExceeded
 from property_info.models import PropertySummary
-from django.db.utils import IntegrityError
+from property_info.neighbourhood import prompt_line
+from property_info.rewrite import PipelineCommand
 
-class Command(BaseCommand):
+class Command(PipelineCommand):
     help = "Generate property summary and save it to the database"
 
-    def handle(self, *args, **options):
-        with connections['travel'].cursor() as cursor:
-            cursor.execute("""
-                SELECT hotel_id, hotel_name, price, rating, room_type, location, latitude, longitude
-                FROM hotels
-                WHERE hotel_id IS NOT NULL
-                LIMIT 10;
-            """)
-            hotels = cursor.fetchall()
-
-        for hotel_id, hotel_name, price, rating, room_type, location, latitude, longitude in hotels:
-            try:
-                # Check if summary already exists
-                existing_summary = PropertySummary.objects.filter(property_id=hotel_id).first()
-                
-                summary = self.generate_summary(hotel_name, price, rating, room_type, location, latitude, longitude)
-
-                if summary is None:
-                    self.stdout.write(self.style.WARNING(f"Could not generate summary for hotel ID {hotel_id}. Skipping."))
-                    continue
-
-                if existing_summary:
-                    # Update existing record
-                    existing_summary.summary = summary
-                    existing_summary.save()
-                    self.stdout.write(self.style.SUCCESS(f"Updated summary for {hotel_name}"))
-                else:
-                    # Create new record
-                    PropertySummary.objects.create(
-                        property_id=hotel_id,
-                        summary=summary
-                    )
-                    self.stdout.write(self.style.SUCCESS(f"Created new summary for {hotel_name}"))
-
-            except IntegrityError as e:
-                self.stdout.write(self.style.ERROR(f"Database integrity error for hotel ID {hotel_id}: {str(e)}"))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error processing hotel ID {hotel_id}: {str(e)}"))
-
-    def generate_summary(self, hotel_name, price, rating, room_type, location, latitude, longitude):
-        prompt = f"""Generate a summary for the following hotel:
+    artifact = 'summary'
+    label = 'summary'
+    plural = 'summaries'
+    columns = ('hotel_id', 'hotel_name', 'price', 'rating', 'room_type', 'location', 'latitude', 'longitude')
+    model = PropertySummary
+    system_prompt = "You are a hotel expert. Respond in a concise, informative summary."
+
+    def prompt(self, hotel, neighbourhood=None):
+        return self.summary_prompt(*hotel[1:], neighbourhood)
+
+    def produce(self, hotel, trace=None, budget=None, neighbourhood=None):
+        return self.generate_summary(*hotel[1:], trace=trace, budget=budget, neighbourhood=neighbourhood)
+
+    def errors(self, output, prompt):
+        return self.quality.errors(output, prompt=prompt, system=self.system_prompt)
+
+    def values(self, output):
+        return {'summary': output}
+
+    def versions(self, output=None, row=None):
+        return (row.summary if row else output), None
+
+    def summary_prompt(self, hotel_name, price, rating, room_type, location, latitude, longitude, neighbourhood=None):
+        return f"""Generate a summary for the following hotel:
 
         Hotel Name: {hotel_name}
         Price: {price}
@@ -60,33 +43,50 @@ class Command(BaseCommand):
         Room Type: {room_type}
         Location: {location}
         Latitude: {latitude}
-        Longitude: {longitude}
+        Longitude: {longitude}{prompt_line(neighbourhood)}
 
         The summary should be concise, focusing on key details like location, amenities, and overall appeal."""
 
-        try:
-            response = requests.post(
-                "http://ollama:11434/api/generate",
-                json={
-                    "model": "phi",  # or `phi` if you have installed `phi`
-                    "prompt": prompt,
-                    "system": "You are a hotel expert. Respond in a concise, informative summary.",
-                    "stream": False
-                },
-                timeout=None
+    def generate_summary(self, hotel_name, price, rating, room_type, location, latitude, longitude, trace=None, budget=None, neighbourhood=None):
+        base_prompt = self.summary_prompt(hotel_name, price, rating, room_type, location, latitude, longitude)
+        prompt = self.summary_prompt(hotel_name, price, rating, room_type, location, latitude, longitude, neighbourhood)
+
+        # A cascade escalates to the next model when the output fails the quality gate.
+        # Outputs are checked against the base prompt: echoing the shared neighbourhood is not a leak
+        def validate(text):
+            return self.quality.is_valid(text, prompt=base_prompt, system=self.system_prompt)
+
+        if self.semantic_cache is not None:
+            fields = {'price': price, 'rating': rating, 'room_type': room_type, 'location': location}
+            return self.semantic_cache.generate(
+                fields, hotel_name, prompt, lambda prompt: self.request_summary(prompt, trace, budget, validate),
+                trace=trace, budget=budget, validate=validate, exact=('price', 'rating', 'room_type')
             )
 
-            if response.status_code != 200:
-                self.stdout.write(self.style.ERROR(f"Ollama API error: {response.text}"))
-                return None
+        return self.request_summary(prompt, trace, budget, validate)
 
-            response_data = response.json()
-            if 'response' not in response_data:
+    def request_summary(self, prompt, trace=None, budget=None, validate=None):
+        try:
+            result = llm.generate(
+                'summary',
+                prompt,
+                self.system_prompt,
+                validate=validate,
+                trace=trace,
+                budget=budget
+            )
+
+            if result is None or not result.text:
                 return None
 
-            return response_data['response']
+            return result.text
 
-        except requests.exceptions.RequestException as e:
+        except BudgetExceeded:
+            raise
+        except llm.OllamaAPIError as e:
+            self.stdout.write(self.style.ERROR(f"Ollama API error: {str(e)}"))
+            return None
+        except llm.OllamaRequestError as e:
             self.stdout.write(self.style.ERROR(f"Request error: {str(e)}"))
             return None
         except json.JSONDecodeError as e:
@@ -1,11 +1,31 @@
-import requests
 import json
+import time
+from functools import cached_property
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import connections, transaction
+from property_info import history, llm, selection
+from property_info.budget import BudgetExceeded, add_arguments as add_budget_arguments, run_budget, write_checkpoint
+from property_info.estimate import RunEstimate
+from property_info.models import Hotel
+from property_info.progress import Progress
+from property_info.validation import RetryQueue, add_arguments as add_validation_arguments, pipeline_for
+
+ARTIFACTS = ('title', 'description')
+COLUMNS = {'title': 'hotel_name', 'description': 'description'}  # Column of each artifact in `hotels`
 
 class Command(BaseCommand):
     help = "Change property titles and generate descriptions using Ollama model and update the hotels table"
 
+    default_limit = 2
+    verbosity = 1
+    system_prompt = "You are a hotel expert. Respond in a concise, informative way."
+
+    def add_arguments(self, parser):
+        selection.add_arguments(parser, self.default_limit)
+        add_budget_arguments(parser)
+        add_validation_arguments(parser)
+
     def handle(self, *args, **options):
         try:
             # Dynamically add the `description` column if it doesn't exist
@@ -24,61 +44,210 @@ class Command(BaseCommand):
                 """)
 
             # Fetch hotel data
+            sql, params = selection.select_sql(
+                ['hotel_id', 'hotel_name', 'room_type', 'location', 'description'], options, self.default_limit
+            )
             with connections['travel'].cursor() as cursor:
-                cursor.execute("SELECT hotel_id, hotel_name, room_type, location FROM hotels WHERE hotel_id IS NOT NULL LIMIT 2")
+                cursor.execute(sql, params)
                 hotels = cursor.fetchall()
 
-            for hotel_id, hotel_name, room_type, location in hotels:
+            if options.get('estimate'):
+                self.estimate(hotels, options)
+                return
+
+            self.run_id = history.new_run_id()
+            self.stdout.write(f"Run ID: {self.run_id}")
+
+            budget = run_budget(options)
+            hotel_budget = options.get('hotel_budget', settings.REWRITE_HOTEL_BUDGET)
+            skipped = []
+            remaining = []
+
+            # Each queue item is a hotel and the artifacts still to generate for it, so a
+            # retry only regenerates the title or description that failed the quality gate
+            queue = RetryQueue(
+                ((hotel, ARTIFACTS) for hotel in hotels), options.get('max_attempts', settings.OUTPUT_MAX_ATTEMPTS)
+            )
+            progress = Progress(self.stdout, len(hotels))
+            self.verbosity = options.get('verbosity', 1)
+
+            while queue:
+                (hotel, artifacts), attempt = queue.pop()
+                hotel_id, hotel_name, room_type, location, original_description = hotel
+                if budget.expired():
+                    remaining = [hotel_id] + [row[0] for row, pending in queue.pending()]
+                    break
+
                 try:
-                    # Generate new title and description
-                    hotel_name_new = self.rewrite_title(hotel_name)
-                    description = self.generate_description(hotel_name, room_type, location)
-
-                    # Handle fallback if parsing fails
-                    if hotel_name_new is None or description is None:
-                        self.stdout.write(self.style.WARNING(
-                            f"Could not parse response for hotel ID {hotel_id}. Using fallback data."
-                        ))
-                        hotel_name_new = "Name unavailable"
-                        description = "Description not available"
-
-                    # Update the `hotels` table
-                    with connections['travel'].cursor() as cursor, transaction.atomic():
-                        cursor.execute("""
-                            UPDATE hotels
-                            SET hotel_name = %s, description = %s
-                            WHERE hotel_id = %s
-                        """, [hotel_name_new, description, hotel_id])
-
-                    self.stdout.write(self.style.SUCCESS(
-                        f"Updated hotel ID {hotel_id}:\n"
-                        f"Original Name: {hotel_name}\n"
-                        f"Rewritten Name: {hotel_name_new}\n"
-                        f"Description: {description}\n"
-                    ))
+                    # Generate new title and description within one budget for the hotel
+                    budget_for_hotel = budget.child(hotel_budget)
+                    generated = {}  # artifact -> (content, trace, prompt)
+                    if 'title' in artifacts:
+                        trace = []
+                        content = self.rewrite_title(hotel_name, trace=trace, budget=budget_for_hotel)
+                        generated['title'] = (content, trace, self.title_prompt(hotel_name))
+                    if 'description' in artifacts:
+                        trace = []
+                        content = self.generate_description(
+                            hotel_name, room_type, location, trace=trace, budget=budget_for_hotel
+                        )
+                        generated['description'] = (
+                            content, trace, self.description_prompt(hotel_name, room_type, location)
+                        )
+
+                    # Only outputs passing the quality gate are written; a failed title no
+                    # longer replaces the hotel's real name with a placeholder
+                    errors = {}
+                    for artifact, (content, trace, prompt) in generated.items():
+                        artifact_errors = self.quality[artifact].errors(content, prompt=prompt, system=self.system_prompt)
+                        if artifact_errors:
+                            errors[artifact] = artifact_errors
+                    values = {
+                        artifact: content for artifact, (content, trace, prompt) in generated.items()
+                        if artifact not in errors
+                    }
+
+                    if values:
+                        # Update the `hotels` table
+                        assignments = ", ".join(f"{COLUMNS[artifact]} = %s" for artifact in values)
+                        with connections['travel'].cursor() as cursor, transaction.atomic():
+                            cursor.execute(
+                                f"UPDATE hotels SET {assignments} WHERE hotel_id = %s", [*values.values(), hotel_id]
+                            )
+                        Hotel.objects.invalidate_cached([hotel_id])
+
+                        # Keep the original name and every rewrite so a bad run can be rolled back
+                        originals = {'title': hotel_name, 'description': original_description}
+                        for artifact, content in values.items():
+                            history.record(
+                                artifact, hotel_id, content, self.run_id, generated[artifact][1],
+                                original=originals[artifact]
+                            )
+
+                        if self.verbosity >= 2:
+                            self.stdout.write(self.style.SUCCESS(
+                                f"Updated hotel ID {hotel_id}:\n"
+                                f"Original Name: {hotel_name}\n"
+                                + (f"Rewritten Name: {values['title']}\n" if 'title' in values else "")
+                                + (f"Description: {values['description']}\n" if 'description' in values else "")
+                            ))
+
+                    traces = [generation for content, trace, prompt in generated.values() for generation in trace]
+                    if errors:
+                        retrying = self.reject(queue, (hotel, tuple(errors)), attempt, [
+                            f"{artifact}: {error}" for artifact, artifact_errors in errors.items()
+                            for error in artifact_errors
+                        ])
+                        progress.step(traces, done=not retrying, error=not retrying)
+                    else:
+                        progress.step(traces)
 
+                except BudgetExceeded:
+                    if budget.expired():
+                        remaining = [hotel_id] + [row[0] for row, pending in queue.pending()]
+                        break
+                    self.stdout.write(self.style.WARNING(f"Time budget exceeded for hotel ID {hotel_id}. Skipping."))
+                    skipped.append(hotel_id)
+                    progress.step(error=True)
                 except Exception as e:
                     self.stdout.write(self.style.ERROR(
                         f"Error processing hotel ID {hotel_id}: {str(e)}"
                     ))
+                    progress.step(error=True)
+
+            progress.finish()
+            self.report_budget(skipped, remaining)
+            self.report_quality(queue)
 
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Critical error: {str(e)}"))
 
-    def rewrite_title(self, title):
-        prompt = f"""Create a unique hotel name for this hotel {title} within maximum 4 words.""" 
+    @cached_property
+    def quality(self):
+        return {artifact: pipeline_for(artifact) for artifact in ARTIFACTS}
+
+    def reject(self, queue, item, attempt, errors):
+        # Returns True when the hotel was queued for another attempt
+        hotel, artifacts = item
+        if queue.retry(item, attempt, errors):
+            if self.verbosity >= 2:
+                self.stdout.write(self.style.WARNING(
+                    f"Rejected output for hotel ID {hotel[0]} (attempt {attempt}): {'; '.join(errors)}. Will retry."
+                ))
+            return True
+        self.stdout.write(self.style.ERROR(
+            f"Rejected output for hotel ID {hotel[0]} after {attempt} attempts: {'; '.join(errors)}. "
+            f"Keeping the stored {' and '.join(artifacts)}."
+        ))
+        return False
+
+    def report_quality(self, queue):
+        if queue.retried or queue.rejected:
+            self.stdout.write(
+                f"Quality gate: {queue.retried} retries, {len(queue.rejected)} hotels rejected"
+                + (f" ({', '.join(str(item[0][0]) for item, errors in queue.rejected)})" if queue.rejected else "")
+            )
+
+    def report_budget(self, skipped, remaining):
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"{len(skipped)} hotels exceeded their time budget: {', '.join(map(str, skipped))}"
+            ))
+        if remaining or skipped:
+            path = write_checkpoint('rewrite_property_titles', self.run_id, skipped + remaining)
+            if remaining:
+                self.stdout.write(self.style.WARNING(f"Max runtime reached, {len(remaining)} hotels not processed."))
+            self.stdout.write(f"Checkpoint written to {path}; continue with --resume {path}")
+
+    def estimate(self, hotels, options):
+        # Generate for the sample without writing anything, then project the full selection
+        run_estimate = RunEstimate()
+        for hotel_id, hotel_name, room_type, location, description in hotels:
+            trace = []
+            started = time.monotonic()
+            self.rewrite_title(hotel_name, trace=trace)
+            run_estimate.add('title', time.monotonic() - started, trace)
+
+            trace = []
+            started = time.monotonic()
+            self.generate_description(hotel_name, room_type, location, trace=trace)
+            run_estimate.add('description', time.monotonic() - started, trace)
+            run_estimate.hotels += 1
+
+        total = selection.count_hotels(options, self.default_limit)
+        # Titles are rewritten one hotel at a time
+        for line in run_estimate.report(total, workers=1):
+            self.stdout.write(line)
 
-        return self.call_ollama_api(prompt)
+    def title_prompt(self, title):
+        return f"""Create a unique hotel name for this hotel {title} within maximum 4 words.""" 
 
-    def generate_description(self, title, room_type, location):
-        prompt = f"""Create a description in 30 words. 
+    def rewrite_title(self, title, trace=None, budget=None):
+        prompt = self.title_prompt(title)
+
+        # A cascade escalates to the next model when the output fails the quality gate
+        def validate(text):
+            return self.quality['title'].is_valid(text, prompt=prompt, system=self.system_prompt)
+
+        return self.call_ollama_api(prompt, task='title', validate=validate, trace=trace, budget=budget)
+
+    def description_prompt(self, title, room_type, location):
+        return f"""Create a description in 30 words. 
 
                     Using these informations
                     - Current name: {title}
                     - Room type: {room_type}
                     - Location: {location}"""
 
-        description = self.call_ollama_api(prompt)
+    def generate_description(self, title, room_type, location, trace=None, budget=None):
+        prompt = self.description_prompt(title, room_type, location)
+
+        def validate(text):
+            return self.quality['description'].is_valid(text, prompt=prompt, system=self.system_prompt)
+
+        description = self.call_ollama_api(
+            prompt, task='description', validate=validate, trace=trace, budget=budget
+        )
 
         # Fallback logic: if description is None, return a default message
         if not description:
@@ -87,33 +256,29 @@ class Command(BaseCommand):
         return description
 
 
-    def call_ollama_api(self, prompt):
+    def call_ollama_api(self, prompt, task='description', validate=None, trace=None, budget=None):
         try:
-            response = requests.post(
-                "http://ollama:11434/api/generate",
-                json={
-                    "model": "phi",  # or `phi` if you have installed `phi`
-                    "prompt": prompt,
-                    "system": "You are a hotel expert. Respond in a concise, informative way.",
-                    "stream": False
-                },
-                timeout=None
+            # The task picks the model (or cascade of models) from settings.OLLAMA_MODELS
+            result = llm.generate(
+                task,
+                prompt,
+                self.system_prompt,
+                validate=validate,
+                trace=trace,
+                budget=budget
             )
-            
-            #print(f"Response Status: {response.status_code}")  # Debugging line
-            #print(f"Response Data: {response.json()}")  # Debugging line
-
-            if response.status_code != 200:
-                self.stdout.write(self.style.ERROR(f"Ollama API error: {response.text}"))
-                return None
 
-            response_data = response.json()
-            if 'response' not in response_data or not response_data['response']:
+            if result is None or not result.text:
               return None
 
-            return response_data['response']
+            return result.text
 
-        except requests.exceptions.RequestException as e:
+        except BudgetExceeded:
+            raise
+        except llm.OllamaAPIError as e:
+            self.stdout.write(self.style.ERROR(f"Ollama API error: {str(e)}"))
+            return None
+        except llm.OllamaRequestError as e:
             self.stdout.write(self.style.ERROR(f"Request error: {str(e)}"))
             return None
         except json.JSONDecodeError as e:
@@ -123,4 +288,3 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"Unexpected error: {str(e)}"))
             return None
 
-    
\ No newline at end of file
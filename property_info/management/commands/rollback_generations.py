@@ -0,0 +1,54 @@
+# property_info/management/commands/rollback_generations.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Max, Min
+from property_info import history
+from property_info.models import GenerationHistory
+
+class Command(BaseCommand):
+    help = "Roll generated content back to an earlier version from the generation history"
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument('--run', help="Undo everything this run ID generated")
+        group.add_argument('--generation', type=int, help="Activate this generation history ID")
+        group.add_argument('--list-runs', action='store_true', help="List the most recent runs")
+
+    def handle(self, *args, **options):
+        if options['list_runs']:
+            runs = (
+                GenerationHistory.objects.exclude(run_id=GenerationHistory.SOURCE_MODEL)
+                .values('run_id', 'artifact')
+                .annotate(count=Count('id'), started=Min('created_at'), finished=Max('created_at'))
+                .order_by('-finished')[:20]
+            )
+            for run in runs:
+                self.stdout.write(
+                    f"{run['run_id']}  {run['artifact']:<14} {run['count']:>7} versions  "
+                    f"{run['started']:%Y-%m-%d %H:%M} - {run['finished']:%H:%M}"
+                )
+            return
+
+        if options['generation'] is not None:
+            generation = GenerationHistory.objects.filter(pk=options['generation']).first()
+            if generation is None:
+                raise CommandError(f"Generation {options['generation']} does not exist")
+            history.activate(generation)
+            self.stdout.write(self.style.SUCCESS(
+                f"Activated {generation.artifact} generation {generation.pk} for property {generation.property_id}"
+            ))
+            return
+
+        if not GenerationHistory.objects.filter(run_id=options['run']).exists():
+            raise CommandError(f"Run {options['run']} has no generations")
+
+        restored, removed = history.rollback_run(options['run'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled back run {options['run']}: {restored} restored to the previous version, {removed} removed"
+        ))
+
+
+##########################################
+# Run with:
+# docker-compose exec django-new python manage.py rollback_generations --list-runs
+# docker-compose exec django-new python manage.py rollback_generations --run <run id>
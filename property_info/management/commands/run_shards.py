@@ -0,0 +1,95 @@
+# property_info/management/commands/run_shards.py
+
+import argparse
+import subprocess
+import sys
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SHARDED_COMMANDS = ['rewrite_property_titles', 'rewrite_property_summary', 'rewrite_property_rating_review']
+
+
+def parse_indexes(value):
+    # "0,2,5-7" -> [0, 2, 5, 6, 7]
+    indexes = []
+    for part in value.split(','):
+        start, _, end = part.partition('-')
+        indexes.extend(range(int(start), int(end or start) + 1))
+    return indexes
+
+
+class Command(BaseCommand):
+    help = "Run a rewrite command as N shard processes (--shard I/N) and monitor them until they finish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('rewrite_command', choices=SHARDED_COMMANDS, help="Rewrite command to shard")
+        parser.add_argument(
+            'command_args', nargs=argparse.REMAINDER,
+            help="Arguments passed to every shard (everything after the command name)"
+        )
+        parser.add_argument('--shards', type=int, required=True, help="Total number of shards N across all hosts")
+        parser.add_argument(
+            '--only', type=parse_indexes,
+            help="Shard indexes to run on this host, e.g. 0-3 (default: all of them)"
+        )
+
+    def handle(self, *args, **options):
+        count = options['shards']
+        indexes = options['only'] if options['only'] is not None else list(range(count))
+        if count < 1 or any(not 0 <= index < count for index in indexes):
+            raise CommandError(f"Shard indexes must be in 0..{count - 1}")
+
+        processes = {}
+        readers = []
+        self.output_lock = threading.Lock()
+        for index in indexes:
+            process = subprocess.Popen(
+                [
+                    sys.executable, str(settings.BASE_DIR / 'manage.py'), options['rewrite_command'],
+                    '--shard', f"{index}/{count}", *options['command_args'],
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+            )
+            processes[index] = process
+            reader = threading.Thread(target=self.relay, args=(index, process), daemon=True)
+            reader.start()
+            readers.append(reader)
+
+        self.stdout.write(f"Started {len(processes)} of {count} shards: {', '.join(map(str, indexes))}")
+
+        started = time.monotonic()
+        try:
+            while any(process.poll() is None for process in processes.values()):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Interrupted, stopping shards"))
+            for process in processes.values():
+                process.terminate()
+            for process in processes.values():
+                process.wait()
+
+        for reader in readers:
+            reader.join()
+
+        failed = [index for index, process in processes.items() if process.returncode != 0]
+        elapsed = time.monotonic() - started
+        if failed:
+            raise CommandError(f"Shards {', '.join(map(str, failed))} failed after {elapsed:.0f}s")
+        self.stdout.write(self.style.SUCCESS(f"All {len(processes)} shards finished in {elapsed:.0f}s"))
+
+    def relay(self, index, process):
+        # Prefix every line with its shard so interleaved output stays readable
+        for line in process.stdout:
+            with self.output_lock:
+                self.stdout.write(f"[shard {index}] {line.rstrip()}")
+        process.stdout.close()
+
+
+##########################################
+# Run with:
+# docker-compose exec django-new python manage.py run_shards --shards 4 rewrite_property_summary --limit 0
+# On several hosts, give each a disjoint --only range of the same --shards total.
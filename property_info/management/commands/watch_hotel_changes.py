@@ -0,0 +1,116 @@
+# property_info/management/commands/watch_hotel_changes.py
+
+import time
+import psycopg
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from property_info import history, notify
+from property_info.budget import write_checkpoint
+
+# Artifacts built from the hotel columns the trigger watches. Titles are left
+# out: rewriting a name changes `hotel_name`, which would notify again.
+REGENERATE = {
+    'summary': 'rewrite_property_summary',
+    'rating_review': 'rewrite_property_rating_review',
+}
+
+RECONNECT_DELAY = 5  # Seconds before listening again after the connection was lost
+
+
+class Command(BaseCommand):
+    help = (
+        "Listen for NOTIFYs from the hotels trigger and regenerate the summaries and reviews "
+        "of changed hotels in debounced micro-batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--install', action='store_true',
+            help="Create or replace the NOTIFY trigger on the hotels table before listening"
+        )
+        parser.add_argument(
+            '--artifact', action='append', choices=sorted(REGENERATE), dest='artifacts',
+            help="Artifact to regenerate (repeat for several; default: all of them)"
+        )
+        parser.add_argument(
+            '--debounce', type=float, default=settings.WATCH_DEBOUNCE,
+            help="Seconds without new changes before a batch is regenerated (default: WATCH_DEBOUNCE)"
+        )
+        parser.add_argument(
+            '--max-wait', type=float, default=settings.WATCH_MAX_WAIT,
+            help="Longest a change waits while changes keep arriving (default: WATCH_MAX_WAIT)"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.WATCH_BATCH_SIZE,
+            help="Most hotels regenerated per batch (default: WATCH_BATCH_SIZE)"
+        )
+
+    def handle(self, *args, **options):
+        if options.get('install'):
+            notify.install_trigger()
+            self.stdout.write(self.style.SUCCESS("Installed the hotels_notify_change trigger"))
+
+        commands = [REGENERATE[artifact] for artifact in options.get('artifacts') or REGENERATE]
+        changes = notify.ChangeBuffer(
+            options.get('debounce', settings.WATCH_DEBOUNCE),
+            options.get('max_wait', settings.WATCH_MAX_WAIT),
+            options.get('batch_size', settings.WATCH_BATCH_SIZE),
+        )
+        self.verbosity = options.get('verbosity', 1)
+
+        connection = self.listen()
+        self.stdout.write(f"Listening on {notify.CHANNEL}; regenerating {', '.join(commands)}")
+        try:
+            while True:
+                while changes.due(time.monotonic()):
+                    self.regenerate(changes.take(), commands)
+
+                try:
+                    # One notification at a time, so the wait is recomputed and the deadline checked after each
+                    for notification in connection.notifies(timeout=changes.wait(time.monotonic()), stop_after=1):
+                        try:
+                            changes.add(int(notification.payload), time.monotonic())
+                        except ValueError:
+                            pass
+                except psycopg.OperationalError as e:
+                    # Changes notified while reconnecting are missed; see the README
+                    self.stdout.write(self.style.WARNING(
+                        f"Lost the listening connection ({e}); reconnecting in {RECONNECT_DELAY}s"
+                    ))
+                    time.sleep(RECONNECT_DELAY)
+                    connection = self.listen()
+        except KeyboardInterrupt:
+            if changes:
+                path = write_checkpoint('watch_hotel_changes', history.new_run_id(), list(changes.pending))
+                self.stdout.write(self.style.WARNING(
+                    f"Stopped with {len(changes)} changed hotel(s) pending; regenerate them by running "
+                    f"{' and '.join(commands)} with --resume {path}"
+                ))
+        finally:
+            connection.close()
+
+    def listen(self):
+        # A connection of its own, outside Django's (possibly pooled) ones, so it can sit in LISTEN
+        params = connections['travel'].get_connection_params()
+        connection = psycopg.connect(autocommit=True, **params)
+        connection.execute(f"LISTEN {notify.CHANNEL}")
+        return connection
+
+    def regenerate(self, hotel_ids, commands):
+        self.stdout.write(
+            f"Regenerating {len(hotel_ids)} changed hotel(s)"
+            + (f": {', '.join(map(str, hotel_ids))}" if self.verbosity >= 2 else "")
+        )
+        for name in commands:
+            try:
+                call_command(name, hotel_ids=hotel_ids, limit=0, verbosity=self.verbosity, stdout=self.stdout)
+            except Exception as e:
+                # The watcher keeps running; the hotels are regenerated on their next change or full run
+                self.stdout.write(self.style.ERROR(f"{name} failed for {len(hotel_ids)} hotel(s): {str(e)}"))
+
+
+##########################################
+# Run with:
+# docker-compose exec django-new python manage.py watch_hotel_changes --install
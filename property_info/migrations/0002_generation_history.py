@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property_info', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('artifact', models.CharField(choices=[('title', 'Title'), ('description', 'Description'), ('summary', 'Summary'), ('rating_review', 'Rating and review')], max_length=32)),
+                ('property_id', models.BigIntegerField()),
+                ('run_id', models.CharField(max_length=32)),
+                ('model', models.CharField(max_length=255)),
+                ('prompt_hash', models.CharField(blank=True, max_length=64)),
+                ('content', models.TextField()),
+                ('rating', models.FloatField(blank=True, null=True)),
+                ('latency', models.FloatField(default=0.0)),
+                ('prompt_tokens', models.IntegerField(default=0)),
+                ('completion_tokens', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'generation_history',
+                'indexes': [models.Index(fields=['artifact', 'property_id', 'created_at'], name='generation__artifac_f00673_idx'), models.Index(fields=['run_id'], name='generation__run_id_10e6fe_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ActiveGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('artifact', models.CharField(choices=[('title', 'Title'), ('description', 'Description'), ('summary', 'Summary'), ('rating_review', 'Rating and review')], max_length=32)),
+                ('property_id', models.BigIntegerField()),
+                ('generation', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='property_info.generationhistory')),
+            ],
+            options={
+                'db_table': 'active_generation',
+                'constraints': [models.UniqueConstraint(fields=('artifact', 'property_id'), name='unique_active_generation')],
+            },
+        ),
+    ]
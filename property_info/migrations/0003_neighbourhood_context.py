@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property_info', '0002_generation_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NeighbourhoodContext',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.CharField(max_length=12, unique=True)),
+                ('context', models.TextField()),
+                ('model', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'neighbourhood_context',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:33
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property_info', '0003_neighbourhood_context'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyratingreview',
+            name='search',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('review', config='english'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddField(
+            model_name='propertysummary',
+            name='search',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('summary', config='english'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='propertyratingreview',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search'], name='property_review_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertysummary',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search'], name='property_summary_search_idx'),
+        ),
+    ]
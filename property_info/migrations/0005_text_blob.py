@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property_info', '0004_content_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('compression', models.CharField(blank=True, max_length=8)),
+                ('size', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'text_blob',
+            },
+        ),
+        # Blobs are already compressed (or too short to gain anything); keep TOAST from compressing them again
+        migrations.RunSQL(
+            "ALTER TABLE text_blob ALTER COLUMN data SET STORAGE EXTERNAL",
+            "ALTER TABLE text_blob ALTER COLUMN data SET STORAGE EXTENDED",
+        ),
+        migrations.AlterField(
+            model_name='generationhistory',
+            name='content',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='generationhistory',
+            name='blob',
+            field=models.ForeignKey(blank=True, db_column='blob_hash', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='property_info.textblob'),
+        ),
+    ]
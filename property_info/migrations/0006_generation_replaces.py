@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property_info', '0005_text_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationhistory',
+            name='replaces',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='property_info.generationhistory'),
+        ),
+        # Versions recorded before this field existed replaced the one before them
+        migrations.RunSQL(
+            """
+            UPDATE generation_history g SET replaces_id = ordered.previous
+            FROM (
+                SELECT id, LAG(id) OVER (PARTITION BY artifact, property_id ORDER BY created_at, id) AS previous
+                FROM generation_history
+            ) ordered
+            WHERE g.id = ordered.id AND ordered.previous IS NOT NULL
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
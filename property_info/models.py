@@ -1,12 +1,68 @@
 # property_info/models.py
 
 
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 
+from property_info import blobs
+from property_info.cache import TTLCache
+
+# Columns the generation prompts read; everything else stays deferred
+HOTEL_PROMPT_FIELDS = (
+    'hotel_id', 'city_id', 'hotel_name', 'price', 'rating', 'room_type',
+    'location', 'latitude', 'longitude', 'description',
+)
+
+# Text search configuration of the generated content's search vectors
+SEARCH_CONFIG = 'english'
+
+_hotel_cache = None
+
+
+def hotel_cache():
+    global _hotel_cache
+    if _hotel_cache is None:
+        _hotel_cache = TTLCache(
+            maxsize=getattr(settings, 'HOTEL_CACHE_SIZE', 10000),
+            ttl=getattr(settings, 'HOTEL_CACHE_TTL', 300),
+        )
+    return _hotel_cache
+
+
 class HotelManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().using('travel')
 
+    def in_bulk_cached(self, hotel_ids, batch_size=1000):
+        """Return ``{hotel_id: Hotel}`` for ``hotel_ids``.
+
+        Hotels are served from the in-process LRU while fresh; only the misses
+        are loaded from the ``travel`` database, in batches and restricted to
+        ``HOTEL_PROMPT_FIELDS``. Cached instances are shared, so treat them as
+        read-only.
+        """
+        hotel_ids = set(hotel_ids)
+        cache = hotel_cache()
+        hotels = cache.get_many(hotel_ids)
+
+        missing = sorted(hotel_ids - hotels.keys())
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            loaded = {
+                hotel.hotel_id: hotel
+                for hotel in self.get_queryset().only(*HOTEL_PROMPT_FIELDS).filter(hotel_id__in=batch)
+            }
+            cache.set_many(loaded)
+            hotels.update(loaded)
+
+        return hotels
+
+    def invalidate_cached(self, hotel_ids=None):
+        # Drop stale entries after hotels are rewritten (or everything when no ids are given)
+        hotel_cache().invalidate(hotel_ids)
+
 class Hotel(models.Model):
     city_id = models.IntegerField()
     hotel_id = models.BigIntegerField()
@@ -34,9 +90,18 @@ class Hotel(models.Model):
 class PropertySummary(models.Model):
     property_id = models.IntegerField()  # Reference to the property
     summary = models.TextField()  # Summary generated by the LLM model
+    # Computed by Postgres whenever the summary is written
+    search = models.GeneratedField(
+        expression=SearchVector('summary', config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         db_table = 'property_summary'
+        indexes = [
+            GinIndex(fields=['search'], name='property_summary_search_idx'),
+        ]
 
     def __str__(self):
         return f"Property ID: {self.property_id} - Summary"
@@ -46,9 +111,128 @@ class PropertyRatingReview(models.Model):
     property_id = models.IntegerField()  # Reference to the property
     rating = models.FloatField()  
     review = models.TextField()  
+    search = models.GeneratedField(
+        expression=SearchVector('review', config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         db_table = 'property_rating_review'
+        indexes = [
+            GinIndex(fields=['search'], name='property_review_search_idx'),
+        ]
+
+    def __str__(self):
+        return f"Property ID: {self.property_id} - Rating: {self.rating}"
+
+class TextBlobManager(models.Manager):
+    def store(self, texts, compression=None):
+        """Save the ``texts`` that aren't stored yet and return ``{text: hash}``.
+
+        Blobs are addressed by the hash of their text, so a text generated for
+        many properties (or kept across many versions) is stored once.
+        Concurrent writers inserting the same text are fine.
+        """
+        hashes = {text: blobs.digest(text) for text in texts}
+        stored = set(self.filter(hash__in=set(hashes.values())).values_list('hash', flat=True))
+        new = []
+        for text, digest in hashes.items():
+            if digest not in stored:
+                data, codec = blobs.encode(text, compression)
+                new.append(self.model(hash=digest, data=data, compression=codec, size=len(text.encode('utf-8'))))
+        self.bulk_create(new, ignore_conflicts=True)
+        return hashes
+
+
+class TextBlob(models.Model):
+    # Generated text shared by the history versions that have it, keyed by its SHA-256
+    hash = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    compression = models.CharField(max_length=8, blank=True)  # '' (UTF-8) or 'zstd'
+    size = models.IntegerField()  # Bytes of the UTF-8 text, before compression
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TextBlobManager()
+
+    class Meta:
+        db_table = 'text_blob'
+
+    @property
+    def text(self):
+        return blobs.decode(self.data, self.compression)
+
+    def __str__(self):
+        return f"{self.hash[:12]} ({self.size} bytes{', ' + self.compression if self.compression else ''})"
+
+
+class GenerationHistory(models.Model):
+    ARTIFACT_CHOICES = [
+        ('title', 'Title'),
+        ('description', 'Description'),
+        ('summary', 'Summary'),
+        ('rating_review', 'Rating and review'),
+    ]
+    SOURCE_MODEL = 'source'  # Content that existed before the first generation
+
+    artifact = models.CharField(max_length=32, choices=ARTIFACT_CHOICES)
+    property_id = models.BigIntegerField()  # hotel_id of the property
+    run_id = models.CharField(max_length=32)  # Command run that produced this version
+    model = models.CharField(max_length=255)
+    prompt_hash = models.CharField(max_length=64, blank=True)
+    content = models.TextField(blank=True)  # Empty when the text is in ``blob``
+    blob = models.ForeignKey(
+        TextBlob, null=True, blank=True, on_delete=models.PROTECT, db_column='blob_hash', related_name='+',
+    )
+    # Version that was active when this one replaced it; rolling back restores it
+    replaces = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    rating = models.FloatField(null=True, blank=True)  # Only for rating_review
+    latency = models.FloatField(default=0.0)  # Seconds spent in the model(s)
+    prompt_tokens = models.IntegerField(default=0)
+    completion_tokens = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'generation_history'
+        indexes = [
+            models.Index(fields=['artifact', 'property_id', 'created_at']),
+            models.Index(fields=['run_id']),
+        ]
+
+    @property
+    def text(self):
+        """The generated text, wherever it is stored."""
+        return self.content if self.blob_id is None else self.blob.text
+
+    def __str__(self):
+        return f"Property ID: {self.property_id} - {self.artifact} by {self.model} ({self.run_id})"
+
+
+class ActiveGeneration(models.Model):
+    # Pointer to the version of an artifact currently served for a property
+    artifact = models.CharField(max_length=32, choices=GenerationHistory.ARTIFACT_CHOICES)
+    property_id = models.BigIntegerField()
+    generation = models.ForeignKey(GenerationHistory, on_delete=models.PROTECT, related_name='+')
+
+    class Meta:
+        db_table = 'active_generation'
+        constraints = [
+            models.UniqueConstraint(fields=['artifact', 'property_id'], name='unique_active_generation'),
+        ]
+
+    def __str__(self):
+        return f"Property ID: {self.property_id} - {self.artifact} -> {self.generation_id}"
+
+
+class NeighbourhoodContext(models.Model):
+    # Location context generated once per geohash cell and shared by the prompts of its hotels
+    cell = models.CharField(max_length=12, unique=True)
+    context = models.TextField()
+    model = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'neighbourhood_context'
 
     def __str__(self):
-        return f"Property ID: {self.property_id} - Rating: {self.rating}"
\ No newline at end of file
+        return f"Cell {self.cell}"
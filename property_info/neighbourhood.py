@@ -0,0 +1,117 @@
+# property_info/neighbourhood.py
+
+import threading
+from functools import cached_property
+
+from django.conf import settings
+from django.db import connections
+
+from property_info import llm
+from property_info.geo import cell_bounds, cell_order, neighbourhood_cell
+from property_info.models import NeighbourhoodContext
+from property_info.validation import pipeline_for
+
+SYSTEM_PROMPT = "You are a local travel guide. Describe areas factually and briefly."
+MAX_LOCATIONS = 5  # Location strings of a cell's hotels quoted in its prompt
+
+
+def prompt_line(context):
+    """Line added to a hotel prompt after its coordinates; empty without a context."""
+    return f"\n        Neighbourhood: {context}" if context else ""
+
+
+class Neighbourhoods:
+    """Location context per geohash cell, generated once and shared by the hotels in the cell.
+
+    Contexts are kept in memory for the run and in ``NeighbourhoodContext``
+    across runs, so a cell costs one generation however many hotels it has.
+    """
+
+    def __init__(self):
+        self.contexts = {}  # cell -> context, None when generation failed this run
+        self.generated = 0
+        self.reused = 0
+        self._lock = threading.Lock()  # Guards the dicts and counters, never held across a query or generation
+        self._cell_locks = {}  # cell -> lock held while its context is looked up or generated
+
+    @staticmethod
+    def order():
+        # Hotels of a cell come one after the other, so its context is generated once and reused right away
+        return cell_order(settings.NEIGHBOURHOOD_PRECISION)
+
+    def cell(self, latitude, longitude):
+        if latitude is None or longitude is None:
+            return None
+        return neighbourhood_cell(latitude, longitude)
+
+    @cached_property
+    def quality(self):
+        return pipeline_for('neighbourhood')
+
+    def context(self, latitude, longitude, budget=None):
+        cell = self.cell(latitude, longitude)
+        if cell is None:
+            return None
+
+        # One prompt worker generates a cell's context while the others of the same cell wait for it;
+        # workers of other cells go on with theirs
+        with self._lock:
+            if cell in self.contexts:
+                self.reused += 1
+                return self.contexts[cell]
+            cell_lock = self._cell_locks.setdefault(cell, threading.Lock())
+
+        with cell_lock:
+            with self._lock:
+                if cell in self.contexts:
+                    self.reused += 1
+                    return self.contexts[cell]
+
+            stored = NeighbourhoodContext.objects.filter(cell=cell).values_list('context', flat=True).first()
+            if stored is not None:
+                with self._lock:
+                    self.reused += 1
+            else:
+                stored = self.generate(cell, latitude, longitude, budget)
+            with self._lock:
+                self.contexts[cell] = stored
+            return stored
+
+    def locations(self, latitude, longitude):
+        """Return a few distinct location strings of the hotels in the cell of a point."""
+        min_lat, min_lon, max_lat, max_lon = cell_bounds(latitude, longitude, settings.NEIGHBOURHOOD_PRECISION)
+        with connections['travel'].cursor() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT location FROM hotels
+                WHERE latitude >= %s AND latitude < %s AND longitude >= %s AND longitude < %s
+                  AND location IS NOT NULL AND location <> ''
+                LIMIT %s
+            """, [min_lat, max_lat, min_lon, max_lon, MAX_LOCATIONS])
+            return [row[0] for row in cursor.fetchall()]
+
+    def prompt(self, cell, latitude, longitude):
+        locations = '; '.join(self.locations(latitude, longitude)) or "unknown"
+        return f"""Describe the neighbourhood around latitude {float(latitude):.4f}, longitude {float(longitude):.4f} (known locally as: {locations}).
+
+        Mention its character, nearby sights and transport links in no more than 3 sentences.
+        Do not mention any hotel."""
+
+    def generate(self, cell, latitude, longitude, budget=None):
+        # BudgetExceeded propagates so the hotel that asked is skipped like any other timeout
+        prompt = self.prompt(cell, latitude, longitude)
+
+        def validate(text):
+            return self.quality.is_valid(text, prompt=prompt, system=SYSTEM_PROMPT)
+
+        try:
+            result = llm.generate('neighbourhood', prompt, SYSTEM_PROMPT, validate=validate, budget=budget)
+        except (llm.OllamaAPIError, llm.OllamaRequestError):
+            return None
+        if result is None or not validate(result.text):
+            return None
+
+        text = result.text.strip()
+        NeighbourhoodContext.objects.update_or_create(cell=cell, defaults={'context': text, 'model': result.model})
+        with self._lock:
+            self.generated += 1
+        return text
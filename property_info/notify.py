@@ -0,0 +1,98 @@
+# property_info/notify.py
+
+import itertools
+
+from django.db import connections
+
+CHANNEL = 'hotel_changes'
+
+# Columns the summary and review prompts are built from; other changes (e.g.
+# the generated description) don't make the content stale
+PROMPT_COLUMNS = ('hotel_name', 'price', 'rating', 'room_type', 'location', 'latitude', 'longitude')
+
+_old = ", ".join(f"OLD.{column}" for column in PROMPT_COLUMNS)
+_new = ", ".join(f"NEW.{column}" for column in PROMPT_COLUMNS)
+
+TRIGGER_SQL = f"""
+    CREATE OR REPLACE FUNCTION notify_hotel_change() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.hotel_id IS NULL THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            IF ROW({_old}) IS NOT DISTINCT FROM ROW({_new}) THEN
+                RETURN NULL;
+            END IF;
+        END IF;
+        -- Identical notifications of one transaction are delivered once
+        PERFORM pg_notify('{CHANNEL}', NEW.hotel_id::text);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS hotels_notify_change ON hotels;
+    CREATE TRIGGER hotels_notify_change
+        AFTER INSERT OR UPDATE OF {", ".join(PROMPT_COLUMNS)} ON hotels
+        FOR EACH ROW EXECUTE FUNCTION notify_hotel_change();
+"""
+
+DROP_TRIGGER_SQL = """
+    DROP TRIGGER IF EXISTS hotels_notify_change ON hotels;
+    DROP FUNCTION IF EXISTS notify_hotel_change();
+"""
+
+
+def install_trigger():
+    """Create (or replace) the trigger notifying ``CHANNEL`` when a hotel's prompt inputs change."""
+    with connections['travel'].cursor() as cursor:
+        cursor.execute(TRIGGER_SQL)
+
+
+def remove_trigger():
+    with connections['travel'].cursor() as cursor:
+        cursor.execute(DROP_TRIGGER_SQL)
+
+
+class ChangeBuffer:
+    """Changed hotel_ids waiting to be regenerated, coalesced and released in micro-batches.
+
+    A batch is due once no change has arrived for ``debounce`` seconds, the
+    oldest pending change has waited ``max_wait`` seconds, or ``batch_size``
+    hotels are pending. A hotel changed several times is regenerated once.
+    """
+
+    def __init__(self, debounce, max_wait, batch_size):
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.batch_size = batch_size
+        self.pending = {}  # hotel_id -> time of its first pending change, oldest first
+        self.last_change = None
+        self.received = 0  # Notifications, before coalescing
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, hotel_id, now):
+        self.received += 1
+        self.pending.setdefault(hotel_id, now)
+        self.last_change = now
+
+    def deadline(self):
+        oldest = next(iter(self.pending.values()))
+        return min(self.last_change + self.debounce, oldest + self.max_wait)
+
+    def due(self, now):
+        return bool(self.pending) and (len(self.pending) >= self.batch_size or now >= self.deadline())
+
+    def wait(self, now):
+        """Seconds until a batch is due; None while nothing is pending."""
+        if not self.pending:
+            return None
+        return max(0.0, self.deadline() - now)
+
+    def take(self):
+        """Remove and return the oldest ``batch_size`` pending hotel_ids."""
+        hotel_ids = list(itertools.islice(self.pending, self.batch_size))
+        for hotel_id in hotel_ids:
+            del self.pending[hotel_id]
+        return hotel_ids
@@ -0,0 +1,232 @@
+# property_info/pipeline.py
+
+import argparse
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connections
+
+STAGES = ('prompt', 'generate', 'validate', 'write')  # Stages after fetch, in order
+_STOP = object()  # Sent to each worker of a stage once everything before it is done
+
+
+@dataclass
+class Job:
+    """A hotel moving through the rewrite stages."""
+    hotel: tuple
+    attempt: int = 1
+    prompt: str = ''         # Base prompt, which outputs are validated against
+    neighbourhood: str = None
+    budget: object = None    # Time budget of the hotel, shared by its stages
+    output: object = None
+    original: object = None  # Stored content the output replaces, for the history
+    trace: list = field(default_factory=list)
+
+
+class Stage:
+    """A step of a ``Pipeline``: ``workers`` threads applying ``function`` to the items of a bounded queue.
+
+    ``function`` returns what is handed to the next stage, or None to drop the
+    item. With ``batch``, it gets a list of up to ``batch`` queued items.
+    """
+
+    def __init__(self, name, function, workers=1, depth=16, batch=None):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.depth = depth
+        self.batch = batch
+        self.queue = queue.Queue(maxsize=depth)
+        self.processed = 0
+        self.busy = 0.0     # Seconds spent in ``function``, summed over the workers
+        self.blocked = 0.0  # Seconds spent waiting for room in the next stage's queue
+        self.peak = 0       # Deepest the queue has been
+        self._lock = threading.Lock()
+        self._stopped = 0
+
+    def put(self, item):
+        """Queue ``item``, waiting while the queue is full; returns the seconds waited."""
+        started = time.monotonic()
+        self.queue.put(item)
+        self.peak = max(self.peak, self.queue.qsize())
+        return time.monotonic() - started
+
+    def take(self):
+        """Return the next item, or a batch of them; None once the stage has to stop."""
+        item = self.queue.get()
+        if item is _STOP or not self.batch:
+            return None if item is _STOP else item
+
+        items = [item]
+        while len(items) < self.batch:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self.queue.put(_STOP)  # Take it again once this batch is done
+                break
+            items.append(item)
+        return items
+
+
+class Pipeline:
+    """Runs the items of ``source`` through ``stages`` connected by bounded queues.
+
+    ``source`` is consumed by a fetch thread. Every queue has a fixed capacity,
+    so a stage producing faster than the next one consumes waits instead of
+    buffering: memory is bounded by the queue depths whatever the size of the
+    run, and the slowest stage shows up as a full queue in front of it.
+
+    An exception raised by a stage is passed to ``on_error(stage_name, item,
+    exception)`` and the item is dropped; the run goes on.
+    """
+
+    def __init__(self, source, stages, on_error=None):
+        self.source = source
+        self.stages = list(stages)
+        self.on_error = on_error
+        self.fetched = 0
+        self.fetch_blocked = 0.0
+        self.started = self.finished = None
+        self.failure = None  # Raised by run(): a fetch error, or a stage error without on_error
+
+    def run(self):
+        self.started = time.monotonic()
+        threads = [threading.Thread(target=self.fetch, name='pipeline-fetch', daemon=True)]
+        for index, stage in enumerate(self.stages):
+            following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            threads += [
+                threading.Thread(
+                    target=self.work, args=(stage, following), name=f'pipeline-{stage.name}-{number}', daemon=True
+                )
+                for number in range(stage.workers)
+            ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.finished = time.monotonic()
+
+        if self.failure is not None:
+            raise self.failure
+
+    def fetch(self):
+        first = self.stages[0]
+        try:
+            for item in self.source:
+                self.fetched += 1
+                self.fetch_blocked += first.put(item)
+        except Exception as e:
+            self.failure = e
+        finally:
+            connections.close_all()  # Only this thread's connections
+            for _ in range(first.workers):
+                first.queue.put(_STOP)
+
+    def work(self, stage, following):
+        try:
+            while (item := stage.take()) is not None:
+                started = time.monotonic()
+                try:
+                    result = stage.function(item)
+                except Exception as e:
+                    result = None
+                    if self.on_error is None:
+                        self.failure = self.failure or e
+                    else:
+                        self.on_error(stage.name, item, e)
+
+                with stage._lock:
+                    stage.busy += time.monotonic() - started
+                    stage.processed += len(item) if stage.batch else 1
+
+                if result is not None and following is not None:
+                    waited = following.put(result)
+                    with stage._lock:
+                        stage.blocked += waited
+        finally:
+            connections.close_all()
+            with stage._lock:
+                stage._stopped += 1
+                last = stage._stopped == stage.workers
+            if last and following is not None:
+                for _ in range(following.workers):
+                    following.queue.put(_STOP)
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def utilization(self, stage):
+        """Share of its workers' time ``stage`` has spent working."""
+        elapsed = self.elapsed()
+        return stage.busy / (stage.workers * elapsed) if elapsed else 0.0
+
+    def slowest(self):
+        return max(self.stages, key=self.utilization)
+
+    def status(self):
+        """Queue depths and the slowest stage, for progress lines."""
+        depths = ", ".join(f"{stage.name} {stage.queue.qsize()}/{stage.depth}" for stage in self.stages)
+        return f"queues {depths} | slowest {self.slowest().name}"
+
+    def report(self):
+        lines = [f"  {'fetch':<9} 1 worker(s)  {self.fetched:>7} items  waited {self.fetch_blocked:.1f}s for room"]
+        for stage in self.stages:
+            lines.append(
+                f"  {stage.name:<9} {stage.workers} worker(s)  {stage.processed:>7} items  "
+                f"busy {100 * self.utilization(stage):.0f}%  waited {stage.blocked:.1f}s for room  "
+                f"peak queue {stage.peak}/{stage.depth}"
+            )
+        slowest = self.slowest()
+        lines.append(
+            f"Slowest stage: {slowest.name} ({100 * self.utilization(slowest):.0f}% busy with {slowest.workers} worker(s))"
+        )
+        return lines
+
+
+def parse_stage_values(value):
+    """Parse ``STAGE=N[,STAGE=N...]``, or a plain ``N`` for every stage."""
+    try:
+        if '=' not in value:
+            return dict.fromkeys(STAGES, int(value))
+        values = {}
+        for part in value.split(','):
+            name, number = part.split('=')
+            values[name.strip()] = int(number)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected STAGE=N[,STAGE=N...] or N, got {value!r}")
+
+    unknown = set(values) - set(STAGES)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stage(s) {', '.join(sorted(unknown))}; expected {', '.join(STAGES)}")
+    if any(number < 1 for number in values.values()):
+        raise argparse.ArgumentTypeError(f"values must be at least 1, got {value!r}")
+    return values
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--workers', type=parse_stage_values, metavar='STAGE=N[,...]',
+        help=f"Threads per stage ({', '.join(STAGES)}; default: REWRITE_STAGE_WORKERS)"
+    )
+    parser.add_argument(
+        '--queue-depth', type=parse_stage_values, metavar='[STAGE=]N[,...]',
+        help="Capacity of the queue in front of each stage (default: REWRITE_QUEUE_DEPTH)"
+    )
+
+
+def stage_options(options):
+    """Return ``(workers, depths)`` per stage from the settings and the command options."""
+    workers = {name: 1 for name in STAGES}
+    workers.update(settings.REWRITE_STAGE_WORKERS)
+    workers.update(options.get('workers') or {})
+    depths = dict.fromkeys(STAGES, settings.REWRITE_QUEUE_DEPTH)
+    depths.update(options.get('queue_depth') or {})
+    return workers, depths
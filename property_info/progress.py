@@ -0,0 +1,64 @@
+# property_info/progress.py
+
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from property_info.estimate import format_duration
+
+
+class Progress:
+    """One-line status of a run, written at most every ``interval`` seconds.
+
+    ``step()`` is called once per attempt, from any thread; ``done=False``
+    marks an attempt that will be retried, so it counts towards latency but
+    not progress. ``status``, when set, is called for extra text such as the
+    pipeline's queue depths.
+    """
+
+    def __init__(self, stdout, total, interval=None, window=50, status=None):
+        self.stdout = stdout
+        self.total = total
+        self.interval = settings.PROGRESS_INTERVAL if interval is None else interval
+        self.processed = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)  # Seconds of the most recent model calls
+        self.started = time.monotonic()
+        self.last_write = self.started
+        self.status = status
+        self._lock = threading.Lock()
+
+    def step(self, trace=(), done=True, error=False):
+        with self._lock:
+            self.latencies.extend(attempt.latency for attempt in trace if attempt.latency)
+            if done:
+                self.processed += 1
+            if error:
+                self.errors += 1
+
+            now = time.monotonic()
+            if now - self.last_write >= self.interval:
+                self.last_write = now
+                self.stdout.write(self.line(now))
+
+    def line(self, now=None, final=False):
+        elapsed = (now or time.monotonic()) - self.started
+        rate = self.processed / elapsed if elapsed > 0 else 0.0
+        percent = 100 * self.processed / self.total if self.total else 100
+        latency = f"{sum(self.latencies) / len(self.latencies):.1f}s" if self.latencies else "-"
+        if final:
+            timing = f"done in {format_duration(elapsed)}"
+        else:
+            timing = f"ETA {format_duration((self.total - self.processed) / rate) if rate else '-'}"
+        line = (
+            f"{self.processed}/{self.total} hotels ({percent:.0f}%) | {rate:.2f} hotels/s | "
+            f"LLM {latency} | {self.errors} errors | {timing}"
+        )
+        if self.status is not None and not final:
+            line += f" | {self.status()}"
+        return line
+
+    def finish(self):
+        self.stdout.write(self.line(final=True))
@@ -0,0 +1,292 @@
+# property_info/rewrite.py
+
+import time
+from functools import cached_property
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.utils import IntegrityError
+
+from property_info import history, selection
+from property_info.budget import BudgetExceeded, add_arguments as add_budget_arguments, run_budget, write_checkpoint
+from property_info.estimate import RunEstimate
+from property_info.neighbourhood import Neighbourhoods
+from property_info.pipeline import Job, Pipeline, Stage, add_arguments as add_pipeline_arguments, stage_options
+from property_info.progress import Progress
+from property_info.semantic_cache import REUSE, SEED, SemanticCache
+from property_info.validation import RetryQueue, add_arguments as add_validation_arguments, pipeline_for
+
+
+class PipelineCommand(BaseCommand):
+    """Base of the commands generating one artifact per hotel through the rewrite ``Pipeline``.
+
+    Subclasses set ``artifact``, ``label``, ``plural``, ``columns`` (selected
+    from ``hotels``, starting with hotel_id and hotel_name) and ``model`` (the
+    table the artifact is served from), and implement the prompt and parsing
+    side: ``prompt``, ``produce``, ``errors``, ``values`` and ``versions``.
+    """
+
+    artifact = None
+    label = None    # Name of the artifact in messages
+    plural = None
+    columns = ()
+    model = None
+    default_limit = 10
+    semantic_cache = None
+    neighbourhoods = None
+    verbosity = 1
+    system_prompt = None
+
+    def prompt(self, hotel, neighbourhood=None):
+        """Return the prompt for ``hotel``, a row of ``columns``."""
+        raise NotImplementedError
+
+    def produce(self, hotel, trace=None, budget=None, neighbourhood=None):
+        """Generate the output for ``hotel``; what ``errors``, ``values`` and ``versions`` take."""
+        raise NotImplementedError
+
+    def errors(self, output, prompt):
+        """Return the quality gate's rejection reasons for ``output``."""
+        raise NotImplementedError
+
+    def values(self, output):
+        """Return the ``model`` fields storing ``output``."""
+        raise NotImplementedError
+
+    def versions(self, output=None, row=None):
+        """Return ``(content, rating)`` for the history, of ``output`` or of a stored ``row``."""
+        raise NotImplementedError
+
+    def add_arguments(self, parser):
+        selection.add_arguments(parser, self.default_limit)
+        add_budget_arguments(parser)
+        add_validation_arguments(parser)
+        add_pipeline_arguments(parser)
+        parser.add_argument(
+            '--semantic-cache', action='store_true',
+            help=f"Reuse {self.plural} of near-duplicate hotels instead of generating each one"
+        )
+        parser.add_argument(
+            '--neighbourhood-context', action='store_true',
+            help="Add a location context generated once per neighbourhood to each prompt"
+        )
+
+    @property
+    def command_name(self):
+        return self.__module__.rsplit('.', 1)[-1]
+
+    def handle(self, *args, **options):
+        if options.get('semantic_cache'):
+            self.semantic_cache = SemanticCache(self.artifact, path=settings.SEMANTIC_CACHE_PATH)
+        if options.get('neighbourhood_context'):
+            self.neighbourhoods = Neighbourhoods()
+
+        sql, params = selection.select_sql(
+            list(self.columns), options, self.default_limit,
+            order=self.neighbourhoods and self.neighbourhoods.order()
+        )
+
+        if options.get('estimate'):
+            self.estimate(list(self.fetch(sql, params)), options)
+            return
+
+        self.run_id = history.new_run_id()
+        self.stdout.write(f"Run ID: {self.run_id}")
+
+        self.budget = run_budget(options)
+        self.hotel_budget = options.get('hotel_budget', settings.REWRITE_HOTEL_BUDGET)
+        self.skipped = []
+        self.remaining = []
+        self.queue = RetryQueue([], options.get('max_attempts', settings.OUTPUT_MAX_ATTEMPTS))
+        self.progress = Progress(self.stdout, selection.count_selected(options, self.default_limit))
+        self.verbosity = options.get('verbosity', 1)
+
+        # Hotels stream through the stages; outputs rejected by the quality gate
+        # are regenerated in another pass once everything else is done
+        source = ((hotel, 1) for hotel in self.fetch(sql, params))
+        first_pass = None
+        while source:
+            pipeline = Pipeline(source, self.stages(options), on_error=self.failed)
+            self.progress.status = pipeline.status
+            pipeline.run()
+            first_pass = first_pass or pipeline
+            source = [self.queue.pop() for _ in range(len(self.queue))]
+
+        self.progress.finish()
+        for line in first_pass.report():
+            self.stdout.write(line)
+        self.report_budget(self.skipped, sorted(self.remaining))
+        self.report_quality(self.queue)
+
+        if self.semantic_cache is not None:
+            self.semantic_cache.save()
+            self.stdout.write(
+                f"Semantic cache: {self.semantic_cache.hits[REUSE]} reused, "
+                f"{self.semantic_cache.hits[SEED]} seeded, {len(self.semantic_cache)} cached"
+            )
+
+        if self.neighbourhoods is not None:
+            self.stdout.write(
+                f"Neighbourhood context: {self.neighbourhoods.generated} generated, "
+                f"{self.neighbourhoods.reused} reused"
+            )
+
+    def fetch(self, sql, params):
+        # A server-side cursor streams the selection, so only one chunk of rows is held at a time
+        with connections['travel'].chunked_cursor() as cursor:
+            cursor.execute(sql, params)
+            while hotels := cursor.fetchmany(settings.REWRITE_FETCH_SIZE):
+                yield from hotels
+
+    def stages(self, options):
+        workers, depths = stage_options(options)
+        return [
+            Stage('prompt', self.prepare, workers['prompt'], depths['prompt']),
+            Stage('generate', self.generate, workers['generate'], depths['generate']),
+            Stage('validate', self.validate, workers['validate'], depths['validate']),
+            Stage('write', self.write, workers['write'], depths['write'], batch=settings.REWRITE_WRITE_BATCH),
+        ]
+
+    def column(self, hotel, name):
+        return hotel[self.columns.index(name)]
+
+    def prepare(self, item):
+        hotel, attempt = item
+        if self.budget.expired():
+            self.remaining.append(hotel[0])
+            return None
+
+        # One budget per hotel covers its neighbourhood context and its generation
+        job = Job(hotel, attempt, budget=self.budget.child(self.hotel_budget))
+        job.prompt = self.prompt(hotel)
+        if self.neighbourhoods is not None:
+            job.neighbourhood = self.neighbourhoods.context(
+                self.column(hotel, 'latitude'), self.column(hotel, 'longitude'), budget=job.budget
+            )
+        return job
+
+    def generate(self, job):
+        if self.budget.expired():
+            self.remaining.append(job.hotel[0])
+            return None
+
+        job.output = self.produce(
+            job.hotel, trace=job.trace, budget=job.budget, neighbourhood=job.neighbourhood
+        )
+        return job
+
+    def validate(self, job):
+        # Nothing is written unless the output passes the quality gate,
+        # so a failed generation never replaces stored content with a fallback
+        errors = self.errors(job.output, job.prompt)
+        if errors:
+            retrying = self.reject(self.queue, job.hotel, job.attempt, errors)
+            self.progress.step(job.trace, done=not retrying, error=not retrying)
+            return None
+        return job
+
+    def write(self, jobs):
+        # One transaction and one lookup of the existing rows per batch
+        with transaction.atomic():
+            existing = {
+                row.property_id: row
+                for row in self.model.objects.filter(property_id__in=[job.hotel[0] for job in jobs])
+            }
+            updated, created = [], []
+            for job in jobs:
+                values = self.values(job.output)
+                row = existing.get(job.hotel[0])
+                job.original = self.versions(row=row) if row else (None, None)
+                if row:
+                    for field, value in values.items():
+                        setattr(row, field, value)
+                    updated.append(row)
+                else:
+                    created.append(self.model(property_id=job.hotel[0], **values))
+            if updated:
+                self.model.objects.bulk_update(updated, list(values))
+            if created:
+                self.model.objects.bulk_create(created)
+
+            # Keep every version so a bad run can be rolled back
+            for job in jobs:
+                content, rating = self.versions(output=job.output)
+                history.record(
+                    self.artifact, job.hotel[0], content, self.run_id, job.trace,
+                    rating=rating, original=job.original[0], original_rating=job.original[1]
+                )
+
+        for job in jobs:
+            if self.verbosity >= 2:
+                action = "Updated" if job.original[0] is not None else "Created new"
+                self.stdout.write(self.style.SUCCESS(f"{action} {self.label} for {job.hotel[1]}"))
+            self.progress.step(job.trace)
+
+    def failed(self, stage, item, error):
+        # Errors of the write stage concern a whole batch
+        for job in item if isinstance(item, list) else [item]:
+            hotel_id = job.hotel[0] if isinstance(job, Job) else job[0][0]
+            if isinstance(error, BudgetExceeded):
+                if self.budget.expired():
+                    self.remaining.append(hotel_id)
+                    continue
+                self.stdout.write(self.style.WARNING(f"Time budget exceeded for hotel ID {hotel_id}. Skipping."))
+                self.skipped.append(hotel_id)
+            elif isinstance(error, IntegrityError):
+                self.stdout.write(self.style.ERROR(f"Database integrity error for hotel ID {hotel_id}: {str(error)}"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Error processing hotel ID {hotel_id}: {str(error)}"))
+            self.progress.step(error=True)
+
+    @cached_property
+    def quality(self):
+        return pipeline_for(self.artifact)
+
+    def reject(self, queue, hotel, attempt, errors):
+        # Returns True when the hotel was queued for another attempt
+        if queue.retry(hotel, attempt, errors):
+            if self.verbosity >= 2:
+                self.stdout.write(self.style.WARNING(
+                    f"Rejected {self.label} for hotel ID {hotel[0]} (attempt {attempt}): {'; '.join(errors)}. Will retry."
+                ))
+            return True
+        self.stdout.write(self.style.ERROR(
+            f"Rejected {self.label} for hotel ID {hotel[0]} after {attempt} attempts: {'; '.join(errors)}. "
+            f"Keeping the stored one."
+        ))
+        return False
+
+    def report_quality(self, queue):
+        if queue.retried or queue.rejected:
+            self.stdout.write(
+                f"Quality gate: {queue.retried} retries, {len(queue.rejected)} hotels rejected"
+                + (f" ({', '.join(str(hotel[0]) for hotel, errors in queue.rejected)})" if queue.rejected else "")
+            )
+
+    def report_budget(self, skipped, remaining):
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"{len(skipped)} hotels exceeded their time budget: {', '.join(map(str, skipped))}"
+            ))
+        if remaining or skipped:
+            path = write_checkpoint(self.command_name, self.run_id, skipped + remaining)
+            if remaining:
+                self.stdout.write(self.style.WARNING(f"Max runtime reached, {len(remaining)} hotels not processed."))
+            self.stdout.write(f"Checkpoint written to {path}; continue with --resume {path}")
+
+    def estimate(self, hotels, options):
+        # Generate for the sample without writing anything, then project the full selection
+        run_estimate = RunEstimate()
+        for hotel in hotels:
+            trace = []
+            started = time.monotonic()
+            self.produce(hotel, trace=trace)
+            run_estimate.add(self.artifact, time.monotonic() - started, trace)
+            run_estimate.hotels += 1
+
+        total = selection.count_hotels(options, self.default_limit)
+        # Generation is what takes the time, so the run goes as fast as its generate workers
+        workers, depths = stage_options(options)
+        for line in run_estimate.report(total, workers['generate']):
+            self.stdout.write(line)
@@ -0,0 +1,114 @@
+# property_info/search.py
+
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, TrigramWordSimilarity,
+)
+from django.db import connections
+from django.db.models import F
+
+from property_info.models import SEARCH_CONFIG, Hotel, PropertyRatingReview, PropertySummary
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+CANDIDATES = 1000  # Content matches a name search is narrowed to when both are given
+
+HEADLINE_OPTIONS = {'max_words': 30, 'min_words': 10, 'max_fragments': 2}
+
+TRIGRAM_INDEX_SQL = "CREATE INDEX IF NOT EXISTS hotels_name_trgm_idx ON hotels USING gin (hotel_name gin_trgm_ops)"
+
+
+def ensure_name_index():
+    """Add the trigram index ``search_names`` uses on ``hotels.hotel_name`` if it doesn't exist."""
+    with connections['travel'].cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cursor.execute(TRIGRAM_INDEX_SQL)
+
+
+def content_query(text):
+    # websearch syntax: quoted phrases, OR and -excluded words, and never a syntax error
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def _matches(model, column, query, limit):
+    # Filtering on the stored vector is what lets Postgres use the GIN index
+    return (
+        model.objects.filter(search=query)
+        .annotate(
+            rank=SearchRank(F('search'), query),
+            headline=SearchHeadline(column, query, config=SEARCH_CONFIG, **HEADLINE_OPTIONS),
+        )
+        .order_by('-rank')
+        .values_list('property_id', 'rank', 'headline')[:limit]
+    )
+
+
+def search_content(text, limit=DEFAULT_LIMIT):
+    """Return ``{hotel_id: {'rank', 'summary', 'review'}}`` for the generated texts matching ``text``.
+
+    ``summary`` and ``review`` are highlighted excerpts, None when only the
+    other text matched; ``rank`` adds up both.
+    """
+    query = content_query(text)
+    hits = {}
+    for model, column, key in (
+        (PropertySummary, 'summary', 'summary'),
+        (PropertyRatingReview, 'review', 'review'),
+    ):
+        for hotel_id, rank, headline in _matches(model, column, query, limit):
+            hit = hits.setdefault(hotel_id, {'rank': 0.0, 'summary': None, 'review': None})
+            hit['rank'] += rank
+            hit[key] = headline
+    return hits
+
+
+def search_names(text, limit=DEFAULT_LIMIT, hotel_ids=None):
+    """Return ``{hotel_id: similarity}`` for the hotels whose name contains something like ``text``.
+
+    Word similarity tolerates typos and partial names; with the trigram index
+    from ``ensure_name_index`` it doesn't scan the table.
+    """
+    hotels = Hotel.objects.filter(hotel_name__trigram_word_similar=text)
+    if hotel_ids is not None:
+        hotels = hotels.filter(hotel_id__in=list(hotel_ids))
+    hotels = (
+        hotels.annotate(similarity=TrigramWordSimilarity(text, 'hotel_name'))
+        .order_by('-similarity')
+        .values_list('hotel_id', 'similarity')[:limit]
+    )
+    return dict(hotels)
+
+
+def search(text=None, name=None, limit=DEFAULT_LIMIT):
+    """Search the generated content, the hotel names, or both; returns ranked result dicts.
+
+    With both, hotels have to match both and are ranked by the sum of their
+    content rank and name similarity. Without either there is nothing to match.
+    """
+    if not text and not name:
+        return []
+    if text:
+        content = search_content(text, CANDIDATES if name else limit)
+    if name:
+        names = search_names(name, limit, hotel_ids=content.keys() if text else None)
+
+    if text and name:
+        scores = {hotel_id: content[hotel_id]['rank'] + similarity for hotel_id, similarity in names.items()}
+    elif text:
+        scores = {hotel_id: hit['rank'] for hotel_id, hit in content.items()}
+    else:
+        scores = names
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+    hotels = Hotel.objects.in_bulk_cached(ranked)
+    results = []
+    for hotel_id in ranked:
+        hit = content.get(hotel_id, {}) if text else {}
+        hotel = hotels.get(hotel_id)
+        results.append({
+            'hotel_id': hotel_id,
+            'hotel_name': hotel.hotel_name if hotel else None,
+            'score': round(scores[hotel_id], 4),
+            'summary': hit.get('summary'),
+            'review': hit.get('review'),
+        })
+    return results
@@ -0,0 +1,169 @@
+# property_info/selection.py
+
+import argparse
+
+from django.db import connections
+
+from property_info.budget import load_checkpoint
+from property_info.geo import parse_bbox, parse_near, region_conditions
+
+DEFAULT_SAMPLE = 20  # Hotels sampled by --estimate when --sample is not given
+
+
+def parse_shard(value):
+    """Parse ``I/N`` into ``(I, N)``; shards are numbered from 0."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected I/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..{count - 1}, got {value!r}")
+    return index, count
+
+
+def add_arguments(parser, default_limit):
+    parser.add_argument(
+        '--limit', type=int,
+        help=f"Maximum number of hotels to process, 0 for all "
+             f"(default: {default_limit}, or every hotel given with --hotel-id or --resume)"
+    )
+    parser.add_argument(
+        '--hotel-id', type=int, action='append', dest='hotel_ids',
+        help="Only process this hotel_id (repeat for several)"
+    )
+    parser.add_argument(
+        '--resume', type=load_checkpoint, dest='resume_ids', metavar='CHECKPOINT',
+        help="Only process the hotels listed in a checkpoint file written by an earlier run"
+    )
+    parser.add_argument(
+        '--bbox', type=parse_bbox, metavar='MIN_LAT,MIN_LON,MAX_LAT,MAX_LON',
+        help="Only process hotels inside this bounding box (needs index_hotel_geohash)"
+    )
+    parser.add_argument(
+        '--near', type=parse_near, metavar='LAT,LON,KM',
+        help="Only process hotels within KM kilometres of a point (needs index_hotel_geohash)"
+    )
+    parser.add_argument(
+        '--sample', type=int,
+        help="Process a sample of N hotels stratified by city_id instead of the whole selection"
+    )
+    parser.add_argument(
+        '--estimate', action='store_true',
+        help="Dry run: generate for the sample without writing and project the cost of the full selection"
+    )
+    parser.add_argument(
+        '--shard', type=parse_shard,
+        help="Only process shard I of N (I/N, from 0), so N processes or hosts can split the selection"
+    )
+    parser.add_argument(
+        '--shard-by', choices=['hotel_id', 'city_id'], default='hotel_id',
+        help="Shard by hotel_id modulo N, or by contiguous city_id ranges (default: hotel_id)"
+    )
+
+
+def selection_limit(options, default_limit):
+    """Return the LIMIT of a selection; 0 for none.
+
+    Hotels listed with --hotel-id or --resume are all processed unless --limit
+    is given explicitly.
+    """
+    if options.get('limit') is not None:
+        return options['limit']
+    if options.get('hotel_ids') or options.get('resume_ids') is not None:
+        return 0
+    return default_limit
+
+
+def where_clause(options):
+    """Return ``(sql, params)`` for the WHERE clause shared by every query of a selection."""
+    conditions = ["hotel_id IS NOT NULL"]
+    params = []
+
+    if options.get('hotel_ids'):
+        conditions.append("hotel_id = ANY(%s)")
+        params.append(list(options['hotel_ids']))
+
+    if options.get('resume_ids') is not None:
+        conditions.append("hotel_id = ANY(%s)")
+        params.append(list(options['resume_ids']))
+
+    if options.get('bbox') or options.get('near'):
+        region, region_params = region_conditions(options.get('bbox'), options.get('near'))
+        conditions += region
+        params += region_params
+
+    if options.get('shard'):
+        index, count = options['shard']
+        if options.get('shard_by') == 'city_id':
+            # Split the distinct cities into N contiguous ranges of about the same size
+            conditions.append("""city_id IN (
+                SELECT city_id FROM (
+                    SELECT city_id, ntile(%s) OVER (ORDER BY city_id) AS shard
+                    FROM (SELECT DISTINCT city_id FROM hotels) cities
+                ) city_shards
+                WHERE shard = %s
+            )""")
+            params += [count, index + 1]
+        else:
+            conditions.append("MOD(hotel_id, %s) = %s")
+            params += [count, index]
+
+    return " AND ".join(conditions), params
+
+
+def select_sql(columns, options, default_limit, order=None):
+    """Return ``(sql, params)`` selecting ``columns`` of the hotels to process.
+
+    ``order`` is an optional ``(sql, params)`` ORDER BY for the full selection;
+    a sample keeps its own random order.
+    """
+    where, params = where_clause(options)
+    columns = ", ".join(columns)
+
+    if options.get('sample') or options.get('estimate'):
+        # Proportional allocation per city, at least one hotel per city, random within a city
+        sample = options.get('sample') or DEFAULT_SAMPLE
+        sql = f"""
+            SELECT {columns} FROM (
+                SELECT {columns},
+                       row_number() OVER (PARTITION BY city_id ORDER BY random()) AS city_rank,
+                       count(*) OVER (PARTITION BY city_id) AS city_total,
+                       count(*) OVER () AS total
+                FROM hotels
+                WHERE {where}
+            ) ranked
+            WHERE city_rank <= GREATEST(1, CEIL(%s * city_total::numeric / total))
+            ORDER BY city_rank, random()
+            LIMIT %s
+        """
+        return sql, params + [sample, sample]
+
+    sql = f"SELECT {columns} FROM hotels WHERE {where}"
+    if order:
+        sql += f" ORDER BY {order[0]}"
+        params = params + list(order[1])
+    limit = selection_limit(options, default_limit)
+    if limit:
+        sql += " LIMIT %s"
+        params = params + [limit]
+    return sql, params
+
+
+def count_hotels(options, default_limit):
+    """Count the hotels the full selection (ignoring ``--sample``) would process."""
+    where, params = where_clause(options)
+    sql = f"SELECT count(*) FROM hotels WHERE {where}"
+    limit = selection_limit(options, default_limit)
+    if limit:
+        sql = f"SELECT count(*) FROM (SELECT 1 FROM hotels WHERE {where} LIMIT %s) selection"
+        params = params + [limit]
+
+    with connections['travel'].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()[0]
+
+
+def count_selected(options, default_limit):
+    """Count the hotels a run will process: the full selection, or its sample."""
+    total = count_hotels(options, default_limit)
+    return min(total, options['sample']) if options.get('sample') else total
@@ -0,0 +1,146 @@
+# property_info/semantic_cache.py
+
+import json
+import os
+import threading
+
+from django.conf import settings
+
+from property_info import llm
+from property_info.budget import BudgetExceeded
+
+REUSE = 'reuse'  # Near-duplicate: reuse the cached output as a template
+SEED = 'seed'    # Similar: pass the cached output to the model as an example
+
+CACHE_MODEL = 'semantic-cache'  # Recorded as the model of reused outputs
+
+
+def normalize_inputs(**fields):
+    """Build the text embedded for a hotel: one lower-cased ``key: value`` line per field."""
+    return "\n".join(f"{key}: {' '.join(str(value).lower().split())}" for key, value in fields.items())
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of generated outputs keyed by input embeddings.
+
+    Vectors are kept L2-normalized in a NumPy matrix, so cosine similarity
+    against the whole index is a single matrix-vector product.
+    """
+
+    def __init__(self, task, path=None, reuse_threshold=None, seed_threshold=None, model=None):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("numpy is required for the semantic cache (pip install numpy)")
+
+        self.np = numpy
+        self.task = task
+        self.path = path
+        self.model = model or settings.SEMANTIC_CACHE_MODEL
+        self.reuse_threshold = reuse_threshold or settings.SEMANTIC_CACHE_REUSE_THRESHOLD
+        self.seed_threshold = seed_threshold or settings.SEMANTIC_CACHE_SEED_THRESHOLD
+        self.vectors = None  # (capacity, dim) float32; rows past ``size`` are unused
+        self.size = 0
+        self.entries = []  # {'name': hotel name, 'exact': normalized exact fields, 'output': generated text}, one per row
+        self.hits = {REUSE: 0, SEED: 0}
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            self.load()
+
+    def __len__(self):
+        return self.size
+
+    def embed(self, text, budget=None):
+        vector = self.np.asarray(llm.embed(text, self.model, budget=budget), dtype=self.np.float32)
+        norm = self.np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def search(self, vector):
+        """Return ``(similarity, entry)`` of the nearest cached output, or ``(0.0, None)``."""
+        with self._lock:
+            if self.size == 0:
+                return 0.0, None
+            scores = self.vectors[:self.size] @ vector
+            best = int(scores.argmax())
+            return float(scores[best]), self.entries[best]
+
+    def add(self, vector, name, exact, output):
+        with self._lock:
+            if self.vectors is None:
+                self.vectors = self.np.zeros((64, len(vector)), dtype=self.np.float32)
+            elif self.size == len(self.vectors):
+                # Grow geometrically so appends stay amortized O(1)
+                grown = self.np.zeros((2 * len(self.vectors), self.vectors.shape[1]), dtype=self.np.float32)
+                grown[:self.size] = self.vectors[:self.size]
+                self.vectors = grown
+            self.vectors[self.size] = vector
+            self.entries.append({'name': name, 'exact': exact, 'output': output})
+            self.size += 1
+
+    def generate(self, fields, name, prompt, generate, trace=None, budget=None, validate=None, exact=()):
+        """Return an output for ``prompt``, reusing near-duplicate outputs.
+
+        ``fields`` are the hotel's inputs other than its ``name``, compared
+        between hotels by embedding, and ``generate(prompt)`` produces the text
+        when nothing can be reused. Only the name is substituted in a reused
+        output, so the fields named in ``exact`` (those an output states as
+        they are, like a price) must also match the cached hotel's; a
+        near-duplicate differing in one of them is used as a seed instead. A
+        reused output is appended to ``trace`` as a ``semantic-cache``
+        generation. Only outputs accepted by ``validate`` are cached.
+        """
+        exact = normalize_inputs(**{key: fields[key] for key in exact})
+        try:
+            vector = self.embed(normalize_inputs(hotel_name=name, **fields), budget)
+        except BudgetExceeded:
+            raise
+        except Exception:
+            # The cache is an optimization; without an embedding just generate
+            return generate(prompt)
+
+        similarity, entry = self.search(vector)
+        if entry is not None and similarity >= self.reuse_threshold and entry.get('exact') == exact:
+            self.hits[REUSE] += 1
+            output = entry['output'].replace(entry['name'], name)
+            if trace is not None:
+                trace.append(llm.Generation(text=output, model=CACHE_MODEL))
+            return output
+
+        if entry is not None and similarity >= self.seed_threshold:
+            self.hits[SEED] += 1
+            prompt = (
+                f"{prompt}\n\n"
+                f"For reference, this was written for a very similar hotel ({entry['name']}). "
+                f"Keep the same style and structure, but describe this hotel:\n{entry['output']}"
+            )
+
+        output = generate(prompt)
+        if output and (validate is None or validate(output)):
+            self.add(vector, name, exact, output)
+        return output
+
+    def files(self):
+        return (
+            os.path.join(self.path, f"{self.task}.npy"),
+            os.path.join(self.path, f"{self.task}.json"),
+        )
+
+    def load(self):
+        vectors_path, entries_path = self.files()
+        if not (os.path.exists(vectors_path) and os.path.exists(entries_path)):
+            return
+        self.vectors = self.np.load(vectors_path)
+        with open(entries_path, encoding='utf-8') as f:
+            self.entries = json.load(f)
+        self.size = len(self.entries)
+
+    def save(self):
+        if self.path is None or self.size == 0:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        vectors_path, entries_path = self.files()
+        with self._lock:
+            self.np.save(vectors_path, self.vectors[:self.size])
+            with open(entries_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
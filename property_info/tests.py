@@ -3,17 +3,54 @@ import unittest
 from unittest import mock
 from unittest.mock import patch, MagicMock
 from django.db import connections
-from django.db import IntegrityError
+from django.db import IntegrityError, OperationalError, transaction
 from django.core.management import call_command
+from django.core.management.base import OutputWrapper
+from django.conf import settings
+from django.test import RequestFactory, override_settings
+from django.core.asgi import get_asgi_application
 from property_info.management.commands.rewrite_property_titles import Command as RewritePropertyTitlesCommand
 from property_info.management.commands.rewrite_property_summary import Command as RewritePropertySummaryCommand
 from property_info.management.commands.rewrite_property_rating_review import Command as RewritePropertyRatingReviewCommand
 from property_info.models import PropertySummary
 from property_info.models import PropertyRatingReview
+from property_info import blobs, budget, geo, history, llm, loadtest, notify, search, selection, validation, views
+from property_info import admin as property_admin
+from property_info.management.commands import compact_history, watch_hotel_changes
+from property_info.estimate import RunEstimate
+from property_info.neighbourhood import Neighbourhoods
+from property_info.pipeline import Pipeline, Stage, parse_stage_values
+from property_info.progress import Progress
+from property_info.cache import TTLCache
+from property_info.semantic_cache import SemanticCache, normalize_inputs
+from property_info.models import Hotel
+from property_info.models import GenerationHistory, TextBlob
+from property_info.management.commands import import_property_content
+import argparse
+import asyncio
+import random
 import requests
 import json
+import gzip
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 from io import StringIO
 
+
+def stream_hotels(mock_connections, hotels):
+    """Serve ``hotels`` from the mocked server-side cursor the rewrite commands stream from."""
+    cursor = mock_connections['travel'].chunked_cursor.return_value.__enter__.return_value
+
+    def execute(sql, params):
+        cursor.fetchmany.side_effect = [list(hotels), []]
+
+    cursor.execute.side_effect = execute
+    return cursor
+
 ################# TEST FOR TITLE AND DESCRIPTION STARTS ############################
 
 class TestRewritePropertyTitlesCommand(unittest.TestCase):
@@ -239,27 +276,24 @@ class TestRewritePropertySummaryCommand(unittest.TestCase):
     @mock.patch('requests.post')
     def test_handle_update_existing_summary(self, mock_post):
         # Create an existing PropertySummary object
-        existing_summary = PropertySummary.objects.create(
+        PropertySummary.objects.create(
             property_id='1',
             summary='Old summary'
         )
 
-        # Mock the API response
+        # Mock the API response with a summary the quality gate accepts
+        new_summary = "A bright, modern hotel near the old town with spacious rooms, friendly staff and a rooftop bar."
         mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = {'response': 'New summary'}
-
-        # Mock the PropertySummary.objects.filter method to return the existing summary
-        with mock.patch.object(PropertySummary.objects, 'filter') as mock_filter:
-            mock_filter.return_value.first.return_value = existing_summary
+        mock_post.return_value.json.return_value = {'response': new_summary}
 
-            # Call the management command
-            call_command('rewrite_property_summary')
+        # Call the management command; the batch writer looks the existing summary up
+        call_command('rewrite_property_summary')
 
         # Reload the summary from the database after command execution
         updated_summary = PropertySummary.objects.get(property_id='1')
 
         # Check if the summary was updated
-        self.assertEqual(updated_summary.summary, 'New summary')
+        self.assertEqual(updated_summary.summary, new_summary)
 
     
 ################# TEST FOR SUMMARY ENDS   #####################################
@@ -270,7 +304,7 @@ class TestRewritePropertyRatingReviewCommand(TestCase):
     def setUp(self):
         self.command = RewritePropertyRatingReviewCommand()
 
-    @patch('property_info.management.commands.rewrite_property_rating_review.requests.post')
+    @patch('requests.post')
     def test_generate_rating_and_review_api_error(self, mock_post):
         # Mock API error response
         mock_post.side_effect = Exception("API error")
@@ -283,83 +317,83 @@ class TestRewritePropertyRatingReviewCommand(TestCase):
         self.assertEqual(rating, 0.0)
         self.assertEqual(review, "Review not available")
 
-    @patch('property_info.management.commands.rewrite_property_rating_review.connections')
-    @patch('property_info.management.commands.rewrite_property_rating_review.PropertyRatingReview')
-    def test_handle_existing_rating_review_update(self, mock_model, mock_connections):
+    @patch('property_info.rewrite.selection.count_selected', return_value=1)
+    @patch('property_info.rewrite.history')
+    @patch('property_info.rewrite.transaction')
+    @patch('property_info.rewrite.connections')
+    @patch.object(RewritePropertyRatingReviewCommand, 'model')
+    def test_handle_existing_rating_review_update(self, mock_model, mock_connections, mock_transaction, mock_history, mock_count):
         # Mock database query
-        mock_cursor = MagicMock()
-        mock_cursor.fetchall.return_value = [
+        stream_hotels(mock_connections, [
             (1, 'Hotel Test', 100, 'Standard', 'New York', 40.7128, -74.0060)
-        ]
-        mock_connections['travel'].cursor.return_value.__enter__.return_value = mock_cursor
+        ])
 
         # Mock existing record
-        mock_instance = MagicMock()
-        mock_model.objects.filter.return_value.first.return_value = mock_instance
+        mock_instance = MagicMock(property_id=1)
+        mock_model.objects.filter.return_value = [mock_instance]
 
         # Mock generate_rating_and_review method
-        self.command.generate_rating_and_review = MagicMock(return_value=(4.5, "Great experience."))
+        self.command.generate_rating_and_review = MagicMock(return_value=(4.5, "Great experience overall, with friendly staff, clean rooms and a very convenient location."))
 
         self.command.handle()
 
-        # Assertions
-        mock_instance.save.assert_called_once()
+        # Assertions: the batch is written with one bulk update
+        mock_model.objects.bulk_update.assert_called_once_with([mock_instance], ['rating', 'review'])
+        mock_model.objects.bulk_create.assert_not_called()
         self.assertEqual(mock_instance.rating, 4.5)
-        self.assertEqual(mock_instance.review, "Great experience.")
-
-    @patch('property_info.management.commands.rewrite_property_rating_review.connections')
-    @patch('property_info.management.commands.rewrite_property_rating_review.PropertyRatingReview')
-    def test_handle_create_new_rating_review(self, mock_model, mock_connections):
+        self.assertEqual(mock_instance.review, "Great experience overall, with friendly staff, clean rooms and a very convenient location.")
+
+    @patch('property_info.rewrite.selection.count_selected', return_value=1)
+    @patch('property_info.rewrite.history')
+    @patch('property_info.rewrite.transaction')
+    @patch('property_info.rewrite.connections')
+    @patch.object(RewritePropertyRatingReviewCommand, 'model')
+    def test_handle_create_new_rating_review(self, mock_model, mock_connections, mock_transaction, mock_history, mock_count):
         # Mock database query
-        mock_cursor = MagicMock()
-        mock_cursor.fetchall.return_value = [
+        stream_hotels(mock_connections, [
             (1, 'Hotel Test', 100, 'Standard', 'New York', 40.7128, -74.0060)
-        ]
-        mock_connections['travel'].cursor.return_value.__enter__.return_value = mock_cursor
+        ])
 
         # Mock no existing record
-        mock_model.objects.filter.return_value.first.return_value = None
+        mock_model.objects.filter.return_value = []
 
         # Mock generate_rating_and_review method
-        self.command.generate_rating_and_review = MagicMock(return_value=(4.5, "Amazing stay."))
+        self.command.generate_rating_and_review = MagicMock(return_value=(4.5, "Amazing stay with spacious rooms, attentive service and a quiet street right next to the park."))
 
         self.command.handle()
 
         # Assertions
-        mock_model.objects.create.assert_called_once_with(
+        mock_model.assert_called_once_with(
             property_id=1,
             rating=4.5,
-            review="Amazing stay."
+            review="Amazing stay with spacious rooms, attentive service and a quiet street right next to the park."
         )
+        mock_model.objects.bulk_create.assert_called_once_with([mock_model.return_value])
 
-    @patch('property_info.management.commands.rewrite_property_rating_review.connections')
-    @patch('property_info.management.commands.rewrite_property_rating_review.PropertyRatingReview')
-    @patch('property_info.management.commands.rewrite_property_rating_review.requests.post')
-    def test_handle_api_failure_fallback(self, mock_post, mock_model, mock_connections):
+    @patch('property_info.rewrite.selection.count_selected', return_value=1)
+    @patch('property_info.rewrite.connections')
+    @patch.object(RewritePropertyRatingReviewCommand, 'model')
+    @patch('requests.post')
+    def test_handle_api_failure_keeps_stored_review(self, mock_post, mock_model, mock_connections, mock_count):
         # Mock database query
-        mock_cursor = MagicMock()
-        mock_cursor.fetchall.return_value = [
+        stream_hotels(mock_connections, [
             (1, 'Hotel Test', 100, 'Standard', 'New York', 40.7128, -74.0060)
-        ]
-        mock_connections['travel'].cursor.return_value.__enter__.return_value = mock_cursor
+        ])
 
         # Mock API failure
         mock_post.side_effect = Exception("API failure")
 
         # Mock no existing record
-        mock_model.objects.filter.return_value.first.return_value = None
+        mock_model.objects.filter.return_value = []
 
         self.command.handle()
 
-        # Assertions
-        mock_model.objects.create.assert_called_once_with(
-            property_id=1,
-            rating=0.0,
-            review="Review not available"
-        )
+        # Assertions: the fallback fails the quality gate, is retried and never written
+        mock_model.objects.bulk_create.assert_not_called()
+        self.assertEqual(mock_post.call_count, settings.OUTPUT_MAX_ATTEMPTS)
 
 
-    @patch('property_info.management.commands.rewrite_property_rating_review.requests.post')
+    @patch('requests.post')
     def test_generate_rating_and_review_rating_extraction_failure(self, mock_post):
         # Mock a successful API response but with no rating
         mock_response = MagicMock()
@@ -378,20 +412,44 @@ class TestRewritePropertyRatingReviewCommand(TestCase):
         self.assertEqual(review, "Noisy neighbors and poor service.")
 
 
-    @patch('property_info.management.commands.rewrite_property_rating_review.connections')
-    @patch('property_info.management.commands.rewrite_property_rating_review.PropertyRatingReview')
-    def test_handle_no_hotels(self, mock_model, mock_connections):
+    def test_well_formed_response_passes_parser_and_gate(self):
+        text = (
+            "Rating: 4\n"
+            "Review: A bright, modern hotel close to the station and the old town.\n"
+            "Rooms are clean and quiet, and the breakfast is generous.\n"
+            "The lobby can get busy at check-in time."
+        )
+
+        rating, review = self.command.parse_rating_and_review(text)
+
+        self.assertEqual(rating, 4.0)
+        self.assertTrue(review.startswith("A bright, modern hotel"))
+        self.assertTrue(review.endswith("busy at check-in time."))
+        self.assertEqual(self.command.errors((rating, review), prompt="Review this hotel"), [])
+
+    def test_parser_falls_back_to_text_after_rating_line(self):
+        rating, review = self.command.parse_rating_and_review("Rating: 3\nDecent rooms but a noisy street outside.")
+        self.assertEqual((rating, review), (3.0, "Decent rooms but a noisy street outside."))
+
+        # A bare rating is no review, and the gate turns it down
+        rating, review = self.command.parse_rating_and_review("Rating: 4")
+        self.assertEqual(review, "")
+        self.assertTrue(self.command.errors((rating, review), prompt=""))
+        self.assertIn("expected at least 10", self.command.errors((4.0, "Nice hotel."), prompt="")[0])
+
+    @patch('property_info.rewrite.selection.count_selected', return_value=0)
+    @patch('property_info.rewrite.connections')
+    @patch.object(RewritePropertyRatingReviewCommand, 'model')
+    def test_handle_no_hotels(self, mock_model, mock_connections, mock_count):
         # Mock database query to return no hotels
-        mock_cursor = MagicMock()
-        mock_cursor.fetchall.return_value = []
-        mock_connections['travel'].cursor.return_value.__enter__.return_value = mock_cursor
+        stream_hotels(mock_connections, [])
 
         self.command.handle()
 
         # Assertions
         mock_model.objects.filter.assert_not_called()
 
-    @patch('property_info.management.commands.rewrite_property_rating_review.requests.post')
+    @patch('requests.post')
     def test_generate_rating_and_review_timeout(self, mock_post):
         # Mock a timeout exception
         mock_post.side_effect = requests.exceptions.Timeout
@@ -406,6 +464,1550 @@ class TestRewritePropertyRatingReviewCommand(TestCase):
 
 ################# TEST FOR RATING REVIEW ENDS   #####################################
   
+################# TEST FOR MODEL ROUTING STARTS   #####################################
+
+class TestModelRouting(unittest.TestCase):
+
+    @override_settings(OLLAMA_MODELS={'title': 'tinyllama'})
+    def test_models_for_single_model(self):
+        self.assertEqual(llm.models_for('title'), ['tinyllama'])
+        # Unconfigured tasks fall back to the default model
+        self.assertEqual(llm.models_for('summary'), [llm.DEFAULT_MODEL])
+
+    @override_settings(OLLAMA_MODELS={'title': ['tinyllama', 'phi']})
+    @patch('requests.post')
+    def test_cascade_stops_at_first_valid_output(self, mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {'response': 'Seaside Haven'}
+
+        result = llm.generate('title', 'prompt', 'system', validate=lambda text: True)
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(result.model, 'tinyllama')
+        self.assertEqual(mock_post.call_args.kwargs['json']['model'], 'tinyllama')
+
+    @override_settings(OLLAMA_MODELS={'title': ['tinyllama', 'phi']})
+    @patch('requests.post')
+    def test_cascade_escalates_on_invalid_output(self, mock_post):
+        fast, large = MagicMock(status_code=200), MagicMock(status_code=200)
+        fast.json.return_value = {'response': 'Sure! Here is a unique name for your lovely hotel'}
+        large.json.return_value = {'response': 'Seaside Haven'}
+        mock_post.side_effect = [fast, large]
+
+        command = RewritePropertyTitlesCommand()
+        title = command.rewrite_title('Old Hotel')
+
+        self.assertEqual(title, 'Seaside Haven')
+        self.assertEqual([c.kwargs['json']['model'] for c in mock_post.call_args_list], ['tinyllama', 'phi'])
+
+    @override_settings(OLLAMA_MODELS={'title': ['tinyllama', 'phi']})
+    @patch('requests.post')
+    def test_cascade_skips_model_that_fails(self, mock_post):
+        missing, large = MagicMock(status_code=404, text='model "tinyllama" not found'), MagicMock(status_code=200)
+        large.json.return_value = {'response': 'Seaside Haven'}
+        mock_post.side_effect = [missing, large]
+
+        result = llm.generate('title', 'prompt', 'system', validate=lambda text: True)
+
+        self.assertEqual(result.model, 'phi')
+
+    @override_settings(OLLAMA_MODELS={'title': ['tinyllama', 'phi']})
+    @patch('requests.post')
+    def test_cascade_raises_when_every_model_fails(self, mock_post):
+        mock_post.side_effect = [
+            MagicMock(status_code=404, text='model "tinyllama" not found'),
+            requests.exceptions.ConnectionError('down'),
+        ]
+
+        with self.assertRaises(llm.OllamaRequestError):
+            llm.generate('title', 'prompt', 'system')
+        self.assertEqual(mock_post.call_count, 2)
+
+################# TEST FOR MODEL ROUTING ENDS   #####################################
+################# TEST FOR HOTEL CACHE STARTS   #####################################
+
+class TestHotelCache(unittest.TestCase):
+
+    def test_lru_evicts_oldest_entry(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set_many({1: 'a', 2: 'b'})
+        cache.get_many([1])  # 1 becomes most recently used
+        cache.set_many({3: 'c'})
+
+        self.assertEqual(cache.get_many([1, 2, 3]), {1: 'a', 3: 'c'})
+
+    @patch('property_info.cache.time.monotonic')
+    def test_entries_expire_after_ttl(self, mock_monotonic):
+        cache = TTLCache(maxsize=10, ttl=60)
+        mock_monotonic.return_value = 100
+        cache.set_many({1: 'a'})
+
+        mock_monotonic.return_value = 161
+        self.assertEqual(cache.get_many([1]), {})
+        self.assertEqual(len(cache), 0)
+
+    @patch('property_info.models.HotelManager.get_queryset')
+    def test_in_bulk_cached_only_queries_misses(self, mock_get_queryset):
+        Hotel.objects.invalidate_cached()
+        hotel = MagicMock(hotel_id=1)
+        mock_get_queryset.return_value.only.return_value.filter.return_value = [hotel]
+
+        self.assertEqual(Hotel.objects.in_bulk_cached([1]), {1: hotel})
+        self.assertEqual(Hotel.objects.in_bulk_cached([1]), {1: hotel})
+
+        # The second lookup is served from the cache
+        mock_get_queryset.return_value.only.return_value.filter.assert_called_once_with(hotel_id__in=[1])
+
+################# TEST FOR HOTEL CACHE ENDS   #####################################
+################# TEST FOR EXPORT STARTS   #####################################
+
+class TestExportPropertyContentCommand(unittest.TestCase):
+
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.hotels = [
+            (1, 10, 'Hotel A', 100, 4.0, 'Suite', 'Dhaka', 23.8, 90.4, 'Nice'),
+            (2, 10, 'Hotel B', 80, 3.5, 'Double', 'Dhaka', 23.7, 90.3, None),
+            (3, 20, 'Hotel C', 120, 4.5, 'Single', 'Sylhet', 24.9, 91.8, None),
+        ]
+
+    def run_export(self, mock_connections, mock_summary, mock_review, *args):
+        mock_cursor = MagicMock()
+        mock_cursor.fetchmany.side_effect = [self.hotels[:2], self.hotels[2:], []]
+        mock_connections['travel'].chunked_cursor.return_value.__enter__.return_value = mock_cursor
+        mock_summary.objects.filter.return_value.order_by.return_value.values_list.return_value = [(1, 'Summary A')]
+        mock_review.objects.filter.return_value.order_by.return_value.values_list.return_value = [(3, 4.0, 'Review C')]
+
+        out = StringIO()
+        call_command('export_property_content', '--output', self.output, '--chunk-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def read_ndjson(self, *path):
+        with gzip.open(os.path.join(self.output, *path), 'rt') as f:
+            return [json.loads(line) for line in f]
+
+    @patch('property_info.management.commands.export_property_content.PropertyRatingReview')
+    @patch('property_info.management.commands.export_property_content.PropertySummary')
+    @patch('property_info.management.commands.export_property_content.connections')
+    def test_export_ndjson(self, mock_connections, mock_summary, mock_review):
+        output = self.run_export(mock_connections, mock_summary, mock_review)
+
+        rows = self.read_ndjson('property_content.ndjson.gz')
+        self.assertEqual([row['hotel_id'] for row in rows], [1, 2, 3])
+        self.assertEqual(rows[0]['summary'], 'Summary A')
+        self.assertIsNone(rows[1]['summary'])
+        self.assertEqual((rows[2]['review_rating'], rows[2]['review']), (4.0, 'Review C'))
+        self.assertIn("Exported 3 hotels to 1 file(s)", output)
+
+    @patch('property_info.management.commands.export_property_content.PropertyRatingReview')
+    @patch('property_info.management.commands.export_property_content.PropertySummary')
+    @patch('property_info.management.commands.export_property_content.connections')
+    def test_export_partitioned_by_city(self, mock_connections, mock_summary, mock_review):
+        self.run_export(mock_connections, mock_summary, mock_review, '--partition-by-city')
+
+        self.assertEqual(sorted(os.listdir(self.output)), ['city_id=10', 'city_id=20'])
+        self.assertEqual(len(self.read_ndjson('city_id=10', 'property_content.ndjson.gz')), 2)
+        self.assertEqual(len(self.read_ndjson('city_id=20', 'property_content.ndjson.gz')), 1)
+
+################# TEST FOR EXPORT ENDS   #####################################
+################# TEST FOR IMPORT STARTS   #####################################
+
+class TestImportPropertyContentCommand(unittest.TestCase):
+
+    def write_file(self, name, content):
+        path = os.path.join(tempfile.mkdtemp(), name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_iter_records_csv_treats_empty_cells_as_null(self):
+        path = self.write_file('content.csv', "property_id,summary,rating,review\n1,Nice place,,\n")
+
+        records = list(import_property_content.iter_records(path, 'csv'))
+
+        self.assertEqual(records, [{'property_id': '1', 'summary': 'Nice place', 'rating': None, 'review': None}])
+
+    def test_parse_record_accepts_export_columns(self):
+        path = self.write_file('content.ndjson', json.dumps({
+            'hotel_id': 7, 'summary': 'S', 'review_rating': 4.5, 'review': 'R', 'description': 'D'
+        }) + "\n\n")
+
+        records = list(import_property_content.iter_records(path, 'ndjson'))
+
+        self.assertEqual([import_property_content.parse_record(r) for r in records], [(7, 'S', 4.5, 'R', 'D')])
+
+    def test_parse_record_without_id_is_skipped(self):
+        self.assertIsNone(import_property_content.parse_record({'summary': 'Orphan'}))
+        # A review without a rating gets the same fallback rating the rewrite command stores
+        self.assertEqual(import_property_content.parse_record({'property_id': '3', 'review': 'R'}), (3, None, 0.0, 'R', None))
+
+################# TEST FOR IMPORT ENDS   #####################################
+################# TEST FOR SEMANTIC CACHE STARTS   #####################################
+
+class TestSemanticCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SemanticCache('summary', reuse_threshold=0.95, seed_threshold=0.8)
+        self.generate = MagicMock(return_value='Grand Inn is a cosy hotel in Dhaka.')
+        self.fields = {'price': 120, 'room_type': 'Suite', 'location': 'Dhaka'}
+
+    def test_normalize_inputs(self):
+        self.assertEqual(
+            normalize_inputs(hotel_name='  Grand   INN ', room_type='Suite'),
+            "hotel_name: grand inn\nroom_type: suite"
+        )
+
+    @patch('property_info.llm.embed')
+    def test_near_duplicate_reuses_output_as_template(self, mock_embed):
+        mock_embed.side_effect = [[1.0, 0.0], [0.99, 0.01]]
+
+        self.cache.generate(self.fields, 'Grand Inn', 'prompt', self.generate, exact=('price', 'room_type'))
+        output = self.cache.generate(
+            dict(self.fields, location='  DHAKA '), 'Grand Hotel', 'prompt', self.generate, exact=('price', 'room_type')
+        )
+
+        self.assertEqual(output, 'Grand Hotel is a cosy hotel in Dhaka.')
+        self.generate.assert_called_once_with('prompt')
+        self.assertEqual(self.cache.hits['reuse'], 1)
+        self.assertEqual(mock_embed.call_args.args[0], normalize_inputs(hotel_name='Grand Hotel', **self.fields))
+
+    @patch('property_info.llm.embed')
+    def test_close_inputs_reuse_output(self, mock_embed):
+        mock_embed.side_effect = [[1.0, 0.0], [0.97, 0.24]]  # Cosine similarity ~0.97
+
+        self.cache.generate(
+            dict(self.fields, location='Gulshan 2, Dhaka'), 'Grand Inn', 'prompt', self.generate, exact=('price',)
+        )
+        output = self.cache.generate(
+            dict(self.fields, room_type='Junior Suite', location='Gulshan-2 Dhaka'), 'Grand Hotel', 'prompt',
+            self.generate, exact=('price',)
+        )
+
+        # The inputs differ but are close, and the fields that must be identical are
+        self.assertEqual(output, 'Grand Hotel is a cosy hotel in Dhaka.')
+        self.generate.assert_called_once_with('prompt')
+        self.assertEqual(self.cache.hits, {'reuse': 1, 'seed': 0})
+
+    @patch('property_info.llm.embed')
+    def test_near_duplicate_with_other_exact_field_is_only_a_seed(self, mock_embed):
+        mock_embed.side_effect = [[1.0, 0.0], [0.99, 0.01]]
+
+        self.cache.generate(self.fields, 'Grand Inn', 'prompt', self.generate, exact=('price', 'room_type'))
+        self.cache.generate(
+            dict(self.fields, price=450), 'Grand Hotel', 'prompt', self.generate, exact=('price', 'room_type')
+        )
+
+        # Only the name would be substituted, so a different price must not reuse the output
+        self.assertEqual(self.generate.call_count, 2)
+        self.assertIn('Grand Inn is a cosy hotel in Dhaka.', self.generate.call_args.args[0])
+        self.assertEqual(self.cache.hits, {'reuse': 0, 'seed': 1})
+
+    @patch('property_info.llm.embed')
+    def test_similar_hotel_is_used_as_seed(self, mock_embed):
+        mock_embed.side_effect = [[1.0, 0.0], [0.9, 0.43]]  # Cosine similarity ~0.9
+
+        self.cache.generate(self.fields, 'Grand Inn', 'prompt', self.generate)
+        self.cache.generate(dict(self.fields, room_type='Double'), 'Sea View', 'prompt', self.generate)
+
+        seeded_prompt = self.generate.call_args_list[1].args[0]
+        self.assertIn('Grand Inn is a cosy hotel in Dhaka.', seeded_prompt)
+        self.assertEqual(len(self.cache), 2)
+
+    @patch('property_info.llm.embed')
+    def test_embedding_failure_falls_back_to_generation(self, mock_embed):
+        mock_embed.side_effect = requests.exceptions.ConnectionError('down')
+
+        output = self.cache.generate(self.fields, 'Grand Inn', 'prompt', self.generate)
+
+        self.assertEqual(output, 'Grand Inn is a cosy hotel in Dhaka.')
+        self.assertEqual(len(self.cache), 0)
+
+################# TEST FOR SEMANTIC CACHE ENDS   #####################################
+################# TEST FOR GENERATION HISTORY STARTS   #####################################
+
+class TestGenerationHistory(unittest.TestCase):
+
+    @patch('property_info.history.transaction')
+    @patch('property_info.history.ActiveGeneration')
+    @patch('property_info.history.GenerationHistory')
+    def test_record_first_version_keeps_source(self, mock_history, mock_active, mock_transaction):
+        mock_history.SOURCE_MODEL = 'source'
+        mock_active.objects.filter.return_value.first.return_value = None
+        trace = [
+            llm.Generation(text='Too long title here please', model='tinyllama', prompt='p', latency=1.0, prompt_tokens=10, completion_tokens=5),
+            llm.Generation(text='Sea Haven', model='phi', prompt='p', latency=2.0, prompt_tokens=10, completion_tokens=3),
+        ]
+
+        history.record('title', 7, 'Sea Haven', 'run1', trace, original='Old Name')
+
+        source, generated = [c.kwargs for c in mock_history.objects.create.call_args_list]
+        self.assertEqual((source['model'], source['content']), ('source', 'Old Name'))
+        self.assertEqual(generated['model'], 'phi')
+        self.assertEqual(generated['prompt_hash'], history.prompt_hash('p'))
+        self.assertEqual((generated['latency'], generated['prompt_tokens'], generated['completion_tokens']), (3.0, 20, 8))
+        self.assertEqual(generated['replaces_id'], mock_history.objects.create.return_value.pk)
+        mock_active.objects.create.assert_called_once()
+
+    @patch('property_info.history.transaction')
+    @patch('property_info.history.ActiveGeneration')
+    @patch('property_info.history.GenerationHistory')
+    def test_record_moves_existing_pointer(self, mock_history, mock_active, mock_transaction):
+        pointer = MagicMock(generation_id=41)
+        mock_active.objects.filter.return_value.first.return_value = pointer
+
+        generation = history.record('summary', 7, 'New', 'run2', original='Old')
+
+        # The source is only kept the first time, and no model means a fallback
+        mock_history.objects.create.assert_called_once()
+        self.assertEqual(mock_history.objects.create.call_args.kwargs['model'], history.FALLBACK_MODEL)
+        self.assertEqual(mock_history.objects.create.call_args.kwargs['replaces_id'], 41)
+        self.assertEqual(pointer.generation, generation)
+        pointer.save.assert_called_once_with(update_fields=['generation'])
+
+    @patch('property_info.history.transaction')
+    @patch('property_info.history.apply')
+    @patch('property_info.history.ActiveGeneration')
+    def test_rollback_run_restores_previous_version(self, mock_active, mock_apply, mock_transaction):
+        previous = MagicMock(artifact='summary', property_id=7, run_id='good-run')
+        pointer = MagicMock(artifact='summary', property_id=7)
+        pointer.generation = MagicMock(run_id='bad-run', replaces=previous)
+        mock_active.objects.filter.return_value.select_related.return_value = [pointer]
+
+        self.assertEqual(history.rollback_run('bad-run'), (1, 0))
+        mock_active.objects.update_or_create.assert_called_once_with(
+            artifact='summary', property_id=7, defaults={'generation': previous}
+        )
+        mock_apply.assert_called_once_with(previous)
+
+    @patch('property_info.history.transaction')
+    @patch('property_info.history.apply')
+    @patch('property_info.history.ActiveGeneration')
+    def test_rollback_after_rollback_restores_displaced_version(self, mock_active, mock_apply, mock_transaction):
+        # Run A is rolled back to the source, then run B replaces the source and is rolled back too:
+        # B restores the source it displaced, not A's newer but rolled back version
+        source = MagicMock(artifact='title', property_id=7, run_id='source', replaces=None)
+        run_a = MagicMock(artifact='title', property_id=7, run_id='run-a', replaces=source)
+        run_b = MagicMock(artifact='title', property_id=7, run_id='run-b', replaces=source)
+        pointer = MagicMock(artifact='title', property_id=7, generation=run_b)
+        mock_active.objects.filter.return_value.select_related.return_value = [pointer]
+
+        self.assertEqual(history.rollback_run('run-b'), (1, 0))
+        mock_apply.assert_called_once_with(source)
+        self.assertIsNot(history.previous_version(run_b), run_a)
+
+    def test_previous_version_skips_versions_of_the_same_run(self):
+        source = MagicMock(run_id='source', replaces=None)
+        first = MagicMock(run_id='run-a', replaces=source)
+        second = MagicMock(run_id='run-a', replaces=first)
+
+        self.assertIs(history.previous_version(second), source)
+
+    @patch('requests.post')
+    def test_generate_traces_every_attempt(self, mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {'response': 'text', 'prompt_eval_count': 12, 'eval_count': 4}
+        trace = []
+
+        with override_settings(OLLAMA_MODELS={'title': ['tinyllama', 'phi']}):
+            llm.generate('title', 'prompt', 'system', validate=lambda text: False, trace=trace)
+
+        self.assertEqual([(g.model, g.prompt_tokens, g.completion_tokens) for g in trace], [('tinyllama', 12, 4), ('phi', 12, 4)])
+
+################# TEST FOR GENERATION HISTORY ENDS   #####################################
+################# TEST FOR ESTIMATE STARTS   #####################################
+
+class TestEstimate(unittest.TestCase):
+
+    def test_select_sql_keeps_default_limit(self):
+        sql, params = selection.select_sql(['hotel_id'], {}, 10)
+        self.assertIn("LIMIT %s", sql)
+        self.assertEqual(params, [10])
+
+        sql, params = selection.select_sql(['hotel_id'], {'limit': 0}, 10)
+        self.assertNotIn("LIMIT", sql)
+
+    def test_select_sql_sample_is_stratified_by_city(self):
+        sql, params = selection.select_sql(['hotel_id'], {'sample': 50, 'estimate': True}, 10)
+        self.assertIn("PARTITION BY city_id", sql)
+        self.assertEqual(params, [50, 50])
+
+    def test_report_projects_runtime_and_tokens(self):
+        run_estimate = RunEstimate()
+        for seconds in (2.0, 4.0):
+            run_estimate.add('summary', seconds, [llm.Generation(text='x', model='phi', prompt_tokens=100, completion_tokens=50)])
+            run_estimate.hotels += 1
+
+        lines = run_estimate.report(total=3600, workers=4)
+
+        # 3s per hotel * 3600 hotels / 4 workers = 45 minutes; 150 tokens per hotel
+        self.assertIn("Projected for 3600 hotels at 4 worker(s): 45m 00s, 540,000 tokens", lines[-1])
+
+    @patch('property_info.rewrite.selection.count_hotels', return_value=100)
+    @patch('property_info.rewrite.connections')
+    @patch.object(RewritePropertyRatingReviewCommand, 'model')
+    def test_estimate_does_not_write(self, mock_model, mock_connections, mock_count):
+        stream_hotels(mock_connections, [(1, 'Hotel Test', 100, 'Standard', 'New York', 40.7128, -74.0060)])
+        command = RewritePropertyRatingReviewCommand()
+        command.generate_rating_and_review = MagicMock(return_value=(4.5, "Great."))
+
+        out = StringIO()
+        command.stdout = OutputWrapper(out)
+        command.handle(sample=5, estimate=True)
+
+        mock_model.objects.bulk_create.assert_not_called()
+        mock_model.objects.filter.assert_not_called()
+        self.assertIn("Projected for 100 hotels", out.getvalue())
+
+    @patch('property_info.rewrite.selection.count_hotels', return_value=100)
+    @patch('property_info.rewrite.connections')
+    def test_estimate_projects_with_the_generate_workers(self, mock_connections, mock_count):
+        stream_hotels(mock_connections, [(1, 'Hotel Test', 100, 'Standard', 'New York', 40.7128, -74.0060)])
+        command = RewritePropertyRatingReviewCommand(stdout=StringIO())
+        command.generate_rating_and_review = MagicMock(return_value=(4.5, "Great."))
+
+        command.handle(estimate=True, workers={'generate': 3})
+
+        self.assertIn("Projected for 100 hotels at 3 worker(s)", command.stdout.getvalue())
+
+    @patch('property_info.management.commands.rewrite_property_titles.selection.count_hotels', return_value=100)
+    def test_title_estimate_is_sequential(self, mock_count):
+        command = RewritePropertyTitlesCommand(stdout=StringIO())
+        command.rewrite_title = MagicMock(return_value="Sea Haven")
+        command.generate_description = MagicMock(return_value="A calm hotel by the sea.")
+
+        command.estimate([(1, 'Hotel Test', 'Standard', 'New York', None)], {})
+
+        self.assertIn("Projected for 100 hotels at 1 worker(s)", command.stdout.getvalue())
+
+################# TEST FOR ESTIMATE ENDS   #####################################
+################# TEST FOR SHARDING STARTS   #####################################
+
+class TestSharding(unittest.TestCase):
+
+    def test_parse_shard(self):
+        self.assertEqual(selection.parse_shard('2/4'), (2, 4))
+        for value in ('4/4', '-1/4', 'x/4', '1'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                selection.parse_shard(value)
+
+    def test_select_sql_by_hotel_ids(self):
+        sql, params = selection.select_sql(['hotel_id'], {'hotel_ids': [5, 6]}, 10)
+        self.assertIn("hotel_id = ANY(%s)", sql)
+        self.assertEqual(params, [[5, 6]])  # Listed hotels are not cut by the default limit
+
+    def test_select_sql_by_hotel_id(self):
+        sql, params = selection.select_sql(['hotel_id'], {'shard': (1, 3), 'limit': 0}, 10)
+        self.assertIn("MOD(hotel_id, %s) = %s", sql)
+        self.assertEqual(params, [3, 1])
+
+    def test_select_sql_by_city_range(self):
+        sql, params = selection.select_sql(['hotel_id'], {'shard': (0, 2), 'shard_by': 'city_id'}, 10)
+        self.assertIn("ntile(%s) OVER (ORDER BY city_id)", sql)
+        self.assertEqual(params, [2, 1, 10])
+
+    @patch('property_info.management.commands.run_shards.subprocess.Popen')
+    def test_run_shards_launches_each_shard(self, mock_popen):
+        def fake_process(args, **kwargs):
+            process = MagicMock(returncode=0)
+            process.poll.return_value = 0
+            process.stdout.__iter__.return_value = iter([f"done {args[4]}\n"])
+            return process
+        mock_popen.side_effect = fake_process
+
+        out = StringIO()
+        call_command(
+            'run_shards', '--shards', '3', '--only', '0,2', 'rewrite_property_summary', '--limit', '0', stdout=out
+        )
+
+        launched = [c.args[0][2:] for c in mock_popen.call_args_list]
+        self.assertEqual(launched, [
+            ['rewrite_property_summary', '--shard', '0/3', '--limit', '0'],
+            ['rewrite_property_summary', '--shard', '2/3', '--limit', '0'],
+        ])
+        self.assertIn("[shard 2] done 2/3", out.getvalue())
+        self.assertIn("All 2 shards finished", out.getvalue())
+
+################# TEST FOR SHARDING ENDS   #####################################
+################# TEST FOR COMMAND STARTUP STARTS   #####################################
+
+class TestCommandStartup(unittest.TestCase):
+    COMMANDS = [
+        'property_info.management.commands.rewrite_property_titles',
+        'property_info.management.commands.rewrite_property_summary',
+        'property_info.management.commands.rewrite_property_rating_review',
+    ]
+    # Only loaded once a command actually calls the model or needs them
+    LAZY_MODULES = {'requests', 'urllib3', 'numpy', 'pyarrow'}
+    STARTUP_BUDGET_US = 150000  # Cumulative import time of the rewrite commands
+
+    def import_times(self):
+        # python -X importtime writes "import time: self | cumulative | module" lines to stderr
+        code = "import django; django.setup(); " + "; ".join(f"import {module}" for module in self.COMMANDS)
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'ollama_project.settings'},
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+        times = {}
+        for line in result.stderr.splitlines():
+            if line.startswith('import time:') and '|' in line:
+                _, cumulative, module = line.split('|')
+                if cumulative.strip().isdigit():
+                    times[module.strip()] = int(cumulative)
+        return times
+
+    def test_heavy_dependencies_are_not_imported(self):
+        times = self.import_times()
+        self.assertEqual({module.split('.')[0] for module in times} & self.LAZY_MODULES, set())
+
+    def test_command_import_time_budget(self):
+        times = self.import_times()
+        total = sum(times[module] for module in self.COMMANDS)
+        self.assertLess(total, self.STARTUP_BUDGET_US, f"Rewrite commands took {total}us to import")
+
+################# TEST FOR COMMAND STARTUP ENDS   #####################################
+################# TEST FOR TIME BUDGET STARTS   #####################################
+
+class TestTimeBudget(unittest.TestCase):
+
+    def test_parse_duration(self):
+        self.assertEqual(budget.parse_duration('90'), 90)
+        self.assertEqual(budget.parse_duration('30m'), 1800)
+        self.assertEqual(budget.parse_duration('2h'), 7200)
+        with self.assertRaises(argparse.ArgumentTypeError):
+            budget.parse_duration('soon')
+
+    def test_child_never_outlives_parent(self):
+        run = budget.Budget(10, request_timeout=300)
+        hotel = run.child(60)
+        self.assertLessEqual(hotel.deadline, run.deadline)
+        self.assertEqual(hotel.request_timeout, 300)
+        self.assertLessEqual(hotel.timeout(), 10)
+
+    def test_unlimited_budget_uses_request_timeout(self):
+        self.assertEqual(budget.Budget(request_timeout=30).timeout(), 30)
+
+    @patch('property_info.budget.time.monotonic')
+    def test_expired_budget_raises(self, mock_monotonic):
+        mock_monotonic.return_value = 100.0
+        run = budget.Budget(5)
+        mock_monotonic.return_value = 106.0
+        self.assertTrue(run.expired())
+        with self.assertRaises(budget.BudgetExceeded):
+            run.timeout()
+
+    @patch('requests.post')
+    def test_post_passes_timeout(self, mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {'response': 'ok'}
+        llm.post('/api/generate', {}, budget=budget.Budget(request_timeout=12))
+        self.assertEqual(mock_post.call_args.kwargs['timeout'], 12)
+
+    @patch('requests.post')
+    def test_post_timeout_past_budget_raises_budget_exceeded(self, mock_post):
+        run = budget.Budget(5)
+
+        def time_out(*args, **kwargs):
+            run.deadline = 0  # The budget ran out while the request was in flight
+            raise requests.exceptions.ReadTimeout("Read timed out")
+        mock_post.side_effect = time_out
+
+        with self.assertRaises(budget.BudgetExceeded):
+            llm.post('/api/generate', {}, budget=run)
+
+    @patch('requests.post')
+    def test_post_timeout_within_budget_is_request_error(self, mock_post):
+        mock_post.side_effect = requests.exceptions.ReadTimeout("Read timed out")
+        with self.assertRaises(llm.OllamaRequestError):
+            llm.post('/api/generate', {}, budget=budget.Budget(60, request_timeout=5))
+
+    @override_settings(OLLAMA_MODELS={'title': ['tinyllama', 'phi']})
+    @patch('property_info.llm.call_model')
+    def test_generate_keeps_answer_when_budget_runs_out_mid_cascade(self, mock_call_model):
+        mock_call_model.side_effect = [
+            llm.Generation(text='A very long invalid title', model='tinyllama'),
+            budget.BudgetExceeded(),
+        ]
+        result = llm.generate('title', 'prompt', 'system', validate=lambda text: False)
+        self.assertEqual(result.model, 'tinyllama')
+
+    @patch('property_info.rewrite.selection.count_selected', return_value=3)
+    @patch('property_info.rewrite.history')
+    @patch('property_info.rewrite.transaction')
+    @patch('property_info.rewrite.connections')
+    @patch.object(RewritePropertyRatingReviewCommand, 'model')
+    def test_max_runtime_checkpoints_remaining_hotels(self, mock_model, mock_connections, mock_transaction, mock_history, mock_count):
+        stream_hotels(mock_connections, [
+            (1, 'Hotel One', 100, 'Standard', 'Paris', 48.85, 2.35),
+            (2, 'Hotel Two', 120, 'Suite', 'Paris', 48.86, 2.34),
+            (3, 'Hotel Three', 90, 'Standard', 'Lyon', 45.76, 4.83),
+        ])
+        mock_model.objects.filter.return_value = []
+        mock_history.new_run_id.return_value = 'run1'
+
+        run = budget.Budget(3600)
+        calls = []
+
+        def generate(hotel_name, *args, **kwargs):
+            calls.append(hotel_name)
+            if len(calls) == 2:
+                # The run's budget runs out while the second hotel is being generated
+                run.deadline = 0
+                raise budget.BudgetExceeded()
+            return 4.0, "Fine for a short stay, with clean rooms and helpful staff at the front desk."
+
+        command = RewritePropertyRatingReviewCommand(stdout=StringIO())
+        command.generate_rating_and_review = generate
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(CHECKPOINT_DIR=directory):
+
+            with patch(
+                'property_info.rewrite.run_budget', return_value=run
+            ):
+                # One generation worker, so the hotels are generated in order
+                command.handle(workers={'generate': 1})
+
+            with open(os.path.join(directory, "rewrite_property_rating_review-run1.json")) as f:
+                checkpoint = json.load(f)
+
+        self.assertEqual(calls, ['Hotel One', 'Hotel Two'])
+        self.assertEqual(checkpoint['hotel_ids'], [2, 3])
+        self.assertIn("2 hotels not processed", command.stdout.getvalue())
+
+    def test_select_sql_resumes_checkpoint(self):
+        sql, params = selection.select_sql(['hotel_id'], {'resume_ids': [2, 3], 'limit': 0}, 10)
+        self.assertIn("hotel_id = ANY(%s)", sql)
+        self.assertEqual(params, [[2, 3]])
+
+    def test_resume_processes_every_checkpointed_hotel(self):
+        hotel_ids = list(range(1, 16))  # More than the default limit of 10
+        with tempfile.TemporaryDirectory() as directory, override_settings(CHECKPOINT_DIR=directory):
+            path = budget.write_checkpoint('rewrite_property_summary', 'run1', hotel_ids)
+            parser = RewritePropertySummaryCommand().create_parser('manage.py', 'rewrite_property_summary')
+            options = vars(parser.parse_args(['--resume', path]))
+
+        sql, params = selection.select_sql(['hotel_id'], options, RewritePropertySummaryCommand.default_limit)
+        self.assertNotIn("LIMIT", sql)
+        self.assertEqual(params, [hotel_ids])
+
+        # An explicit --limit still applies, and without a list of hotels the default does
+        sql, params = selection.select_sql(['hotel_id'], dict(options, limit=5), 10)
+        self.assertEqual(params[-1], 5)
+        self.assertEqual(selection.selection_limit({'hotel_ids': [1, 2]}, 2), 0)
+        self.assertEqual(selection.selection_limit({}, 2), 2)
+
+################# TEST FOR TIME BUDGET ENDS   #####################################
+################# TEST FOR QUALITY GATE STARTS   #####################################
+
+def reject_exclamations(text, context):
+    return "exclamation mark" if '!' in text else None
+
+
+class TestQualityGate(unittest.TestCase):
+
+    def test_word_count(self):
+        check = validation.word_count(1, 4)
+        self.assertIsNone(check('"Seaside Grand Hotel"', {}))
+        self.assertIn("at most 4", check("The Seaside Grand Hotel and Spa", {}))
+
+    def test_rating_range(self):
+        check = validation.rating_range(1, 5)
+        self.assertIsNone(check("Good.", {'rating': 4.5}))
+        self.assertIsNotNone(check("Good.", {'rating': 0.0}))
+        self.assertIsNotNone(check("Good.", {}))
+
+    def test_english(self):
+        check = validation.english()
+        self.assertIsNone(check(
+            "A quiet hotel in the old town with a rooftop terrace and views of the river from most rooms.", {}
+        ))
+        self.assertIsNotNone(check(
+            "Ein ruhiges Hotel mitten der Altstadt mit Dachterrasse und Blick über den Fluss aus den meisten Zimmern.", {}
+        ))
+        self.assertIsNone(check("Great experience.", {}))  # Too short to judge
+
+    def test_no_placeholder(self):
+        self.assertIsNotNone(validation.no_placeholder("Name unavailable", {}))
+        self.assertIsNone(validation.no_placeholder("Harbour View Inn", {}))
+
+    def test_no_prompt_leak(self):
+        check = validation.no_prompt_leak()
+        context = {'prompt': "Generate a summary for the following hotel: Hotel Name: Harbour Inn", 'system': ''}
+        self.assertIsNotNone(check("Sure! Generate a summary for the following hotel: Harbour Inn is great.", context))
+        self.assertIsNone(check("Harbour Inn is a friendly hotel by the port.", context))
+
+    @override_settings(OUTPUT_VALIDATORS={'title': ['property_info.tests.reject_exclamations']})
+    def test_pipeline_adds_configured_validators(self):
+        pipeline = validation.pipeline_for('title')
+        self.assertEqual(pipeline.errors("Sunny Stay!"), ["exclamation mark"])
+        self.assertEqual(pipeline.errors(""), ["empty output"])
+        self.assertTrue(pipeline.is_valid("Sunny Stay"))
+
+    def test_retry_queue_caps_attempts(self):
+        queue = validation.RetryQueue(['a', 'b'], max_attempts=2)
+        seen = []
+        while queue:
+            item, attempt = queue.pop()
+            seen.append((item, attempt))
+            if item == 'a':
+                queue.retry(item, attempt, ["bad"])
+
+        # The retry comes after every first attempt
+        self.assertEqual(seen, [('a', 1), ('b', 1), ('a', 2)])
+        self.assertEqual(queue.retried, 1)
+        self.assertEqual(queue.rejected, [('a', ["bad"])])
+
+    @patch('property_info.management.commands.rewrite_property_titles.history')
+    @patch('property_info.management.commands.rewrite_property_titles.Hotel')
+    @patch('property_info.management.commands.rewrite_property_titles.transaction')
+    @patch('property_info.management.commands.rewrite_property_titles.connections')
+    def test_titles_only_regenerate_failed_artifact(self, mock_connections, mock_transaction, mock_hotel, mock_history):
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [(1, "Harbour Inn", "Suite", "Lisbon", "Old description")]
+        mock_connections['travel'].cursor.return_value.__enter__.return_value = mock_cursor
+
+        description = "A bright suite hotel near the river with a terrace, a café and easy walks to the old town."
+        command = RewritePropertyTitlesCommand(stdout=StringIO())
+        command.rewrite_title = MagicMock(side_effect=[None, "Tagus Light Suites"])
+        command.generate_description = MagicMock(return_value=description)
+
+        command.handle()
+
+        updates = [c.args for c in mock_cursor.execute.call_args_list if 'UPDATE hotels' in c.args[0]]
+        self.assertEqual(updates, [
+            ("UPDATE hotels SET description = %s WHERE hotel_id = %s", [description, 1]),
+            ("UPDATE hotels SET hotel_name = %s WHERE hotel_id = %s", ["Tagus Light Suites", 1]),
+        ])
+        self.assertEqual(command.generate_description.call_count, 1)
+        self.assertNotIn("Name unavailable", command.stdout.getvalue())
+
+    @patch('property_info.management.commands.rewrite_property_titles.history')
+    @patch('property_info.management.commands.rewrite_property_titles.Hotel')
+    @patch('property_info.management.commands.rewrite_property_titles.transaction')
+    @patch('property_info.management.commands.rewrite_property_titles.connections')
+    def test_titles_keep_stored_name_when_rejected(self, mock_connections, mock_transaction, mock_hotel, mock_history):
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = [(1, "Harbour Inn", "Suite", "Lisbon", "Old description")]
+        mock_connections['travel'].cursor.return_value.__enter__.return_value = mock_cursor
+
+        command = RewritePropertyTitlesCommand(stdout=StringIO())
+        command.rewrite_title = MagicMock(return_value="The Wonderful Harbour Inn of Lisbon")
+        command.generate_description = MagicMock(return_value="Description not available")
+
+        command.handle(max_attempts=2)
+
+        self.assertFalse(any('UPDATE hotels' in c.args[0] for c in mock_cursor.execute.call_args_list))
+        self.assertEqual(command.rewrite_title.call_count, 2)
+        self.assertIn("Keeping the stored title and description", command.stdout.getvalue())
+        mock_history.record.assert_not_called()
+
+################# TEST FOR QUALITY GATE ENDS   #####################################
+################# TEST FOR PROGRESS STARTS   #####################################
+
+class TestProgress(unittest.TestCase):
+
+    @patch('property_info.progress.time.monotonic')
+    def test_line_reports_rate_latency_and_eta(self, mock_monotonic):
+        mock_monotonic.return_value = 0.0
+        progress = Progress(StringIO(), total=100, interval=60)
+
+        mock_monotonic.return_value = 10.0
+        for latency in (1.0, 2.0, 3.0, 2.0):
+            progress.step([llm.Generation(text='x', model='phi', latency=latency)])
+        progress.step(error=True)
+
+        self.assertEqual(
+            progress.line(),
+            "5/100 hotels (5%) | 0.50 hotels/s | LLM 2.0s | 1 errors | ETA 3m 10s"
+        )
+
+    @patch('property_info.progress.time.monotonic')
+    def test_step_is_rate_limited(self, mock_monotonic):
+        out = StringIO()
+        mock_monotonic.return_value = 0.0
+        progress = Progress(OutputWrapper(out), total=10, interval=5)
+
+        for now in (1.0, 2.0, 6.0, 7.0, 12.0):
+            mock_monotonic.return_value = now
+            progress.step()
+
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+    def test_retried_attempt_does_not_count_as_processed(self):
+        progress = Progress(StringIO(), total=1, interval=60)
+        progress.step([llm.Generation(text='x', model='phi', latency=4.0)], done=False)
+        self.assertEqual(progress.processed, 0)
+        self.assertEqual(list(progress.latencies), [4.0])
+
+    @patch('property_info.rewrite.selection.count_selected', return_value=1)
+    @patch('property_info.rewrite.history')
+    @patch('property_info.rewrite.transaction')
+    @patch('property_info.rewrite.connections')
+    @patch.object(RewritePropertyRatingReviewCommand, 'model')
+    def test_per_hotel_output_needs_verbosity_2(self, mock_model, mock_connections, mock_transaction, mock_history, mock_count):
+        stream_hotels(mock_connections, [(1, 'Hotel Test', 100, 'Standard', 'New York', 40.7128, -74.0060)])
+        mock_model.objects.filter.return_value = []
+
+        for verbosity, shown in ((1, False), (2, True)):
+            command = RewritePropertyRatingReviewCommand(stdout=StringIO())
+            command.generate_rating_and_review = MagicMock(return_value=(4.5, "Amazing stay with spacious rooms, attentive service and a quiet street right next to the park."))
+            command.handle(verbosity=verbosity)
+
+            output = command.stdout.getvalue()
+            self.assertEqual("Created new rating and review for Hotel Test" in output, shown)
+            self.assertIn("1/1 hotels (100%)", output)
+
+################# TEST FOR PROGRESS ENDS   #####################################
+################# TEST FOR LOAD TEST STARTS   #####################################
+
+class TestLoadTest(unittest.TestCase):
+
+    def test_fake_ollama_serves_generate_and_embeddings(self):
+        with loadtest.FakeOllama() as ollama, override_settings(OLLAMA_URL=ollama.url):
+            result = llm.call_model('phi', 'Describe the hotel', 'system')
+            vector = llm.embed('hotel', 'nomic-embed-text')
+
+        self.assertTrue(result.text.startswith("Rating: 4"))
+        self.assertEqual(result.prompt_tokens, 3)
+        self.assertEqual(len(vector), 8)
+        self.assertEqual(ollama.calls, 2)
+
+    @patch('property_info.views.transaction')
+    @patch('property_info.views.history')
+    @patch('property_info.views.PropertyRatingReview')
+    @patch('property_info.views.PropertySummary')
+    @patch('property_info.views.Hotel')
+    def test_misses_generate_through_fake_ollama(self, mock_hotel, mock_summary, mock_review, mock_history, mock_transaction):
+        hotel = Hotel(
+            hotel_id=8, city_id=1, hotel_name="Harbour Inn", price=120, rating=4.2, room_type="Suite",
+            location="Lisbon", latitude=38.7, longitude=-9.1, description="By the river."
+        )
+        mock_hotel.objects.in_bulk_cached.return_value = {8: hotel}
+        mock_review.objects.filter.return_value.values.return_value.first.return_value = None
+        stored = {}
+
+        def summaries(property_id):
+            rows = MagicMock()
+            rows.values_list.return_value.first.return_value = stored.get(property_id)
+            return rows
+
+        mock_summary.objects.filter.side_effect = summaries
+        mock_summary.objects.create.side_effect = lambda property_id, summary: stored.update({property_id: summary})
+
+        with loadtest.FakeOllama() as ollama, override_settings(
+            OLLAMA_URL=ollama.url,
+            MIDDLEWARE=['property_info.loadtest.QueryCountMiddleware', *settings.MIDDLEWARE],
+            ALLOWED_HOSTS=['localhost'],
+        ):
+            application = get_asgi_application()
+            results = asyncio.run(loadtest.run(application, [('miss', 8), ('miss', 8), ('miss', 8)], concurrency=3))
+
+        # The first miss generates the summary; the others wait for it and read it back
+        self.assertEqual([result.status for result in results], [200, 200, 200])
+        self.assertEqual(ollama.calls, 1)
+        self.assertTrue(stored[8].startswith("A comfortable, well-run hotel"))
+        mock_history.record.assert_called_once()
+
+    def test_request_mix_follows_ratios(self):
+        mix = loadtest.request_mix(
+            10000, [1, 2], list(range(3, 100)), [100, 101], hot_ratio=0.8, miss_ratio=0.1, rng=random.Random(0)
+        )
+        counts = {kind: sum(k == kind for k, hotel_id in mix) for kind in loadtest.KINDS}
+        self.assertAlmostEqual(counts['miss'] / 10000, 0.1, delta=0.02)
+        self.assertAlmostEqual(counts['hot'] / 10000, 0.72, delta=0.02)
+        self.assertTrue(all(hotel_id in (1, 2) for kind, hotel_id in mix if kind == 'hot'))
+
+    @patch('property_info.views.PropertyRatingReview')
+    @patch('property_info.views.PropertySummary')
+    @patch('property_info.views.Hotel')
+    def test_run_drives_asgi_app_and_counts_queries(self, mock_hotel, mock_summary, mock_review):
+        hotel = Hotel(
+            hotel_id=7, city_id=1, hotel_name="Harbour Inn", price=120, rating=4.2, room_type="Suite",
+            location="Lisbon", latitude=38.7, longitude=-9.1, description="By the river."
+        )
+        mock_hotel.objects.in_bulk_cached.side_effect = lambda ids: {7: hotel} if 7 in ids else {}
+        mock_summary.objects.filter.return_value.values_list.return_value.first.return_value = "Lovely."
+        mock_review.objects.filter.return_value.values.return_value.first.return_value = None
+
+        with override_settings(
+            MIDDLEWARE=['property_info.loadtest.QueryCountMiddleware', *settings.MIDDLEWARE],
+            ALLOWED_HOSTS=['localhost'],
+        ):
+            application = get_asgi_application()
+            results = asyncio.run(loadtest.run(application, [('hot', 7), ('miss', 8), ('hot', 7)], concurrency=2))
+
+        self.assertEqual(sorted(result.status for result in results), [200, 200, 404])
+        self.assertTrue(all(result.queries == 0 for result in results))  # The models are mocked
+
+        lines = loadtest.report(results, elapsed=1.5, concurrency=2)
+        self.assertEqual(lines[0], "Requests: 3 in 1.5s, 2.0 req/s at concurrency 2")
+        self.assertIn("errors 1", lines[2])
+
+    @patch('property_info.views.PropertyRatingReview')
+    @patch('property_info.views.PropertySummary')
+    @patch('property_info.views.Hotel')
+    def test_property_detail_has_null_for_missing_content(self, mock_hotel, mock_summary, mock_review):
+        hotel = Hotel(
+            hotel_id=7, city_id=1, hotel_name="Harbour Inn", price=120, rating=4.2, room_type="Suite",
+            location="Lisbon", latitude=38.7, longitude=-9.1, description=None
+        )
+        mock_hotel.objects.in_bulk_cached.return_value = {7: hotel}
+        mock_summary.objects.filter.return_value.values_list.return_value.first.return_value = None
+        mock_review.objects.filter.return_value.values.return_value.first.return_value = {
+            'rating': 4.0, 'review': "Clean rooms."
+        }
+
+        response = views.property_detail(RequestFactory().get('/api/properties/7/'), 7)
+
+        data = json.loads(response.content)
+        self.assertIsNone(data['summary'])
+        self.assertEqual(data['review'], "Clean rooms.")
+        self.assertEqual(data['hotel_name'], "Harbour Inn")
+
+################# TEST FOR LOAD TEST ENDS   #####################################
+################# TEST FOR GEO BATCHING STARTS   #####################################
+
+class TestGeoBatching(unittest.TestCase):
+
+    def test_encode_matches_reference_geohash(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(geo.encode(57.64911, 10.40744), "u4pruydq")
+
+    def test_geohash_function_parses(self):
+        # pglast wraps the Postgres parser, so a keyword used as an identifier fails here as it would on the server
+        try:
+            import pglast
+        except ImportError:
+            self.skipTest("pglast is not installed")
+
+        pglast.parse_sql(geo.GEOHASH_FUNCTION_SQL)
+        pglast.parse_plpgsql(geo.GEOHASH_FUNCTION_SQL)
+
+    def test_geohash_function_matches_encode(self):
+        # Creates the function on the travel database inside a transaction that is rolled back
+        try:
+            connections['travel'].ensure_connection()
+        except OperationalError:
+            self.skipTest("The travel database is not reachable")
+
+        with transaction.atomic(using='travel'):
+            with connections['travel'].cursor() as cursor:
+                cursor.execute(geo.GEOHASH_FUNCTION_SQL)
+                cursor.execute(
+                    "SELECT geohash_encode(%s, %s, 11), geohash_encode(%s, %s, %s)",
+                    [57.64911, 10.40744, 38.7101, -9.1401, geo.COLUMN_PRECISION]
+                )
+                self.assertEqual(cursor.fetchone(), ("u4pruydqqvj", geo.encode(38.7101, -9.1401)))
+            transaction.set_rollback(True, using='travel')
+
+    def test_covering_cells_cover_the_corners(self):
+        bbox = (38.70, -9.16, 38.73, -9.12)
+        cells = geo.covering_cells(bbox)
+
+        self.assertLessEqual(len(cells), 32)
+        precision = len(cells[0])
+        for lat in (bbox[0], bbox[2]):
+            for lon in (bbox[1], bbox[3]):
+                self.assertIn(geo.encode(lat, lon, precision), cells)
+
+    def test_parse_bbox_rejects_inverted_box(self):
+        self.assertEqual(geo.parse_bbox("38.7,-9.2,38.8,-9.1"), (38.7, -9.2, 38.8, -9.1))
+        with self.assertRaises(argparse.ArgumentTypeError):
+            geo.parse_bbox("38.8,-9.2,38.7,-9.1")
+        with self.assertRaises(argparse.ArgumentTypeError):
+            geo.parse_near("38.7,-9.1")
+
+    def test_select_sql_by_region(self):
+        sql, params = selection.select_sql(['hotel_id'], {'near': (38.72, -9.14, 2.0), 'limit': 0}, 10)
+
+        self.assertIn("geohash LIKE %s", sql)
+        self.assertIn("asin(sqrt(", sql)
+        prefixes = [param for param in params if isinstance(param, str)]
+        self.assertTrue(prefixes and all(prefix.endswith('%') for prefix in prefixes))
+        self.assertIn(geo.encode(38.72, -9.14, len(prefixes[0]) - 1) + '%', prefixes)
+
+    @override_settings(NEIGHBOURHOOD_PRECISION=6)
+    @patch('property_info.neighbourhood.connections')
+    @patch('property_info.neighbourhood.NeighbourhoodContext')
+    @patch('property_info.neighbourhood.llm.generate')
+    def test_neighbourhood_context_generated_once_per_cell(self, mock_generate, mock_context, mock_connections):
+        mock_context.objects.filter.return_value.values_list.return_value.first.return_value = None
+        mock_cursor = mock_connections['travel'].cursor.return_value.__enter__.return_value
+        mock_cursor.fetchall.return_value = [("Baixa",), ("Chiado",)]
+        mock_generate.return_value = llm.Generation(
+            text="A lively riverside quarter with tiled squares, tram stops and small museums close by.", model='phi'
+        )
+        neighbourhoods = Neighbourhoods()
+
+        first = neighbourhoods.context(38.7101, -9.1401)
+        second = neighbourhoods.context(38.7102, -9.1402)
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_generate.call_count, 1)
+        self.assertIn("Baixa; Chiado", mock_generate.call_args[0][1])
+        mock_context.objects.update_or_create.assert_called_once()
+        self.assertEqual((neighbourhoods.generated, neighbourhoods.reused), (1, 1))
+        # The locations come from the hotels inside the cell's bounds
+        min_lat, max_lat, min_lon, max_lon = mock_cursor.execute.call_args[0][1][:4]
+        self.assertTrue(min_lat <= 38.7101 < max_lat and min_lon <= -9.1401 < max_lon)
+
+    @override_settings(NEIGHBOURHOOD_PRECISION=6)
+    @patch('property_info.neighbourhood.connections')
+    @patch('property_info.neighbourhood.NeighbourhoodContext')
+    @patch('property_info.neighbourhood.llm.generate')
+    def test_neighbourhood_generation_only_blocks_its_own_cell(self, mock_generate, mock_context, mock_connections):
+        mock_context.objects.filter.return_value.values_list.return_value.first.return_value = None
+        mock_connections['travel'].cursor.return_value.__enter__.return_value.fetchall.return_value = []
+        lisbon_started, porto_done = threading.Event(), threading.Event()
+        waited = []
+
+        def generate(task, prompt, system, validate=None, budget=None):
+            if "38.7101" in prompt:
+                # Lisbon's generation is still running while Porto's context is asked for
+                lisbon_started.set()
+                waited.append(porto_done.wait(5))
+            return llm.Generation(
+                text="A lively riverside quarter with tiled squares, tram stops and small museums close by.", model='phi'
+            )
+
+        mock_generate.side_effect = generate
+        neighbourhoods = Neighbourhoods()
+        workers = [
+            threading.Thread(target=neighbourhoods.context, args=(38.7101, -9.1401)),
+            threading.Thread(target=neighbourhoods.context, args=(38.7102, -9.1402)),
+        ]
+        workers[0].start()
+        self.assertTrue(lisbon_started.wait(5))
+        workers[1].start()
+
+        self.assertIsNotNone(neighbourhoods.context(41.1496, -8.6109))
+        porto_done.set()
+        for worker in workers:
+            worker.join(5)
+
+        # The second Lisbon hotel waited for the first one's context instead of generating it again
+        self.assertEqual(waited, [True])
+        self.assertEqual(mock_generate.call_count, 2)
+        self.assertEqual((neighbourhoods.generated, neighbourhoods.reused), (2, 1))
+
+    def test_cell_order_groups_hotels_of_a_cell(self):
+        lat_step, lon_step = geo.cell_size(6)
+        sql, params = geo.cell_order(6)
+        self.assertEqual(params, [lat_step, lon_step])
+        # Matches the geohash grid: both points of one cell share the same floor indexes
+        for lat, lon in ((38.7101, -9.1401), (38.7102, -9.1402)):
+            self.assertEqual(geo.cell_bounds(lat, lon, 6)[:2], geo.cell_bounds(38.7101, -9.1401, 6)[:2])
+        self.assertEqual(geo.encode(38.7101, -9.1401, 6), geo.encode(38.7102, -9.1402, 6))
+
+    def test_summary_prompt_includes_neighbourhood(self):
+        command = RewritePropertySummaryCommand()
+
+        with patch.object(command, 'request_summary', return_value="A summary.") as mock_request:
+            command.generate_summary(
+                "Harbour Inn", 120, 4.2, "Suite", "Lisbon", 38.7, -9.1,
+                neighbourhood="Quiet streets near the old harbour."
+            )
+
+        prompt, trace, budget, validate = mock_request.call_args[0]
+        self.assertIn("Neighbourhood: Quiet streets near the old harbour.", prompt)
+        # Repeating the shared context is not a prompt leak
+        self.assertTrue(validate(
+            "Harbour Inn sits on quiet streets near the old harbour, with spacious suites and a calm, friendly feel."
+        ))
+
+################# TEST FOR GEO BATCHING ENDS   #####################################
+################# TEST FOR PIPELINE STARTS   #####################################
+
+class TestPipeline(unittest.TestCase):
+
+    def test_bounded_queues_hold_back_the_fetcher(self):
+        in_flight = []
+        state = {'fetched': 0, 'written': 0}
+
+        def source():
+            for number in range(200):
+                state['fetched'] += 1
+                in_flight.append(state['fetched'] - state['written'])
+                yield number
+
+        def slow(number):
+            time.sleep(0.001)
+            return number
+
+        def write(numbers):
+            state['written'] += len(numbers)
+
+        stages = [
+            Stage('prompt', lambda number: number, depth=4),
+            Stage('generate', slow, workers=2, depth=4),
+            Stage('write', write, depth=4, batch=10),
+        ]
+        pipeline = Pipeline(source(), stages)
+        pipeline.run()
+
+        self.assertEqual(state['written'], 200)
+        # Queues, workers and one batch at most; never the whole run
+        self.assertLessEqual(max(in_flight), 3 * 4 + 2 + 10 + 2)
+        self.assertTrue(all(stage.peak <= 4 for stage in stages))
+        self.assertEqual(pipeline.slowest().name, 'generate')
+
+    def test_errors_go_to_on_error_and_the_run_goes_on(self):
+        errors, written = [], []
+
+        def check(number):
+            if number % 3 == 0:
+                raise ValueError(f"bad {number}")
+            return number
+
+        pipeline = Pipeline(range(10), [
+            Stage('validate', check, workers=2),
+            Stage('write', written.extend, batch=4),
+        ], on_error=lambda stage, item, error: errors.append((stage, item)))
+        pipeline.run()
+
+        self.assertEqual(sorted(written), [1, 2, 4, 5, 7, 8])
+        self.assertEqual(sorted(errors), [('validate', 0), ('validate', 3), ('validate', 6), ('validate', 9)])
+
+    def test_fetch_error_is_raised_after_the_stages_drain(self):
+        def source():
+            yield 1
+            raise RuntimeError("connection lost")
+
+        written = []
+        pipeline = Pipeline(source(), [Stage('write', written.extend, batch=5)])
+        with self.assertRaises(RuntimeError):
+            pipeline.run()
+        self.assertEqual(written, [1])
+
+    def test_parse_stage_values(self):
+        self.assertEqual(parse_stage_values('generate=8,write=2'), {'generate': 8, 'write': 2})
+        self.assertEqual(parse_stage_values('32')['validate'], 32)
+        for value in ('fetch=2', 'generate=0', 'generate'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_stage_values(value)
+
+    def test_progress_line_shows_queue_depths(self):
+        stages = [Stage('generate', None, workers=2, depth=8), Stage('write', None, depth=8)]
+        pipeline = Pipeline([], stages)
+        pipeline.started = time.monotonic() - 10
+        stages[0].busy = 18.0
+        stages[0].queue.put(1)
+
+        progress = Progress(StringIO(), total=10, interval=60, status=pipeline.status)
+        self.assertIn("| queues generate 1/8, write 0/8 | slowest generate", progress.line())
+        self.assertNotIn("queues", progress.line(final=True))
+
+    @patch('property_info.rewrite.selection.count_selected', return_value=2)
+    @patch('property_info.rewrite.history')
+    @patch('property_info.rewrite.transaction')
+    @patch('property_info.rewrite.connections')
+    @patch.object(RewritePropertySummaryCommand, 'model')
+    def test_pipeline_command_writes_summaries_with_history(self, mock_model, mock_connections, mock_transaction, mock_history, mock_count):
+        stream_hotels(mock_connections, [
+            (1, 'Harbour Inn', 120, 4.2, 'Suite', 'Lisbon', 38.7, -9.1),
+            (2, 'Old Town Rooms', 80, 3.9, 'Double', 'Lisbon', 38.71, -9.13),
+        ])
+        stored = MagicMock(property_id=1, summary="Old summary.")
+        mock_model.objects.filter.return_value = [stored]
+        mock_history.new_run_id.return_value = 'run1'
+        summary = "A calm harbour hotel with spacious suites, friendly staff and easy access to the old town."
+
+        command = RewritePropertySummaryCommand(stdout=StringIO())
+        command.generate_summary = MagicMock(return_value=summary)
+        command.handle()
+
+        mock_model.objects.bulk_update.assert_called_once_with([stored], ['summary'])
+        mock_model.assert_called_once_with(property_id=2, summary=summary)
+        recorded = {c.args[1]: c.kwargs['original'] for c in mock_history.record.call_args_list}
+        self.assertEqual(recorded, {1: "Old summary.", 2: None})
+        self.assertEqual({c.args[0] for c in mock_history.record.call_args_list}, {'summary'})
+
+    def test_hotel_budget_is_shared_by_context_and_generation(self):
+        command = RewritePropertySummaryCommand(stdout=StringIO())
+        command.budget = budget.Budget(600)
+        command.hotel_budget = 60
+        command.neighbourhoods = MagicMock()
+        command.generate_summary = MagicMock(return_value="A summary.")
+
+        job = command.generate(command.prepare(((1, 'Harbour Inn', 120, 4.2, 'Suite', 'Lisbon', 38.7, -9.1), 1)))
+
+        # The context lookup and the generation draw on the same per-hotel deadline
+        context_budget = command.neighbourhoods.context.call_args.kwargs['budget']
+        self.assertIs(command.generate_summary.call_args.kwargs['budget'], context_budget)
+        self.assertIs(job.budget, context_budget)
+        self.assertLessEqual(context_budget.remaining(), 60)
+
+################# TEST FOR PIPELINE ENDS   #####################################
+################# TEST FOR CHANGE WATCHER STARTS   #####################################
+
+class TestChangeWatcher(unittest.TestCase):
+
+    class Listener:
+        """Stands in for a LISTENing connection, on a fake clock.
+
+        ``events`` are ``(time, hotel_id)`` notifications. ``notifies`` honours
+        its timeout: it yields the notifications arriving before it expires,
+        then moves the clock to the timeout. Without a timeout and nothing
+        left to deliver, or once the clock would pass ``stop``, it raises
+        KeyboardInterrupt where a real connection would keep waiting.
+        """
+
+        def __init__(self, events, stop=None):
+            self.events = list(events)
+            self.stop = stop
+            self.now = 0.0
+
+        def monotonic(self):
+            return self.now
+
+        def notifies(self, timeout=None, stop_after=None):
+            deadline = None if timeout is None else self.now + timeout
+            delivered = 0
+            while self.events and (deadline is None or self.events[0][0] <= deadline):
+                at, hotel_id = self.events.pop(0)
+                if self.stop is not None and at >= self.stop:
+                    raise KeyboardInterrupt
+                self.now = max(self.now, at)
+                yield MagicMock(payload=str(hotel_id))
+                delivered += 1
+                if stop_after and delivered >= stop_after:
+                    return
+            if deadline is None or (self.stop is not None and deadline >= self.stop):
+                raise KeyboardInterrupt
+            self.now = deadline
+
+    def setUp(self):
+        # Interrupting the watcher with changes pending writes a checkpoint; keep those out of BASE_DIR
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        checkpoints = override_settings(CHECKPOINT_DIR=directory.name)
+        checkpoints.enable()
+        self.addCleanup(checkpoints.disable)
+
+    def listening(self, mock_psycopg, mock_time, events, stop=None):
+        mock_psycopg.OperationalError = type('OperationalError', (Exception,), {})
+        listener = self.Listener(events, stop)
+        connection = mock_psycopg.connect.return_value
+        connection.notifies.side_effect = listener.notifies
+        mock_time.monotonic.side_effect = listener.monotonic
+        return connection
+
+    def batches(self, mock_call_command, name='rewrite_property_summary'):
+        return [c.kwargs['hotel_ids'] for c in mock_call_command.call_args_list if c.args[0] == name]
+
+    def test_buffer_coalesces_repeated_changes(self):
+        changes = notify.ChangeBuffer(debounce=30, max_wait=300, batch_size=10)
+        for hotel_id in (1, 2, 1, 1, 3):
+            changes.add(hotel_id, 0)
+
+        self.assertEqual(changes.received, 5)
+        self.assertEqual(len(changes), 3)
+        self.assertEqual(changes.take(), [1, 2, 3])
+        self.assertEqual(len(changes), 0)
+
+    def test_buffer_waits_for_quiet_period(self):
+        changes = notify.ChangeBuffer(debounce=30, max_wait=300, batch_size=10)
+        self.assertIsNone(changes.wait(0))
+        self.assertFalse(changes.due(0))
+
+        changes.add(1, 0)
+        changes.add(2, 20)  # Restarts the debounce
+        self.assertFalse(changes.due(40))
+        self.assertEqual(changes.wait(40), 10)
+        self.assertTrue(changes.due(50))
+
+    def test_buffer_max_wait_bounds_debounce(self):
+        changes = notify.ChangeBuffer(debounce=30, max_wait=60, batch_size=10)
+        for now in range(0, 70, 10):
+            changes.add(now, now)  # A change every 10s never leaves a quiet period
+
+        self.assertTrue(changes.due(60))
+
+    def test_buffer_releases_full_batch_at_once(self):
+        changes = notify.ChangeBuffer(debounce=30, max_wait=300, batch_size=2)
+        for hotel_id in (1, 2, 3):
+            changes.add(hotel_id, 0)
+
+        self.assertTrue(changes.due(0))
+        self.assertEqual(changes.take(), [1, 2])
+        self.assertFalse(changes.due(0))
+        self.assertEqual(changes.take(), [3])
+
+    def test_trigger_only_notifies_on_prompt_columns(self):
+        self.assertIn("AFTER INSERT OR UPDATE OF hotel_name, price, rating", notify.TRIGGER_SQL)
+        self.assertIn("IS NOT DISTINCT FROM", notify.TRIGGER_SQL)
+        self.assertIn("pg_notify('hotel_changes', NEW.hotel_id::text)", notify.TRIGGER_SQL)
+        self.assertNotIn("description", notify.TRIGGER_SQL)
+
+    @patch.object(watch_hotel_changes, 'time')
+    @patch.object(watch_hotel_changes, 'call_command')
+    @patch.object(watch_hotel_changes, 'connections')
+    @patch.object(watch_hotel_changes, 'psycopg')
+    def test_flushes_batch_after_quiet_period(self, mock_psycopg, mock_connections, mock_call_command, mock_time):
+        mock_connections['travel'].get_connection_params.return_value = {'dbname': 'travel'}
+        connection = self.listening(mock_psycopg, mock_time, [(0, 5), (1, 7), (2, 5), (3, 'not-an-id'), (100, 9)])
+
+        command = watch_hotel_changes.Command(stdout=StringIO())
+        command.handle(debounce=30, max_wait=300, batch_size=10)
+
+        mock_psycopg.connect.assert_called_once_with(autocommit=True, dbname='travel')
+        connection.execute.assert_called_once_with("LISTEN hotel_changes")
+        # A single change after an idle period is flushed too, once nothing else arrives
+        self.assertEqual(
+            [(c.args[0], c.kwargs['hotel_ids']) for c in mock_call_command.call_args_list],
+            [
+                ('rewrite_property_summary', [5, 7]), ('rewrite_property_rating_review', [5, 7]),
+                ('rewrite_property_summary', [9]), ('rewrite_property_rating_review', [9]),
+            ]
+        )
+        self.assertTrue(all(c.kwargs.get('stop_after') == 1 for c in connection.notifies.call_args_list))
+        connection.close.assert_called_once()
+
+    @patch.object(watch_hotel_changes, 'time')
+    @patch.object(watch_hotel_changes, 'call_command')
+    @patch.object(watch_hotel_changes, 'connections')
+    @patch.object(watch_hotel_changes, 'psycopg')
+    def test_max_wait_flushes_steady_changes(self, mock_psycopg, mock_connections, mock_call_command, mock_time):
+        # A change every 10s never leaves a 30s quiet period
+        self.listening(mock_psycopg, mock_time, [(10 * i, i + 1) for i in range(20)])
+
+        watch_hotel_changes.Command(stdout=StringIO()).handle(artifacts=['summary'], debounce=30, max_wait=60, batch_size=100)
+
+        self.assertEqual(self.batches(mock_call_command)[0], [1, 2, 3, 4, 5, 6, 7])
+
+    @patch.object(watch_hotel_changes, 'time')
+    @patch.object(watch_hotel_changes, 'call_command')
+    @patch.object(watch_hotel_changes, 'connections')
+    @patch.object(watch_hotel_changes, 'psycopg')
+    def test_full_batch_goes_without_waiting(self, mock_psycopg, mock_connections, mock_call_command, mock_time):
+        self.listening(mock_psycopg, mock_time, [(0, 1), (0, 2), (0, 3)], stop=5)
+
+        watch_hotel_changes.Command(stdout=StringIO()).handle(artifacts=['summary'], debounce=30, max_wait=300, batch_size=2)
+
+        self.assertEqual(self.batches(mock_call_command), [[1, 2]])
+
+    @patch.object(watch_hotel_changes, 'time')
+    @patch.object(watch_hotel_changes, 'call_command')
+    @patch.object(watch_hotel_changes, 'connections')
+    @patch.object(watch_hotel_changes, 'psycopg')
+    def test_failed_batch_does_not_stop_watcher(self, mock_psycopg, mock_connections, mock_call_command, mock_time):
+        self.listening(mock_psycopg, mock_time, [(0, 1), (100, 2)])
+        mock_call_command.side_effect = [Exception("Ollama is down"), None]
+
+        out = StringIO()
+        watch_hotel_changes.Command(stdout=out).handle(artifacts=['summary'], debounce=10, max_wait=60, batch_size=10)
+
+        self.assertEqual(self.batches(mock_call_command), [[1], [2]])
+        self.assertIn("rewrite_property_summary failed for 1 hotel(s): Ollama is down", out.getvalue())
+
+    @patch.object(watch_hotel_changes, 'write_checkpoint')
+    @patch.object(watch_hotel_changes.history, 'new_run_id')
+    @patch.object(watch_hotel_changes, 'time')
+    @patch.object(watch_hotel_changes, 'call_command')
+    @patch.object(watch_hotel_changes, 'connections')
+    @patch.object(watch_hotel_changes, 'psycopg')
+    def test_interrupt_checkpoints_pending_changes(
+        self, mock_psycopg, mock_connections, mock_call_command, mock_time, mock_new_run_id, mock_write_checkpoint
+    ):
+        self.listening(mock_psycopg, mock_time, [(0, 3), (1, 4)], stop=10)
+        mock_new_run_id.return_value = 'run1'
+        mock_write_checkpoint.return_value = '/tmp/watch.json'
+
+        out = StringIO()
+        watch_hotel_changes.Command(stdout=out).handle(debounce=60, max_wait=300, batch_size=10)
+
+        mock_call_command.assert_not_called()
+        mock_write_checkpoint.assert_called_once_with('watch_hotel_changes', 'run1', [3, 4])
+        self.assertIn("--resume /tmp/watch.json", out.getvalue())
+
+################# TEST FOR CHANGE WATCHER ENDS   #####################################
+################# TEST FOR CONTENT SEARCH STARTS   #####################################
+
+class TestContentSearch(unittest.TestCase):
+
+    def hotel(self, hotel_id, name):
+        return MagicMock(hotel_id=hotel_id, hotel_name=name)
+
+    def test_search_vectors_are_generated_and_indexed(self):
+        for model, column in ((PropertySummary, 'summary'), (PropertyRatingReview, 'review')):
+            field = model._meta.get_field('search')
+            self.assertTrue(field.generated)
+            self.assertTrue(field.db_persist)
+            self.assertEqual(field.expression.source_expressions[0].name, column)
+            self.assertEqual([index.fields for index in model._meta.indexes], [['search']])
+
+    @patch.object(search, '_matches')
+    def test_search_content_merges_summary_and_review_hits(self, mock_matches):
+        mock_matches.side_effect = [
+            [(1, 0.5, 'a <b>quiet</b> beach'), (2, 0.2, '<b>quiet</b> street')],
+            [(1, 0.25, 'very <b>quiet</b>')],
+        ]
+
+        hits = search.search_content('quiet', limit=5)
+
+        self.assertEqual(hits, {
+            1: {'rank': 0.75, 'summary': 'a <b>quiet</b> beach', 'review': 'very <b>quiet</b>'},
+            2: {'rank': 0.2, 'summary': '<b>quiet</b> street', 'review': None},
+        })
+        self.assertEqual([c.args[0] for c in mock_matches.call_args_list], [PropertySummary, PropertyRatingReview])
+
+    @patch.object(search, 'Hotel')
+    @patch.object(search, 'search_names')
+    @patch.object(search, 'search_content')
+    def test_search_ranks_content_results(self, mock_content, mock_names, mock_hotel):
+        mock_content.return_value = {
+            1: {'rank': 0.2, 'summary': 'quiet', 'review': None},
+            2: {'rank': 0.9, 'summary': None, 'review': 'quiet'},
+        }
+        mock_hotel.objects.in_bulk_cached.return_value = {1: self.hotel(1, 'Sea View'), 2: self.hotel(2, 'Old Town')}
+
+        results = search.search(text='quiet', limit=10)
+
+        mock_names.assert_not_called()
+        self.assertEqual([result['hotel_id'] for result in results], [2, 1])
+        self.assertEqual(results[0], {'hotel_id': 2, 'hotel_name': 'Old Town', 'score': 0.9, 'summary': None, 'review': 'quiet'})
+
+    @patch.object(search, 'Hotel')
+    @patch.object(search, 'search_names')
+    @patch.object(search, 'search_content')
+    def test_search_by_text_and_name_matches_both(self, mock_content, mock_names, mock_hotel):
+        mock_content.return_value = {
+            1: {'rank': 0.2, 'summary': 'quiet', 'review': None},
+            2: {'rank': 0.9, 'summary': 'quiet', 'review': None},
+        }
+        mock_names.return_value = {1: 0.8}
+        mock_hotel.objects.in_bulk_cached.return_value = {1: self.hotel(1, 'Hilton Garden')}
+
+        results = search.search(text='quiet', name='hiltn', limit=10)
+
+        mock_content.assert_called_once_with('quiet', search.CANDIDATES)
+        self.assertEqual(list(mock_names.call_args.kwargs['hotel_ids']), [1, 2])
+        self.assertEqual([(result['hotel_id'], result['score']) for result in results], [(1, 1.0)])
+
+    @patch.object(search, 'search_names')
+    @patch.object(search, 'search_content')
+    def test_search_without_text_or_name_is_empty(self, mock_content, mock_names):
+        self.assertEqual(search.search(), [])
+        mock_content.assert_not_called()
+        mock_names.assert_not_called()
+
+    @patch.object(search, 'Hotel')
+    def test_search_names_uses_trigram_lookup(self, mock_hotel):
+        hotels = mock_hotel.objects.filter.return_value
+        hotels.annotate.return_value.order_by.return_value.values_list.return_value = [(3, 0.7)]
+
+        self.assertEqual(search.search_names('hiltn', limit=5), {3: 0.7})
+        mock_hotel.objects.filter.assert_called_once_with(hotel_name__trigram_word_similar='hiltn')
+
+    def test_view_requires_a_query(self):
+        response = views.property_search(RequestFactory().get('/api/properties/search/'))
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch.object(views.search, 'search')
+    def test_view_clamps_limit(self, mock_search):
+        mock_search.return_value = [{'hotel_id': 1}]
+
+        response = views.property_search(RequestFactory().get('/api/properties/search/', {'q': ' pool ', 'limit': 5000}))
+
+        mock_search.assert_called_once_with(text='pool', name=None, limit=search.MAX_LIMIT)
+        self.assertEqual(json.loads(response.content), {'q': 'pool', 'name': '', 'count': 1, 'results': [{'hotel_id': 1}]})
+
+    def test_admin_searches_text_or_property_id(self):
+        from django.contrib import admin
+        model_admin = admin.site._registry[PropertySummary]
+        self.assertIsInstance(model_admin, property_admin.ContentSearchMixin)
+        queryset = MagicMock()
+
+        model_admin.get_search_results(None, queryset, 'rooftop pool')
+        queryset.filter.assert_called_once_with(search=search.content_query('rooftop pool'))
+
+        with patch('django.contrib.admin.ModelAdmin.get_search_results', return_value=(queryset, False)) as mock_super:
+            model_admin.get_search_results(None, queryset, ' 42 ')
+        mock_super.assert_called_once_with(None, queryset, '42')
+
+################# TEST FOR CONTENT SEARCH ENDS   #####################################
+################# TEST FOR TEXT BLOBS STARTS   #####################################
+
+class TestTextBlobs(unittest.TestCase):
+
+    REVIEW = "Spacious rooms with a view of the harbour and a quiet garden. " * 10
+
+    def test_encode_round_trips(self):
+        for compression in (None, 'zstd'):
+            data, codec = blobs.encode(self.REVIEW, compression)
+            self.assertEqual(blobs.decode(memoryview(data), codec), self.REVIEW)
+
+        data, codec = blobs.encode(self.REVIEW, 'zstd')
+        self.assertEqual(codec, 'zstd')
+        self.assertLess(len(data), len(self.REVIEW))
+
+    def test_short_text_is_not_compressed(self):
+        self.assertEqual(blobs.encode("Review not available", 'zstd'), (b"Review not available", ''))
+        with self.assertRaises(ValueError):
+            blobs.encode("text", 'lz4')
+
+    def test_store_saves_each_distinct_text_once(self):
+        with patch.object(TextBlob.objects, 'filter') as mock_filter, \
+                patch.object(TextBlob.objects, 'bulk_create') as mock_bulk_create:
+            mock_filter.return_value.values_list.return_value = [blobs.digest("Kept")]
+            hashes = TextBlob.objects.store(["Review not available", "Kept", "Review not available"])
+
+        self.assertEqual(hashes, {"Review not available": blobs.digest("Review not available"), "Kept": blobs.digest("Kept")})
+        created, = mock_bulk_create.call_args.args
+        self.assertEqual([(blob.hash, blob.size, blob.compression) for blob in created], [
+            (blobs.digest("Review not available"), 20, ''),
+        ])
+        self.assertTrue(mock_bulk_create.call_args.kwargs['ignore_conflicts'])
+
+    def test_generation_text_reads_inline_or_blob(self):
+        data, codec = blobs.encode(self.REVIEW, 'zstd')
+        blob = TextBlob(hash=blobs.digest(self.REVIEW), data=data, compression=codec, size=len(self.REVIEW))
+
+        self.assertEqual(GenerationHistory(content="Inline").text, "Inline")
+        self.assertEqual(GenerationHistory(blob=blob).text, self.REVIEW)
+
+    @override_settings(HISTORY_STORAGE='blob', HISTORY_COMPRESSION='zstd')
+    @patch('property_info.history.TextBlob')
+    @patch('property_info.history.transaction')
+    @patch('property_info.history.ActiveGeneration')
+    @patch('property_info.history.GenerationHistory')
+    def test_record_stores_text_in_blobs(self, mock_history, mock_active, mock_transaction, mock_blob):
+        mock_active.objects.filter.return_value.first.return_value = None
+        mock_blob.objects.store.return_value = {'New': 'hash-new', 'Old': 'hash-old'}
+
+        history.record('summary', 7, 'New', 'run1', original='Old')
+
+        mock_blob.objects.store.assert_called_once_with(('New', 'Old'), 'zstd')
+        source, generated = [c.kwargs for c in mock_history.objects.create.call_args_list]
+        self.assertEqual((source['content'], source['blob_id']), ('', 'hash-old'))
+        self.assertEqual((generated['content'], generated['blob_id']), ('', 'hash-new'))
+
+    @patch.object(compact_history, 'connection')
+    @patch.object(compact_history, 'transaction')
+    @patch.object(compact_history, 'TextBlob')
+    @patch.object(compact_history, 'GenerationHistory')
+    def test_compact_history_moves_inline_rows(self, mock_history, mock_blob, mock_transaction, mock_connection):
+        rows = mock_history.objects.filter.return_value.order_by.return_value.values_list.return_value
+        rows.__getitem__.side_effect = [[(1, 'Same'), (2, 'Same'), (3, 'Other')], []]
+        mock_blob.objects.store.return_value = {'Same': 'h1', 'Other': 'h2'}
+        mock_blob.objects.count.return_value = 2
+        mock_history.side_effect = lambda **fields: fields
+
+        out = StringIO()
+        compact_history.Command(stdout=out).handle(batch_size=3, compression='zstd')
+
+        mock_blob.objects.store.assert_called_once_with({'Same', 'Other'}, 'zstd')
+        updated, fields = mock_history.objects.bulk_update.call_args.args
+        self.assertEqual([(row['id'], row['blob_id'], row['content']) for row in updated], [(1, 'h1', ''), (2, 'h1', ''), (3, 'h2', '')])
+        self.assertEqual(fields, ['content', 'blob'])
+        self.assertEqual(mock_history.objects.filter.call_args_list[-1].kwargs, {'blob__isnull': True, 'id__gt': 3})
+        self.assertIn("Moved 3 history rows into 2 distinct blobs", out.getvalue())
+
+################# TEST FOR TEXT BLOBS ENDS   #####################################
+  
   
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
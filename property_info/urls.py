@@ -0,0 +1,8 @@
+from django.urls import path
+
+from property_info import views
+
+urlpatterns = [
+    path('properties/search/', views.property_search, name='property-search'),
+    path('properties/<int:hotel_id>/', views.property_detail, name='property-detail'),
+]
@@ -0,0 +1,139 @@
+# property_info/validation.py
+
+import re
+from collections import deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Placeholders the commands used to store when generation failed
+PLACEHOLDERS = {'name unavailable', 'description not available', 'review not available'}
+
+# Function words that make up a good share of any English paragraph
+ENGLISH_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'has', 'have', 'in', 'is', 'it',
+    'its', 'near', 'of', 'on', 'or', 'our', 'that', 'the', 'this', 'to', 'with', 'while', 'you', 'your',
+}
+
+
+def words(text):
+    return re.findall(r"[^\W_]+(?:'[^\W_]+)?", text.lower())
+
+
+# Validators take the output text and a context dict (prompt, system, rating)
+# and return a short reason when the output is rejected, or None.
+
+def word_count(low=1, high=None):
+    def check(text, context):
+        count = len(text.strip().strip('"').split())
+        if count < low:
+            return f"{count} words, expected at least {low}"
+        if high is not None and count > high:
+            return f"{count} words, expected at most {high}"
+    return check
+
+
+def rating_range(low=1, high=5):
+    def check(text, context):
+        rating = context.get('rating')
+        if rating is None or not low <= rating <= high:
+            return f"rating {rating} outside {low}-{high}"
+    return check
+
+
+def english(min_words=12, min_ratio=0.15):
+    """Reject longer outputs with too few English function words (wrong language or gibberish)."""
+    def check(text, context):
+        tokens = words(text)
+        if len(tokens) < min_words:
+            return None
+        ratio = sum(token in ENGLISH_WORDS for token in tokens) / len(tokens)
+        if ratio < min_ratio:
+            return "does not look like English"
+    return check
+
+
+def no_placeholder(text, context):
+    if text.strip().strip('".').lower() in PLACEHOLDERS:
+        return "placeholder text"
+
+
+def no_prompt_leak(window=6):
+    """Reject outputs repeating ``window`` consecutive words of the prompt or system prompt."""
+    def check(text, context):
+        source = words(f"{context.get('prompt', '')} {context.get('system', '')}")
+        shingles = {tuple(source[i:i + window]) for i in range(len(source) - window + 1)}
+        output = words(text)
+        for i in range(len(output) - window + 1):
+            if tuple(output[i:i + window]) in shingles:
+                return f"repeats the prompt: {' '.join(output[i:i + window])!r}"
+    return check
+
+
+DEFAULT_VALIDATORS = {
+    'title': lambda: [word_count(1, 4), no_placeholder, no_prompt_leak()],
+    'description': lambda: [word_count(5, 60), english(), no_placeholder, no_prompt_leak()],
+    'summary': lambda: [word_count(5, 250), english(), no_placeholder, no_prompt_leak()],
+    'rating_review': lambda: [rating_range(1, 5), word_count(10, 100), english(), no_placeholder, no_prompt_leak()],
+    'neighbourhood': lambda: [word_count(5, 80), english(), no_placeholder, no_prompt_leak()],
+}
+
+
+class Pipeline:
+    """Runs every validator on an output and collects the reasons it is rejected."""
+
+    def __init__(self, validators):
+        self.validators = list(validators)
+
+    def errors(self, text, **context):
+        if not text or not text.strip():
+            return ["empty output"]
+        return [error for error in (validator(text, context) for validator in self.validators) if error]
+
+    def is_valid(self, text, **context):
+        return not self.errors(text, **context)
+
+
+def pipeline_for(artifact):
+    """Return the default validators of ``artifact`` plus any listed in ``settings.OUTPUT_VALIDATORS``."""
+    extra = getattr(settings, 'OUTPUT_VALIDATORS', {}).get(artifact, [])
+    return Pipeline(DEFAULT_VALIDATORS[artifact]() + [import_string(path) for path in extra])
+
+
+class RetryQueue:
+    """FIFO of work items; an item that fails validation goes to the back until ``max_attempts``.
+
+    Only the items that were rejected are regenerated, after everything else
+    has had its first attempt. Items that still fail are kept in ``rejected``.
+    """
+
+    def __init__(self, items, max_attempts):
+        self.items = deque((item, 1) for item in items)
+        self.max_attempts = max_attempts
+        self.retried = 0
+        self.rejected = []  # (item, errors)
+
+    def __len__(self):
+        return len(self.items)
+
+    def pop(self):
+        return self.items.popleft()
+
+    def pending(self):
+        return [item for item, attempt in self.items]
+
+    def retry(self, item, attempt, errors):
+        """Queue ``item`` again; returns False once it has used up its attempts."""
+        if attempt < self.max_attempts:
+            self.items.append((item, attempt + 1))
+            self.retried += 1
+            return True
+        self.rejected.append((item, errors))
+        return False
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--max-attempts', type=int, default=settings.OUTPUT_MAX_ATTEMPTS,
+        help="Generations per hotel before an output failing validation is given up (default: OUTPUT_MAX_ATTEMPTS)"
+    )
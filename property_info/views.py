@@ -1,3 +1,87 @@
-from django.shortcuts import render
+import threading
 
-# Create your views here.
+from django.db import transaction
+from django.http import JsonResponse
+
+from property_info import history, search
+from property_info.management.commands.rewrite_property_summary import Command as SummaryCommand
+from property_info.models import Hotel, PropertyRatingReview, PropertySummary
+
+_generating = threading.Lock()
+_summary_locks = {}  # hotel_id -> lock held while its missing summary is generated
+
+
+def generate_summary(hotel):
+    """Generate, store and return the missing summary of ``hotel``; None when nothing passes the quality gate.
+
+    Uses the prompt, model cascade and gate of ``rewrite_property_summary``.
+    Concurrent requests for the same hotel wait for one generation.
+    """
+    with _generating:
+        lock = _summary_locks.setdefault(hotel.hotel_id, threading.Lock())
+    with lock:
+        stored = PropertySummary.objects.filter(property_id=hotel.hotel_id).values_list('summary', flat=True).first()
+        if stored is not None:
+            return stored
+
+        command = SummaryCommand()
+        values = (
+            hotel.hotel_name, hotel.price, hotel.rating, hotel.room_type, hotel.location, hotel.latitude, hotel.longitude
+        )
+        trace = []
+        summary = command.generate_summary(*values, trace=trace)
+        if not summary or command.errors(summary, command.summary_prompt(*values)):
+            return None
+
+        with transaction.atomic():
+            PropertySummary.objects.create(property_id=hotel.hotel_id, summary=summary)
+            history.record('summary', hotel.hotel_id, summary, history.new_run_id(), trace)
+        return summary
+
+
+def property_detail(request, hotel_id):
+    """Serve a property with its generated content; content not generated yet is ``null``.
+
+    With ``generate=1``, a missing summary is generated on the spot and stored.
+    """
+    hotel = Hotel.objects.in_bulk_cached([hotel_id]).get(hotel_id)
+    if hotel is None:
+        return JsonResponse({'error': f"Unknown hotel_id {hotel_id}"}, status=404)
+
+    summary = PropertySummary.objects.filter(property_id=hotel_id).values_list('summary', flat=True).first()
+    if summary is None and request.GET.get('generate') == '1':
+        summary = generate_summary(hotel)
+    rating_review = PropertyRatingReview.objects.filter(property_id=hotel_id).values('rating', 'review').first()
+
+    return JsonResponse({
+        'hotel_id': hotel.hotel_id,
+        'city_id': hotel.city_id,
+        'hotel_name': hotel.hotel_name,
+        'description': hotel.description,
+        'price': str(hotel.price),
+        'rating': hotel.rating,
+        'room_type': hotel.room_type,
+        'location': hotel.location,
+        'latitude': str(hotel.latitude),
+        'longitude': str(hotel.longitude),
+        'summary': summary,
+        'review_rating': rating_review['rating'] if rating_review else None,
+        'review': rating_review['review'] if rating_review else None,
+    })
+
+
+def property_search(request):
+    """Search properties by their generated summaries and reviews (``q``) and/or their name (``name``)."""
+    text = request.GET.get('q', '').strip()
+    name = request.GET.get('name', '').strip()
+    if not text and not name:
+        return JsonResponse({'error': "Give a search with q (summary and review text) and/or name"}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', search.DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': "limit must be a number"}, status=400)
+    limit = max(1, min(limit, search.MAX_LIMIT))
+
+    results = search.search(text=text or None, name=name or None, limit=limit)
+    return JsonResponse({'q': text, 'name': name, 'count': len(results), 'results': results})